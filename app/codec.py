@@ -0,0 +1,170 @@
+"""
+Serialización de los archivos de datos (snapshots y journal).
+
+El codificador JSON se elige con INVENTARIO_JSON_CODEC: `orjson` o
+`msgspec` si están instalados (`auto` toma el primero que encuentre) y si
+no el módulo `json` de la biblioteca estándar. Todos producen JSON
+equivalente, así que se puede cambiar de uno a otro sin migrar nada.
+
+Formatos de snapshot, elegibles por archivo:
+
+    json      indentado, para leer y editar a mano
+    compact   JSON sin espacios (colecciones grandes, p. ej. ventas)
+    gzip      JSON compacto comprimido con gzip (archivos)
+    msgpack   binario (requiere `pip install msgpack`)
+
+`decode` reconoce el formato por el contenido, no por el nombre del
+archivo: al cambiar el formato de una colección el snapshot viejo se sigue
+leyendo y el próximo checkpoint lo reescribe en el formato nuevo.
+"""
+from __future__ import annotations
+import gzip
+import json
+import zlib
+from typing import Any, Callable
+
+from app import config, metrics
+
+FORMATOS = ("json", "compact", "gzip", "msgpack")
+
+_GZIP_MAGIC = b"\x1f\x8b"
+# Primer byte significativo de un documento JSON
+_JSON_START = frozenset(b'[{"-0123456789tfn')
+
+
+class FormatoInvalido(ValueError):
+    """El contenido no se pudo decodificar en ninguno de los formatos conocidos."""
+
+
+def _stdlib() -> tuple[str, Callable, Callable, Callable]:
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def dumps_pretty(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+
+    return "json", dumps, dumps_pretty, json.loads
+
+
+def _orjson() -> tuple[str, Callable, Callable, Callable]:
+    import orjson
+
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+    def dumps_pretty(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_INDENT_2)
+
+    return "orjson", dumps, dumps_pretty, orjson.loads
+
+
+def _msgspec() -> tuple[str, Callable, Callable, Callable]:
+    import msgspec
+
+    encoder = msgspec.json.Encoder()
+    decoder = msgspec.json.Decoder()
+
+    def dumps_pretty(obj) -> bytes:
+        return msgspec.json.format(encoder.encode(obj), indent=2)
+
+    return "msgspec", encoder.encode, dumps_pretty, decoder.decode
+
+
+_BACKENDS = {"orjson": _orjson, "msgspec": _msgspec, "json": _stdlib}
+
+
+def _elegir(nombre: str) -> tuple[str, Callable, Callable, Callable]:
+    candidatos = ("orjson", "msgspec", "json") if nombre == "auto" else (nombre,)
+    for c in candidatos:
+        if c not in _BACKENDS:
+            raise ValueError(f"INVENTARIO_JSON_CODEC desconocido: {nombre}")
+        try:
+            return _BACKENDS[c]()
+        except ImportError:
+            if nombre != "auto":
+                raise
+    return _stdlib()
+
+
+BACKEND, _dumps, _dumps_pretty, _loads = _elegir(config.JSON_CODEC)
+
+
+def dumps(obj: Any, pretty: bool = False) -> bytes:
+    """JSON en UTF-8, compacto o indentado."""
+    return _dumps_pretty(obj) if pretty else _dumps(obj)
+
+
+def loads(data: bytes | str) -> Any:
+    try:
+        return _loads(data)
+    except Exception as e:
+        # Cada biblioteca tiene su propia excepción (msgspec.DecodeError no hereda de ValueError)
+        raise FormatoInvalido(str(e)) from e
+
+
+def _msgpack():
+    try:
+        import msgpack
+    except ImportError:
+        raise RuntimeError("El formato msgpack requiere: pip install msgpack")
+    return msgpack
+
+
+def check_formato(formato: str) -> None:
+    """Falla al arrancar (no en el primer checkpoint) si el formato no se puede usar."""
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de snapshot desconocido: {formato} (usa uno de {FORMATOS})")
+    if formato == "msgpack":
+        _msgpack()
+
+
+def encode(obj: Any, formato: str = "json") -> bytes:
+    with metrics.encode_seconds.time(format=formato):
+        return _encode(obj, formato)
+
+
+def _encode(obj: Any, formato: str) -> bytes:
+    if formato == "json":
+        return dumps(obj, pretty=True)
+    if formato == "compact":
+        return dumps(obj)
+    if formato == "gzip":
+        # mtime=0: el mismo contenido produce siempre los mismos bytes
+        return gzip.compress(dumps(obj), compresslevel=6, mtime=0)
+    if formato == "msgpack":
+        return _msgpack().packb(obj, use_bin_type=True)
+    raise ValueError(f"Formato de snapshot desconocido: {formato}")
+
+
+def detect(data: bytes) -> str:
+    """Formato de un contenido ya escrito (`json` cubre también `compact`)."""
+    if data.startswith(_GZIP_MAGIC):
+        return "gzip"
+    # Basta el comienzo (lstrip sobre todo el archivo lo copiaría entero)
+    cuerpo = data[:64].lstrip()
+    if cuerpo.startswith(b"\xef\xbb\xbf"):
+        cuerpo = cuerpo[3:].lstrip()
+    if not cuerpo or cuerpo[0] in _JSON_START:
+        return "json"
+    return "msgpack"
+
+
+def decode(data: bytes) -> Any:
+    """Lee cualquiera de los formatos, reconociéndolo por su contenido."""
+    formato = detect(data)
+    if formato == "gzip":
+        try:
+            data = gzip.decompress(data)
+        except (OSError, EOFError, zlib.error) as e:
+            raise FormatoInvalido(f"gzip inválido: {e}") from e
+        return loads(data)
+    if formato == "msgpack":
+        try:
+            return _msgpack().unpackb(data, raw=False, strict_map_key=False)
+        except RuntimeError:
+            raise
+        except Exception as e:
+            raise FormatoInvalido(f"msgpack inválido: {e}") from e
+    if data.startswith(b"\xef\xbb\xbf"):
+        data = data[3:]
+    return loads(data)
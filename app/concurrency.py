@@ -0,0 +1,117 @@
+"""
+Pools de hilos acotados para los handlers.
+
+Los endpoints son `async` y mandan el trabajo bloqueante (journal y
+snapshots, SQLite, parseo de archivos, pandas) a uno de dos pools:
+
+    io_pool     ventas, compras y CRUD: trabajo corto, muchos a la vez
+    heavy_pool  importaciones, exportaciones y reportes: pocos a la vez
+
+Así una importación o un reporte largo ocupa a lo más los hilos de
+`heavy_pool` y nunca deja sin hilos a las ventas.
+
+Cada pool admite `workers + cola` llamadas en curso; pasado eso responde
+503 con Retry-After en vez de encolar sin límite (backpressure). Las
+lecturas de `heavy_pool` tienen además un tiempo máximo (504). Las
+escrituras nunca se cortan por tiempo: el hilo no se puede interrumpir y
+la transacción terminaría confirmándose igual.
+"""
+from __future__ import annotations
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from fastapi import HTTPException
+
+from app import config, metrics
+
+
+class BoundedPool:
+    """ThreadPoolExecutor con cupo de llamadas en curso (en ejecución + en espera)."""
+
+    def __init__(self, name: str, workers: int, queue: int):
+        self.name = name
+        self.workers = max(1, workers)
+        self.capacity = self.workers + max(0, queue)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name)
+            return self._executor
+
+    def _call(self, encolado: float, fn: Callable, args, kwargs):
+        metrics.pool_wait.observe(time.perf_counter() - encolado, pool=self.name)
+        handler = f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+        return metrics.run_handler(handler, fn, *args, **kwargs)
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    async def run(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs):
+        """Ejecuta `fn(*args, **kwargs)` en el pool y espera su resultado sin bloquear el event loop."""
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                raise HTTPException(
+                    status_code=503,
+                    detail="Servidor ocupado, reintenta en unos segundos",
+                    headers={"Retry-After": "1"},
+                )
+            self._in_flight += 1
+        # El cupo se libera cuando termina el hilo, no cuando deja de esperarlo el request
+        ctx = contextvars.copy_context()
+        call = functools.partial(ctx.run, self._call, time.perf_counter(), fn, args, kwargs)
+        try:
+            future = self._get_executor().submit(call)
+        except BaseException:
+            with self._lock:
+                self._in_flight -= 1
+            raise
+        future.add_done_callback(self._release)
+        waiter = asyncio.wrap_future(future)
+        if not timeout:
+            return await waiter
+        try:
+            return await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="La consulta tardó demasiado")
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+io_pool = BoundedPool("io", config.IO_WORKERS, config.QUEUE_LIMIT)
+heavy_pool = BoundedPool("pesado", config.HEAVY_WORKERS, config.QUEUE_LIMIT)
+metrics.pool_gauge((io_pool, heavy_pool))
+
+
+def offload(pool: BoundedPool, timeout: Optional[float] = None):
+    """
+    Convierte un handler síncrono en uno `async` que corre en `pool`.
+    Conserva la firma, así que FastAPI ve los mismos parámetros.
+
+        @router.get("/")
+        @offload(io_pool)
+        def listar(...): ...
+    """
+    def decorator(fn: Callable):
+        @functools.wraps(fn)
+        async def handler(*args, **kwargs):
+            return await pool.run(fn, *args, timeout=timeout, **kwargs)
+        return handler
+    return decorator
@@ -0,0 +1,106 @@
+"""
+Configuración de la aplicación leída desde variables de entorno.
+Todas tienen un valor por defecto razonable para desarrollo local.
+"""
+from __future__ import annotations
+import os
+from pathlib import Path
+
+
+def env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def env_map(name: str, default: dict[str, str]) -> dict[str, str]:
+    """'clave=valor,clave=valor' -> dict, sobre los valores por defecto."""
+    out = dict(default)
+    for par in (os.getenv(name) or "").split(","):
+        clave, _, valor = par.partition("=")
+        if clave.strip() and valor.strip():
+            out[clave.strip()] = valor.strip().lower()
+    return out
+
+
+def env_bool(name: str, default: bool = False) -> bool:
+    v = os.getenv(name)
+    if v is None:
+        return default
+    return v.strip().lower() in ("1", "true", "yes", "si", "sí", "on")
+
+
+DATA_DIR = Path(os.getenv("INVENTARIO_DATA_DIR") or Path(__file__).resolve().parent / "data")
+
+# Write-behind: cada cuántos segundos el hilo de fondo revisa si toca checkpoint
+FLUSH_INTERVAL = env_float("INVENTARIO_FLUSH_INTERVAL", 2.0)
+# Los snapshots JSON se reescriben (checkpoint) cada esta cantidad de registros del journal
+JOURNAL_COMPACT_EVERY = env_int("INVENTARIO_JOURNAL_COMPACT_EVERY", 1000)
+# Activar cuando varios procesos (uvicorn --workers N) comparten el mismo DATA_DIR
+MULTIPROCESS = env_bool("INVENTARIO_MULTIPROCESO")
+
+# Codificador JSON: auto (orjson o msgspec si están instalados), orjson, msgspec o json
+JSON_CODEC = os.getenv("INVENTARIO_JSON_CODEC", "auto").strip().lower()
+# Formato del snapshot de cada colección: json (indentado), compact, gzip o msgpack.
+# Se cambia con p. ej. INVENTARIO_FORMATOS="ventas=gzip,productos=compact"
+SNAPSHOT_FORMATS = env_map("INVENTARIO_FORMATOS", {"ventas": "compact", "idempotencia": "compact"})
+
+# Ventas particionadas por mes: los meses más antiguos que esto se comprimen (0 = nunca)
+ARCHIVE_AFTER_MONTHS = env_int("INVENTARIO_ARCHIVAR_MESES", 3)
+ARCHIVE_FORMAT = os.getenv("INVENTARIO_FORMATO_ARCHIVO", "gzip").strip().lower()
+
+# Backend de almacenamiento: "json" (archivos en DATA_DIR) o "sqlite"
+STORAGE_BACKEND = os.getenv("INVENTARIO_BACKEND", "json").strip().lower()
+SQLITE_PATH = Path(os.getenv("INVENTARIO_SQLITE_PATH") or DATA_DIR / "inventario.db")
+
+# Importación de productos: filas por transacción y trabajos en segundo plano simultáneos
+IMPORT_CHUNK_SIZE = env_int("INVENTARIO_IMPORT_CHUNK", 1000)
+IMPORT_WORKERS = env_int("INVENTARIO_IMPORT_WORKERS", 1)
+
+# Respuestas de /reportes/flujo_caja guardadas por (desde, hasta, versión de los datos)
+REPORT_CACHE_SIZE = env_int("INVENTARIO_CACHE_REPORTES", 256)
+
+# Hilos para ventas/CRUD y para importaciones/exportaciones/reportes (ver app/concurrency.py)
+IO_WORKERS = env_int("INVENTARIO_HILOS_IO", 16)
+HEAVY_WORKERS = env_int("INVENTARIO_HILOS_PESADOS", 2)
+# Llamadas que pueden esperar hilo en cada pool antes de responder 503
+QUEUE_LIMIT = env_int("INVENTARIO_COLA_MAXIMA", 100)
+# Segundos máximos de un reporte o exportación (0 = sin límite)
+READ_TIMEOUT = env_float("INVENTARIO_TIMEOUT_LECTURA", 30.0)
+
+# Una conexión SQLite por hilo que puede escribir o leer a la vez (pools de la app e importaciones
+# en segundo plano), para que ningún handler quede esperando una conexión
+SQLITE_POOL_SIZE = env_int("INVENTARIO_SQLITE_POOL_SIZE", IO_WORKERS + HEAVY_WORKERS + IMPORT_WORKERS)
+# Segundos que se espera una conexión libre del pool antes de responder 503
+SQLITE_POOL_TIMEOUT = env_float("INVENTARIO_SQLITE_POOL_ESPERA", 10.0)
+
+# Listados servidos directo desde las filas guardadas, sin revalidarlas con Pydantic
+TRUSTED_RESPONSES = env_bool("INVENTARIO_RESPUESTAS_CONFIABLES", True)
+
+# Alertas de stock bajo: umbral general y por categoría ("bebidas=20,lácteos=10");
+# el `stock_minimo` de cada producto tiene prioridad sobre ambos
+STOCK_MINIMO = env_int("INVENTARIO_STOCK_MINIMO", 3)
+STOCK_MINIMO_CATEGORIAS = {
+    categoria: int(valor)
+    for categoria, valor in env_map("INVENTARIO_STOCK_MINIMO_CATEGORIAS", {}).items()
+    if valor.isdigit()
+}
+# Streams SSE (alertas, KPIs): segundos entre comentarios keep-alive y duración máxima
+# de cada conexión (el navegador se reconecta solo; sin límite, apagar el servidor
+# esperaría a que cierren todos los dashboards)
+SSE_KEEPALIVE = env_float("INVENTARIO_SSE_KEEPALIVE", 15.0)
+SSE_STREAM_SECONDS = env_float("INVENTARIO_SSE_DURACION", 300.0)
+# Segundos en que se agrupan los cambios antes de mandar un delta de KPIs
+KPIS_INTERVAL = env_float("INVENTARIO_KPIS_INTERVALO", 0.5)
+
+# Perfil (cProfile) de los handlers que tardan más que esto, en DATA_DIR/perfiles (0 = desactivado)
+PROFILE_SLOW_MS = env_float("INVENTARIO_PERFIL_LENTO_MS", 0.0)
+PROFILE_KEEP = env_int("INVENTARIO_PERFILES_MAXIMO", 50)
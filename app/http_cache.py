@@ -0,0 +1,102 @@
+"""
+GET condicionales (ETag / Last-Modified -> 304) para lo que el dashboard
+consulta seguido: catálogo de productos y empresas, listados y reportes.
+
+Cada recurso declara de qué colecciones depende. Su ETag se arma con la
+versión de esas colecciones, que cambia con cada escritura confirmada, así
+que se calcula sin ejecutar el endpoint: si el cliente ya tiene esa versión
+(If-None-Match, o If-Modified-Since cuando no manda ETag) se responde 304
+sin cuerpo y sin recalcular ni serializar nada.
+
+La versión se lee *antes* de ejecutar el endpoint: si algo cambia mientras
+tanto, la respuesta lleva un ETag más viejo que sus datos y la próxima
+consulta simplemente no coincide. Nunca se confirma como vigente algo
+que cambió.
+"""
+from __future__ import annotations
+import hashlib
+import math
+import re
+import time
+from email.utils import format_datetime, parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+from starlette.concurrency import run_in_threadpool
+
+from app.storage.store import store
+
+# Ruta -> colecciones de las que depende su respuesta
+RECURSOS: list[tuple[re.Pattern, tuple[str, ...]]] = [
+    (re.compile(r"^/productos/(\d+)?$"), ("productos",)),
+    (re.compile(r"^/productos/alertas$"), ("productos",)),
+    (re.compile(r"^/productos/buscar$"), ("productos",)),
+    (re.compile(r"^/empresas/(\d+)?$"), ("empresas",)),
+    (re.compile(r"^/ventas/$"), ("ventas",)),
+    (re.compile(r"^/ventas/empresas/\d+/historial$"), ("empresas", "ventas")),
+    # Los montos y márgenes salen sólo de las ventas (precio/costo guardados en cada una)
+    (re.compile(r"^/reportes/(flujo_caja|ventas_por_periodo)$"), ("ventas",)),
+    (re.compile(r"^/reportes/rotacion_stock$"), ("productos", "ventas")),
+    (re.compile(r"^/reportes/(top_productos|por_empresa)$"), ("empresas", "productos", "ventas")),
+    (re.compile(r"^/reportes/kpis$"), ("empresas", "productos", "ventas")),
+]
+
+
+def dependencias(path: str) -> Optional[tuple[str, ...]]:
+    for patron, names in RECURSOS:
+        if patron.match(path):
+            return names
+    return None
+
+
+def validadores(versiones: dict[str, tuple[int, float]], instancia: str) -> dict[str, str]:
+    """Headers ETag / Last-Modified / Cache-Control para estas versiones."""
+    firma = ";".join(f"{n}:{v}:{m:.6f}" for n, (v, m) in sorted(versiones.items()))
+    etag = hashlib.sha1(f"{instancia};{firma}".encode()).hexdigest()[:20]
+    headers = {"ETag": f'W/"{etag}"', "Cache-Control": "no-cache"}
+    modificado = max((m for _v, m in versiones.values()), default=0.0)
+    # Last-Modified tiene resolución de segundos: si el segundo de la última
+    # escritura no terminó, otra escritura en ese mismo segundo no se notaría
+    if math.floor(modificado) < math.floor(time.time()):
+        headers["Last-Modified"] = format_datetime(datetime.fromtimestamp(math.floor(modificado), timezone.utc), usegmt=True)
+    return headers
+
+
+def _etags(valor: str) -> set[str]:
+    # Comparación débil: W/"x" y "x" son el mismo validador
+    return {e.strip().removeprefix("W/") for e in valor.split(",") if e.strip()}
+
+
+def no_modificado(request: Request, headers: dict[str, str]) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Si viene If-None-Match, If-Modified-Since se ignora (RFC 9110)
+        etags = _etags(if_none_match)
+        return "*" in etags or headers["ETag"].removeprefix("W/") in etags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or "Last-Modified" not in headers:
+        return False
+    try:
+        cliente = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    return parsedate_to_datetime(headers["Last-Modified"]) <= cliente
+
+
+async def cache_condicional(request: Request, call_next):
+    """Middleware: responde 304 o agrega los validadores a la respuesta."""
+    names = dependencias(request.url.path) if request.method in ("GET", "HEAD") else None
+    if names is None:
+        return await call_next(request)
+
+    versiones = await run_in_threadpool(store.versiones, names)
+    headers = validadores(versiones, store.instancia)
+    if no_modificado(request, headers):
+        return Response(status_code=304, headers=headers)
+
+    response = await call_next(request)
+    if response.status_code == 200:
+        response.headers.update(headers)
+    return response
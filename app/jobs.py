@@ -0,0 +1,80 @@
+"""
+Trabajos en segundo plano (p. ej. importaciones grandes) con estado
+consultable por id. El registro vive en memoria del proceso: con varios
+workers, el estado se consulta en el mismo worker que recibió el trabajo.
+"""
+from __future__ import annotations
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Optional
+
+from app import config
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Job:
+    id: str
+    tipo: str
+    # pendiente -> en_proceso -> terminado | error
+    estado: str = "pendiente"
+    procesadas: int = 0
+    total: Optional[int] = None
+    resultado: Optional[dict] = None
+    error: Optional[str] = None
+    creado: float = field(default_factory=time.time)
+    terminado: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class JobRegistry:
+    """Ejecuta trabajos en un pool acotado y guarda los últimos `keep` terminados."""
+
+    def __init__(self, workers: int, keep: int = 100):
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="job")
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._lock = threading.Lock()
+        self._keep = keep
+
+    def submit(self, tipo: str, fn: Callable[[Job], dict], on_done: Optional[Callable[[], None]] = None) -> Job:
+        """Encola `fn(job)`; lo que devuelve queda en `job.resultado`."""
+        job = Job(id=uuid.uuid4().hex, tipo=tipo)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._purge()
+        self._executor.submit(self._run, job, fn, on_done)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: Job, fn: Callable[[Job], dict], on_done) -> None:
+        job.estado = "en_proceso"
+        try:
+            job.resultado = fn(job)
+            job.estado = "terminado"
+        except Exception as e:
+            logger.exception("Trabajo %s (%s) falló", job.id, job.tipo)
+            job.error = str(e)
+            job.estado = "error"
+        finally:
+            job.terminado = time.time()
+            if on_done is not None:
+                on_done()
+
+    def _purge(self) -> None:
+        terminados = [j.id for j in self._jobs.values() if j.terminado is not None]
+        for job_id in terminados[: max(0, len(terminados) - self._keep)]:
+            del self._jobs[job_id]
+
+
+jobs = JobRegistry(config.IMPORT_WORKERS)
@@ -1,22 +1,65 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import RedirectResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, RedirectResponse
+from starlette.concurrency import run_in_threadpool
 from pathlib import Path
 
+from app import metrics
+from app.concurrency import heavy_pool, io_pool
+from app.http_cache import cache_condicional
 from app.routes import empresas, productos, ventas, reportes, importacion
+from app.storage.sqlite_store import PoolAgotado
+from app.storage.store import store
 
-app = FastAPI(title="API Gestión Inventario (Empresas)")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Carga las colecciones en memoria una sola vez y vuelca lo pendiente al apagar
+    await run_in_threadpool(store.open)
+    yield
+    # Primero se terminan los requests en curso, después se vuelca lo pendiente
+    for pool in (io_pool, heavy_pool):
+        await run_in_threadpool(pool.shutdown)
+    await run_in_threadpool(store.close)
+
+app = FastAPI(title="API Gestión Inventario (Empresas)", lifespan=lifespan)
+
+# ETag / Last-Modified y 304 para catálogo, listados y reportes
+app.middleware("http")(cache_condicional)
+# Latencia por ruta (registrado al final: envuelve también a los 304 del middleware de caché)
+app.middleware("http")(metrics.middleware)
+
+@app.exception_handler(PoolAgotado)
+async def pool_agotado(request: Request, exc: PoolAgotado):
+    # Todas las conexiones SQLite ocupadas: mismo trato que un pool de hilos lleno
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Servidor ocupado, reintenta en unos segundos"},
+        headers={"Retry-After": "1"},
+    )
 
 STATIC_DIR = Path(__file__).resolve().parent / "static"  
 
 app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
 
 @app.get("/", include_in_schema=False)
-def root():
+async def root():
     return RedirectResponse(url="/static/index.html")
 
-app.include_router(empresas.router)
-app.include_router(productos.router)
-app.include_router(ventas.router)
-app.include_router(reportes.router)
-app.include_router(importacion.router)
\ No newline at end of file
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.exposition(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+ROUTERS = (
+    empresas.router,
+    # Antes que productos: /productos/exportar no debe caer en /productos/{producto_id}
+    importacion.router,
+    importacion.ventas_router,
+    productos.router,
+    ventas.router,
+    reportes.router,
+)
+for router in ROUTERS:
+    app.include_router(router)
+# Los 304 del middleware de caché no pasan por el router: las métricas buscan su ruta en éstas
+metrics.registrar_rutas(ROUTERS)
@@ -0,0 +1,298 @@
+"""
+Métricas del proceso en formato de texto de Prometheus (`GET /metrics`).
+
+    inventario_http_request_duration_seconds   latencia por ruta, método y status
+    inventario_handler_duration_seconds        tiempo del handler dentro del pool
+    inventario_pool_wait_seconds               espera por un hilo libre
+    inventario_file_read_bytes_total           bytes leídos por archivo de datos
+    inventario_file_written_bytes_total        bytes escritos por archivo de datos
+    inventario_decode_seconds                  parseo de snapshots y journal
+    inventario_encode_seconds                  serialización por formato
+    inventario_lock_wait_seconds               espera por locks de colecciones y journal
+    inventario_commit_seconds                  escritura del journal / COMMIT de SQLite
+    inventario_checkpoint_seconds              checkpoints completos
+
+La diferencia entre la latencia del request y la del handler es lo que se
+va en validar el cuerpo con Pydantic, serializar la respuesta y esperar hilo.
+
+Las métricas son de cada proceso: con `uvicorn --workers N` cada worker
+expone las suyas (Prometheus las suma por instancia).
+
+Con INVENTARIO_PERFIL_LENTO_MS > 0 cada handler corre bajo cProfile y los
+que tardan más que eso dejan su perfil en DATA_DIR/perfiles/ (se abre con
+`python -m pstats` o snakeviz). Tiene costo: activarlo sólo para investigar.
+"""
+from __future__ import annotations
+import bisect
+import cProfile
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterator
+
+from starlette.routing import Match
+
+from app import config
+
+logger = logging.getLogger(__name__)
+
+# Segundos: de una venta en memoria (~100 µs) a una importación grande
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _quote(v: str) -> str:
+    return '"' + _escape(v) + '"'
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    partes = [f"{n}={_quote(v)}" for n, v in zip(names, values)]
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+
+def _num(v: float) -> str:
+    return repr(float(v)) if v != int(v) else str(int(v))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(n, "") for n in self.labelnames)
+
+    def lines(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        k = self._key(labels)
+        with self._lock:
+            self._values[k] = self._values.get(k, 0) + amount
+
+    def lines(self) -> Iterator[str]:
+        yield from super().lines()
+        with self._lock:
+            values = sorted(self._values.items())
+        for k, v in values:
+            yield f"{self.name}{_labels(self.labelnames, k)} {_num(v)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets=BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # etiquetas -> [conteo por bucket (no acumulado), suma, total]
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        k = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(k)
+            if s is None:
+                s = self._series[k] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            s[0][i] += 1
+            s[1] += value
+            s[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t, **labels)
+
+    def lines(self) -> Iterator[str]:
+        yield from super().lines()
+        with self._lock:
+            series = sorted((k, (list(s[0]), s[1], s[2])) for k, s in self._series.items())
+        for k, (counts, total, n) in series:
+            acumulado = 0
+            for le, c in zip(self.buckets, counts):
+                acumulado += c
+                yield f"{self.name}_bucket{_labels(self.labelnames, k, 'le=' + _quote(_num(le)))} {acumulado}"
+            yield f"{self.name}_bucket{_labels(self.labelnames, k, 'le=' + _quote('+Inf'))} {n}"
+            yield f"{self.name}_sum{_labels(self.labelnames, k)} {_num(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, k)} {n}"
+
+
+class Gauge(_Metric):
+    """Valor leído al momento de exponer (p. ej. llamadas en curso de un pool)."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...], fn: Callable[[], dict[tuple, float]]):
+        super().__init__(name, help, labelnames)
+        self.fn = fn
+
+    def lines(self) -> Iterator[str]:
+        yield from super().lines()
+        for k, v in sorted(self.fn().items()):
+            yield f"{self.name}{_labels(self.labelnames, k)} {_num(v)}"
+
+
+REGISTRY: list[_Metric] = []
+
+http_latency = Histogram(
+    "inventario_http_request_duration_seconds", "Latencia de los requests HTTP", ("method", "route", "status")
+)
+handler_latency = Histogram(
+    "inventario_handler_duration_seconds", "Tiempo de ejecución del handler en su pool", ("handler",)
+)
+pool_wait = Histogram("inventario_pool_wait_seconds", "Espera por un hilo libre del pool", ("pool",))
+bytes_read = Counter("inventario_file_read_bytes_total", "Bytes leídos de archivos de datos", ("file",))
+bytes_written = Counter("inventario_file_written_bytes_total", "Bytes escritos en archivos de datos", ("file",))
+decode_seconds = Histogram("inventario_decode_seconds", "Parseo de archivos de datos", ("file",))
+encode_seconds = Histogram("inventario_encode_seconds", "Serialización de snapshots y journal", ("format",))
+lock_wait = Histogram("inventario_lock_wait_seconds", "Espera por locks", ("lock", "kind"))
+commit_seconds = Histogram("inventario_commit_seconds", "Escritura durable de una transacción", ("backend",))
+checkpoint_seconds = Histogram("inventario_checkpoint_seconds", "Checkpoints de colecciones", ())
+slow_profiles = Counter("inventario_slow_profiles_total", "Perfiles guardados de handlers lentos", ("handler",))
+
+
+def file_label(path: Path) -> str:
+    """Archivo relativo a DATA_DIR (p. ej. 'ventas/2026-01.json.gz'), para que las etiquetas sean estables."""
+    try:
+        return Path(path).resolve().relative_to(config.DATA_DIR.resolve()).as_posix()
+    except ValueError:
+        return Path(path).name
+
+
+def exposition() -> str:
+    """Todas las métricas en formato de texto de Prometheus 0.0.4."""
+    out = []
+    for m in REGISTRY:
+        out.extend(m.lines())
+    return "\n".join(out) + "\n"
+
+
+# ---------- perfiles de handlers lentos ----------
+
+PROFILE_SLOW_MS = config.PROFILE_SLOW_MS
+PROFILE_DIR = config.DATA_DIR / "perfiles"
+# Perfiles que se conservan; los más viejos se borran
+PROFILE_KEEP = config.PROFILE_KEEP
+
+_NOMBRE_SEGURO = re.compile(r"[^A-Za-z0-9_.-]+")
+# Sólo un handler perfilado a la vez
+_perfil_lock = threading.Lock()
+
+
+def _guardar_perfil(prof: cProfile.Profile, handler: str, ms: float) -> None:
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%dT%H%M%S.%f")
+    path = PROFILE_DIR / f"{stamp}-{_NOMBRE_SEGURO.sub('_', handler)}-{ms:.0f}ms.prof"
+    prof.dump_stats(path)
+    slow_profiles.inc(handler=handler)
+    logger.warning("Handler lento %s (%.0f ms): perfil en %s", handler, ms, path)
+    perfiles = sorted(PROFILE_DIR.glob("*.prof"))
+    for viejo in perfiles[:max(0, len(perfiles) - PROFILE_KEEP)]:
+        viejo.unlink(missing_ok=True)
+
+
+def run_handler(handler: str, fn: Callable, *args, **kwargs):
+    """
+    Ejecuta un handler midiendo su duración y, si el profiler está
+    activado, guarda su perfil cuando supera el umbral. Se perfila un
+    handler a la vez (desde Python 3.12 el hook de cProfile es global y un
+    segundo enable() falla); los que llegan mientras tanto corren sin perfil.
+    """
+    perfilando = PROFILE_SLOW_MS > 0 and _perfil_lock.acquire(blocking=False)
+    prof = cProfile.Profile() if perfilando else None
+    t = time.perf_counter()
+    try:
+        if prof is not None:
+            try:
+                prof.enable()
+            except ValueError:
+                # Otra herramienta de perfilado ya está activa
+                prof = None
+        if prof is None:
+            return fn(*args, **kwargs)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            prof.disable()
+    finally:
+        segundos = time.perf_counter() - t
+        handler_latency.observe(segundos, handler=handler)
+        try:
+            if prof is not None and segundos * 1000 >= PROFILE_SLOW_MS:
+                try:
+                    _guardar_perfil(prof, handler, segundos * 1000)
+                except OSError:
+                    logger.exception("No se pudo guardar el perfil de %s", handler)
+        finally:
+            if perfilando:
+                _perfil_lock.release()
+
+
+# Rutas de la API en el orden del router, para etiquetar los requests que no llegan a él
+_rutas: list = []
+
+
+def registrar_rutas(routers) -> None:
+    """Registra las rutas de los routers incluidos en la app (en el mismo orden)."""
+    for router in routers:
+        _rutas.extend(router.routes)
+
+
+def _ruta(request) -> str:
+    """
+    Plantilla de la ruta del request. Los 304 del middleware de caché no
+    llegan al router, así que en ese caso se busca la ruta que coincide.
+    """
+    route = request.scope.get("route")
+    if route is None:
+        for candidata in _rutas:
+            match, _scope = candidata.matches(request.scope)
+            if match == Match.FULL:
+                route = candidata
+                break
+    return getattr(route, "path", None) or "sin_ruta"
+
+
+async def middleware(request, call_next):
+    """Latencia de cada request, etiquetada con la plantilla de la ruta (no el path con ids)."""
+    t = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        http_latency.observe(time.perf_counter() - t, method=request.method, route=_ruta(request), status=str(status))
+
+
+def pool_gauge(pools) -> None:
+    Gauge(
+        "inventario_pool_in_flight", "Llamadas en curso (ejecutando o esperando hilo) por pool", ("pool",),
+        lambda: {(p.name,): p.in_flight for p in pools},
+    )
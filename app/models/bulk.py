@@ -0,0 +1,39 @@
+from pydantic import BaseModel, Field, model_validator
+from typing import Any, List, Literal, Optional
+from app.models.venta import Venta
+from app.models.compra import CompraRequest
+
+class BulkItem(BaseModel):
+    # Clave que pone el cliente (p. ej. uuid del POS); reintentos con la misma clave no se aplican dos veces
+    clave: Optional[str] = Field(default=None, max_length=200)
+    venta: Optional[Venta] = None
+    compra: Optional[CompraRequest] = None
+
+    @model_validator(mode="after")
+    def una_operacion(self):
+        if (self.venta is None) == (self.compra is None):
+            raise ValueError("Cada item debe traer 'venta' o 'compra' (sólo uno)")
+        return self
+
+class BulkRequest(BaseModel):
+    items: List[BulkItem] = Field(min_length=1, max_length=5000)
+    # todo_o_nada: si un item falla no se aplica ninguno; parcial: se aplican los que pasan
+    modo: Literal["todo_o_nada", "parcial"] = "todo_o_nada"
+
+class BulkItemResult(BaseModel):
+    indice: int
+    clave: Optional[str] = None
+    ok: bool
+    status: int
+    # True si la clave ya se había procesado: se devuelve el resultado guardado
+    repetido: bool = False
+    resultado: Optional[Any] = None
+    detalle: Optional[Any] = None
+
+class BulkResponse(BaseModel):
+    ok: bool
+    modo: str
+    aplicados: int
+    repetidos: int
+    fallidos: int
+    resultados: List[BulkItemResult]
@@ -1,4 +1,5 @@
 from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
 
 class Producto(BaseModel):
     id: int
@@ -7,3 +8,19 @@ class Producto(BaseModel):
     stock: int = Field(ge=0)
     costo: float = Field(ge=0)
     categoria: str
+    # Umbral de alerta de stock bajo; sin él se usa el de la categoría o el general
+    stock_minimo: Optional[int] = Field(default=None, ge=0)
+
+class AlertaStock(BaseModel):
+    producto_id: int
+    nombre: str
+    categoria: str
+    stock: int
+    stock_minimo: int
+    faltante: int
+
+class BusquedaProductos(BaseModel):
+    total: int
+    productos: List[Producto]
+    # Categoría -> productos encontrados (sin aplicar el filtro de categoría)
+    facetas: Dict[str, int]
@@ -7,3 +7,13 @@ class ReporteFlujoCaja(BaseModel):
     ventas_totales: float
     ganancias_totales: float
     productos_vendidos: int
+
+class Kpis(BaseModel):
+    empresas: int
+    productos: int
+    stock_total: int
+    valor_inventario: float
+    ventas: int
+    productos_vendidos: int
+    ventas_totales: float
+    ganancias_totales: float
@@ -10,3 +10,6 @@ class Venta(BaseModel):
     cantidad: int = Field(gt=0)
     total: float = Field(ge=0)
     fecha: datetime
+    # Precio y costo del producto al momento de la venta (los fija el servidor)
+    precio_unitario: Optional[float] = Field(default=None, ge=0)
+    costo_unitario: Optional[float] = Field(default=None, ge=0)
@@ -0,0 +1,182 @@
+"""
+Paginación por cursor, proyección de campos y respuestas en streaming para
+los listados (GET /ventas/, /productos/, /empresas/).
+
+Sin parámetros nuevos los listados responden el arreglo completo, que es
+lo que usa el frontend. Con `limit`, `after_id`/`cursor`, `fields` o
+`stream` se pagina, proyecta o transmite por partes:
+
+    GET /ventas/?limit=500                  -> primeros 500 por id
+    GET /ventas/?limit=500&cursor=<X-Next-Cursor de la respuesta anterior>
+    GET /productos/?fields=id,nombre,stock
+    GET /ventas/?stream=ndjson              -> una venta por línea
+    GET /ventas/?stream=json                -> arreglo JSON, fila a fila
+
+Cada página se busca por id (búsqueda binaria sobre los ids ordenados de
+la colección, o `id > ? LIMIT ?` en SQLite): recorrer un listado completo
+por cursor cuesta lo mismo que leerlo de una vez.
+
+En todos los casos la respuesta se arma directo desde las filas guardadas,
+sin volver a validar cada fila con Pydantic (EmailStr, fechas): ya se
+validaron al escribirlas. Sólo se recortan a los campos del modelo y se
+serializan con `app.codec`. El response_model de cada ruta se mantiene
+para el esquema OpenAPI. Con INVENTARIO_RESPUESTAS_CONFIABLES=0 el listado
+completo vuelve a pasar por el response_model.
+"""
+from __future__ import annotations
+import base64
+import binascii
+import json
+from bisect import bisect_right
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable, Iterator, Literal, Optional, Protocol, Sequence, Union
+
+from fastapi import HTTPException, Query
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel
+
+from app import codec, config
+
+# Filas por bloque escrito al stream
+STREAM_CHUNK = 500
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+@dataclass
+class ListParams:
+    limit: Optional[int] = None
+    after_id: Optional[int] = None
+    fields: Optional[list[str]] = None
+    stream: Optional[str] = None
+
+    @property
+    def legacy(self) -> bool:
+        """True si no se pidió nada nuevo: respuesta clásica por response_model."""
+        return self.limit is None and self.after_id is None and self.fields is None and self.stream is None
+
+
+def encode_cursor(after_id: int) -> str:
+    raw = json.dumps({"after_id": after_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        after_id = json.loads(raw)["after_id"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    if not isinstance(after_id, int):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    return after_id
+
+
+async def list_params(
+    limit: Optional[int] = Query(default=None, ge=1, le=10000, description="Máximo de filas a devolver"),
+    after_id: Optional[int] = Query(default=None, description="Devuelve filas con id mayor a este"),
+    cursor: Optional[str] = Query(default=None, description="Cursor opaco (header X-Next-Cursor)"),
+    fields: Optional[str] = Query(default=None, description="Campos a incluir, separados por coma"),
+    stream: Optional[Literal["ndjson", "json"]] = Query(default=None, description="Respuesta en streaming"),
+) -> ListParams:
+    """Dependencia común de los listados (async: sólo valida, no hace I/O)."""
+    if cursor is not None:
+        if after_id is not None:
+            raise HTTPException(status_code=400, detail="Usa after_id o cursor, no ambos")
+        after_id = decode_cursor(cursor)
+    campos = None
+    if fields is not None:
+        campos = [f.strip() for f in fields.split(",") if f.strip()]
+        if not campos:
+            raise HTTPException(status_code=400, detail="fields no puede estar vacío")
+    return ListParams(limit=limit, after_id=after_id, fields=campos, stream=stream)
+
+
+def _id(row: dict):
+    return row["id"]
+
+
+@lru_cache(maxsize=None)
+def _defaults(model: type[BaseModel]) -> dict:
+    """Valor por defecto de cada campo del modelo (None si es obligatorio)."""
+    return {n: (None if f.is_required() else f.default) for n, f in model.model_fields.items()}
+
+
+def _project(rows: Iterable[dict], fields: list[str], defaults: dict) -> Iterator[dict]:
+    todos = fields == list(defaults)
+    for r in rows:
+        # Caso común: la fila guardada ya tiene exactamente los campos del modelo
+        if todos and r.keys() == defaults.keys():
+            yield r
+        else:
+            yield {f: r.get(f, defaults.get(f)) for f in fields}
+
+
+def _ndjson(rows: Iterable[dict]) -> Iterator[bytes]:
+    buf = []
+    for r in rows:
+        buf.append(codec.dumps(r))
+        if len(buf) >= STREAM_CHUNK:
+            yield b"\n".join(buf) + b"\n"
+            buf = []
+    if buf:
+        yield b"\n".join(buf) + b"\n"
+
+
+def _json_array(rows: Iterable[dict]) -> Iterator[bytes]:
+    yield b"["
+    primero = True
+    for chunk in _ndjson(rows):
+        # Cada bloque NDJSON pasa a ser un tramo de elementos del arreglo
+        piezas = chunk.rstrip(b"\n").replace(b"\n", b",")
+        yield piezas if primero else b"," + piezas
+        primero = False
+    yield b"]"
+
+
+class Paginable(Protocol):
+    """Colección que entrega sus filas ordenadas por id desde un after_id (Collection, SqliteCollection)."""
+
+    def page(self, after_id=None, limit: Optional[int] = None) -> list[dict]: ...
+
+
+def _pagina(rows: Union[Sequence[dict], Paginable], params: ListParams) -> Sequence[dict]:
+    """
+    Filas con id mayor a after_id, hasta limit. Una colección busca la
+    página por su lista de ids (o el índice de la base); una lista ya
+    ordenada por id se corta con búsqueda binaria. Ninguna recorre todo.
+    """
+    if hasattr(rows, "page"):
+        return rows.page(params.after_id, params.limit)
+    i = 0 if params.after_id is None else bisect_right(rows, params.after_id, key=_id)
+    return rows[i:] if params.limit is None else rows[i:i + params.limit]
+
+
+def list_response(rows: Union[Sequence[dict], Paginable], model: type[BaseModel], params: ListParams):
+    """
+    Arma la respuesta de un listado a partir de las filas guardadas
+    ordenadas por id, o de la colección completa (con `page`): aplica
+    after_id/limit y la proyección, y las serializa de una vez o en
+    streaming.
+    """
+    if params.legacy and not config.TRUSTED_RESPONSES:
+        # FastAPI valida y serializa con el response_model de la ruta
+        return _pagina(rows, params)
+    defaults = _defaults(model)
+    campos = params.fields or list(defaults)
+    desconocidos = [f for f in campos if f not in model.model_fields]
+    if desconocidos:
+        raise HTTPException(status_code=400, detail=f"Campos desconocidos: {', '.join(desconocidos)}")
+
+    pagina = _pagina(rows, params)
+    headers = {}
+    if params.limit is not None and len(pagina) == params.limit:
+        headers[NEXT_CURSOR_HEADER] = encode_cursor(pagina[-1]["id"])
+
+    filas = _project(pagina, campos, defaults)
+    if params.stream == "ndjson":
+        return StreamingResponse(_ndjson(filas), media_type="application/x-ndjson", headers=headers)
+    if params.stream == "json":
+        return StreamingResponse(_json_array(filas), media_type="application/json", headers=headers)
+    return Response(content=codec.dumps(list(filas)), media_type="application/json", headers=headers)
@@ -1,123 +1,476 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from app.utils import load_json, save_json, DATA_DIR
+import io
+import os
+import shutil
+import tempfile
+import typing
+from typing import Iterator, Literal, Optional
+import numpy as np
+import pandas as pd
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+from app import config
+from app.concurrency import heavy_pool, offload
+from app.jobs import Job, jobs
+from app.models.producto import Producto
+from app.models.venta import Venta
+from app.routes.ventas import rango_fechas
+from app.storage.store import store
 from openpyxl import load_workbook
 
 router = APIRouter(prefix="/productos", tags=["Productos"])
+# Exportación de ventas (mismos filtros que GET /ventas/)
+ventas_router = APIRouter(prefix="/ventas", tags=["Ventas"])
 
-PRODUCTOS_FILE = DATA_DIR / "productos.json"
+# Filas por bloque al exportar
+EXPORT_CHUNK = 5000
+
+SHEET_NAME = "productos"
+REQUIRED = {"nombre", "categoria", "precio"}
+
+
+def leer_encabezados(path: str):
+    """Abre el libro en modo streaming y devuelve (libro, hoja, encabezados)."""
+    try:
+        wb = load_workbook(path, read_only=True, data_only=True)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Excel inválido: {e}")
+
+    if SHEET_NAME not in wb.sheetnames:
+        wb.close()
+        raise HTTPException(status_code=400, detail="La hoja debe llamarse 'productos'")
+
+    ws = wb[SHEET_NAME]
+    primera = next(ws.iter_rows(min_row=1, max_row=1, values_only=True), ())
+    headers = [str(v).strip().lower() if v else "" for v in primera]
+
+    if not REQUIRED.issubset(set(headers)):
+        wb.close()
+        raise HTTPException(
+            status_code=400,
+            detail=f"Faltan columnas obligatorias. Requiere: {sorted(list(REQUIRED))}"
+        )
+    return wb, ws, headers
+
+
+def parse_fila(row: tuple, idx: dict) -> dict:
+    def get(col, default=None):
+        j = idx.get(col)
+        if j is None or j >= len(row):
+            return default
+        v = row[j]
+        return default if v is None else v
+
+    pid = get("id", None)
+    pid = int(pid) if pid not in (None, "") else None
+    # Id 0 o negativo = producto nuevo, como una celda vacía
+    if pid is not None and pid <= 0:
+        pid = None
+
+    nombre = str(get("nombre", "")).strip()
+    categoria = str(get("categoria", "")).strip()
+    precio = float(get("precio", 0) or 0)
+    costo = float(get("costo", 0) or 0)
+    stock = int(float(get("stock", 0) or 0))
+
+    if not nombre or not categoria:
+        raise ValueError("nombre/categoria vacíos")
+    if precio < 0 or costo < 0 or stock < 0:
+        raise ValueError("precio/costo/stock no pueden ser negativos")
+
+    prod = {"id": pid, "nombre": nombre, "categoria": categoria, "precio": precio, "costo": costo, "stock": stock}
+    # Sin la columna, un producto existente conserva su umbral
+    if "stock_minimo" in idx:
+        minimo = get("stock_minimo", "")
+        prod["stock_minimo"] = int(float(minimo)) if str(minimo).strip() != "" else None
+        if prod["stock_minimo"] is not None and prod["stock_minimo"] < 0:
+            raise ValueError("stock_minimo no puede ser negativo")
+    return prod
+
+
+def max_id_explicito(ws, idx: dict) -> int:
+    """Mayor id escrito en el archivo (sólo recorre esa columna)."""
+    j = idx.get("id")
+    if j is None:
+        return 0
+    top = 0
+    for (v,) in ws.iter_rows(min_row=2, min_col=j + 1, max_col=j + 1, values_only=True):
+        try:
+            top = max(top, int(v))
+        except (TypeError, ValueError):
+            continue
+    return top
+
+
+class ImportadorProductos:
+    """
+    Confirma productos importados en lotes, cada uno en su propia
+    transacción. Los ids de las filas que no traen uno se reservan en bloque
+    de la secuencia de productos, por encima de cualquier id del archivo
+    (`max_id_archivo`), así un id explícito más abajo nunca pisa un producto
+    recién creado.
+    """
+
+    def __init__(self, chunk_size: int, max_id_archivo: int = 0):
+        self.chunk_size = chunk_size
+        self.max_id_archivo = max_id_archivo
+        self.creados = 0
+        self.actualizados = 0
+        self.errores: list[dict] = []
+        self._lote: list[dict] = []
+
+    def agregar(self, prod: dict) -> None:
+        self._lote.append(prod)
+        if len(self._lote) >= self.chunk_size:
+            self.confirmar()
+
+    def error(self, fila: int, mensaje: str) -> None:
+        self.errores.append({"fila": fila, "error": mensaje})
+
+    def confirmar(self) -> None:
+        if not self._lote:
+            return
+        with store.transaction("productos") as tx:
+            tx.advance("productos", self.max_id_archivo)
+            sin_id = sum(1 for prod in self._lote if prod["id"] is None)
+            siguiente = tx.reserve("productos", sin_id) if sin_id else 0
+            for prod in self._lote:
+                pid = prod["id"]
+                actual = tx.get("productos", pid) if pid is not None else None
+                if actual is not None:
+                    tx.put("productos", {**actual, **prod})
+                    self.actualizados += 1
+                    continue
+                if pid is None:
+                    prod["id"] = siguiente
+                    siguiente += 1
+                tx.insert("productos", prod)
+                self.creados += 1
+        self._lote.clear()
+
+    def resultado(self) -> dict:
+        self.confirmar()
+        return {
+            "ok": True,
+            "creados": self.creados,
+            "actualizados": self.actualizados,
+            "errores": self.errores[:50],  # evita respuestas gigantes
+            "total_errores": len(self.errores),
+        }
+
+
+def importar_productos(path: str, chunk_size: int, job: Optional[Job] = None) -> dict:
+    """Importa la hoja 'productos' fila a fila (read_only + iter_rows), en lotes de `chunk_size`."""
+    wb, ws, headers = leer_encabezados(path)
+    try:
+        idx = {h: i for i, h in enumerate(headers) if h}
+        if job is not None and ws.max_row:
+            job.total = max(0, ws.max_row - 1)
+        importador = ImportadorProductos(chunk_size, max_id_explicito(ws, idx))
+
+        # Procesar filas desde la 2
+        for row_num, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
+            if job is not None:
+                job.procesadas = row_num - 1
+            # Saltar filas vacías
+            if all(v is None or str(v).strip() == "" for v in row):
+                continue
+            try:
+                prod = parse_fila(row, idx)
+            except Exception as e:
+                importador.error(row_num, str(e))
+                continue
+            importador.agregar(prod)
+        return importador.resultado()
+    finally:
+        wb.close()
+
+
+def guardar_temporal(file: UploadFile, suffix: str = ".xlsx") -> str:
+    """Copia la subida a un archivo temporal por bloques, sin cargarla entera en memoria."""
+    tmp = tempfile.NamedTemporaryFile(prefix="importacion-", suffix=suffix, delete=False)
+    with tmp:
+        shutil.copyfileobj(file.file, tmp, 1024 * 1024)
+    return tmp.name
 
-def next_id(items: list[dict]) -> int:
-    return (max((i.get("id", 0) for i in items), default=0) + 1)
 
 @router.post("/importar_excel")
-async def importar_productos_excel(file: UploadFile = File(...)):
+@offload(heavy_pool)
+def importar_productos_excel(
+    file: UploadFile = File(...),
+    en_segundo_plano: bool = Query(default=False, description="Devuelve un job_id y procesa en segundo plano"),
+    lote: int = Query(default=config.IMPORT_CHUNK_SIZE, ge=1, le=100000, description="Filas por transacción"),
+):
     if not file.filename.lower().endswith(".xlsx"):
         raise HTTPException(status_code=400, detail="Sube un archivo .xlsx")
 
-    content = await file.read()
-
+    path = guardar_temporal(file)
     try:
-        wb = load_workbook(filename=bytes(content))
-    except Exception:
-        # openpyxl no soporta "filename=bytes" directo en todas las versiones
-        # alternativa: usar BytesIO
-        from io import BytesIO
+        # Validar hoja y encabezados antes de aceptar el trabajo
+        leer_encabezados(path)[0].close()
+    except BaseException:
+        os.unlink(path)
+        raise
+
+    if not en_segundo_plano:
         try:
-            wb = load_workbook(BytesIO(content))
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Excel inválido: {e}")
+            return importar_productos(path, lote)
+        finally:
+            os.unlink(path)
+
+    job = jobs.submit(
+        "importar_excel",
+        lambda j: importar_productos(path, lote, j),
+        on_done=lambda: os.unlink(path),
+    )
+    return JSONResponse(status_code=202, content={"job_id": job.id, "estado": job.estado})
 
-    sheet_name = "productos"
-    if sheet_name not in wb.sheetnames:
-        raise HTTPException(status_code=400, detail="La hoja debe llamarse 'productos'")
 
-    ws = wb[sheet_name]
+@router.get("/importar_excel/{job_id}")
+async def estado_importacion(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return job.to_dict()
 
-    # Leer headers (fila 1)
-    headers = []
-    for cell in ws[1]:
-        headers.append(str(cell.value).strip().lower() if cell.value else "")
 
-    required = {"nombre", "categoria", "precio"}
-    if not required.issubset(set(headers)):
+# ---------- CSV / Parquet ----------
+
+def requiere_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        raise HTTPException(status_code=501, detail="Parquet requiere instalar pyarrow")
+
+
+def _texto(df: pd.DataFrame, col: str) -> pd.Series:
+    if col not in df:
+        return pd.Series("", index=df.index, dtype="object")
+    return df[col].astype("string").str.strip().fillna("").astype("object")
+
+
+def _numero(df: pd.DataFrame, col: str, default: float) -> tuple[pd.Series, pd.Series]:
+    """(valores, inválidos): vacío -> default; texto no numérico -> inválido."""
+    if col not in df:
+        return pd.Series(default, index=df.index, dtype="float64"), pd.Series(False, index=df.index)
+    raw = df[col]
+    vacio = raw.isna() | (raw.astype("string").str.strip() == "")
+    num = pd.to_numeric(raw.where(~vacio), errors="coerce").astype("float64")
+    return num.where(~vacio, default), num.isna() & ~vacio
+
+
+def parse_bloque(df: pd.DataFrame, primera_fila: int, importador: ImportadorProductos) -> None:
+    """Valida un bloque de productos con operaciones por columna y lo entrega al importador."""
+    df = df.rename(columns=lambda c: str(c).strip().lower()).reset_index(drop=True)
+    filas = np.arange(primera_fila, primera_fila + len(df))
+
+    vacias = df.isna().all(axis=1) | (df.astype("string").apply(lambda c: c.str.strip()).fillna("") == "").all(axis=1)
+    nombre = _texto(df, "nombre")
+    categoria = _texto(df, "categoria")
+    ids, id_malo = _numero(df, "id", np.nan)
+    precio, precio_malo = _numero(df, "precio", 0.0)
+    costo, costo_malo = _numero(df, "costo", 0.0)
+    stock, stock_malo = _numero(df, "stock", 0.0)
+    stock = np.trunc(stock)
+    con_minimo = "stock_minimo" in df
+    minimo, minimo_malo = _numero(df, "stock_minimo", np.nan)
+    minimo = np.trunc(minimo)
+
+    errores = [
+        (id_malo | precio_malo | costo_malo | stock_malo | minimo_malo, "valor numérico inválido"),
+        ((nombre == "") | (categoria == ""), "nombre/categoria vacíos"),
+        ((precio < 0) | (costo < 0) | (stock < 0), "precio/costo/stock no pueden ser negativos"),
+        (minimo < 0, "stock_minimo no puede ser negativo"),
+    ]
+    con_error = pd.Series(False, index=df.index)
+    encontrados = []
+    for mask, mensaje in errores:
+        nuevos = mask & ~con_error & ~vacias
+        encontrados += [(int(fila), mensaje) for fila in filas[nuevos.to_numpy()]]
+        con_error |= nuevos
+    for fila, mensaje in sorted(encontrados):
+        importador.error(fila, mensaje)
+
+    ok = (~con_error & ~vacias).to_numpy()
+    filas_ok = zip(ids[ok], nombre[ok], categoria[ok], precio[ok], costo[ok], stock[ok], minimo[ok])
+    for pid, n, c, pr, co, st, mi in filas_ok:
+        prod = {
+            "id": None if np.isnan(pid) or pid <= 0 else int(pid),
+            "nombre": n,
+            "categoria": c,
+            "precio": float(pr),
+            "costo": float(co),
+            "stock": int(st),
+        }
+        # Sin la columna, un producto existente conserva su umbral
+        if con_minimo:
+            prod["stock_minimo"] = None if np.isnan(mi) else int(mi)
+        importador.agregar(prod)
+
+
+def _max_id(serie: pd.Series) -> int:
+    m = pd.to_numeric(serie, errors="coerce").max()
+    return 0 if pd.isna(m) else int(m)
+
+
+def importar_productos_tabla(path: str, formato: str, chunk_size: int) -> dict:
+    """Importa productos desde CSV o Parquet, leyendo y validando por bloques de `chunk_size` filas."""
+    if formato == "csv":
+        try:
+            nombres = list(pd.read_csv(path, nrows=0).columns)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"CSV inválido: {e}")
+        columnas = [str(c).strip().lower() for c in nombres]
+        id_col = next((c for c in nombres if str(c).strip().lower() == "id"), None)
+        max_id = _max_id(pd.read_csv(path, usecols=[id_col])[id_col]) if id_col is not None else 0
+        bloques = pd.read_csv(path, chunksize=chunk_size, dtype=str, keep_default_na=False, na_values=[""])
+    else:
+        requiere_pyarrow()
+        import pyarrow.parquet as pq
+        try:
+            pf = pq.ParquetFile(path)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Parquet inválido: {e}")
+        nombres = pf.schema_arrow.names
+        columnas = [str(c).strip().lower() for c in nombres]
+        id_col = next((c for c in nombres if str(c).strip().lower() == "id"), None)
+        max_id = _max_id(pf.read(columns=[id_col]).column(0).to_pandas()) if id_col is not None else 0
+        bloques = (b.to_pandas() for b in pf.iter_batches(batch_size=chunk_size))
+
+    if not REQUIRED.issubset(set(columnas)):
         raise HTTPException(
             status_code=400,
-            detail=f"Faltan columnas obligatorias. Requiere: {sorted(list(required))}"
+            detail=f"Faltan columnas obligatorias. Requiere: {sorted(list(REQUIRED))}"
         )
 
-    # Map header -> index
-    idx = {h: i for i, h in enumerate(headers)}
+    importador = ImportadorProductos(chunk_size, max_id)
+    # Fila 1 = encabezados, igual que en Excel
+    fila = 2
+    for df in bloques:
+        parse_bloque(df, fila, importador)
+        fila += len(df)
+    return importador.resultado()
 
-    productos = load_json(PRODUCTOS_FILE, default=[])
-    prod_by_id = {p["id"]: p for p in productos}
 
-    creados = 0
-    actualizados = 0
-    errores = []
+@router.post("/importar_csv")
+@offload(heavy_pool)
+def importar_productos_csv(
+    file: UploadFile = File(...),
+    lote: int = Query(default=config.IMPORT_CHUNK_SIZE, ge=1, le=100000, description="Filas por transacción"),
+):
+    if not file.filename.lower().endswith(".csv"):
+        raise HTTPException(status_code=400, detail="Sube un archivo .csv")
+    path = guardar_temporal(file, ".csv")
+    try:
+        return importar_productos_tabla(path, "csv", lote)
+    finally:
+        os.unlink(path)
 
-    # Procesar filas desde la 2
-    for row_num in range(2, ws.max_row + 1):
-        row = [ws.cell(row=row_num, column=c+1).value for c in range(len(headers))]
 
-        # Saltar filas vacías
-        if all(v is None or str(v).strip() == "" for v in row):
-            continue
+@router.post("/importar_parquet")
+@offload(heavy_pool)
+def importar_productos_parquet(
+    file: UploadFile = File(...),
+    lote: int = Query(default=config.IMPORT_CHUNK_SIZE, ge=1, le=100000, description="Filas por transacción"),
+):
+    if not file.filename.lower().endswith(".parquet"):
+        raise HTTPException(status_code=400, detail="Sube un archivo .parquet")
+    requiere_pyarrow()
+    path = guardar_temporal(file, ".parquet")
+    try:
+        return importar_productos_tabla(path, "parquet", lote)
+    finally:
+        os.unlink(path)
 
-        def get(col, default=None):
-            j = idx.get(col)
-            if j is None:
-                return default
-            v = row[j]
-            return default if v is None else v
 
-        try:
-            pid = get("id", None)
-            pid = int(pid) if pid not in (None, "") else None
-
-            nombre = str(get("nombre", "")).strip()
-            categoria = str(get("categoria", "")).strip()
-            precio = float(get("precio", 0) or 0)
-            costo = float(get("costo", 0) or 0)
-            stock = int(float(get("stock", 0) or 0))
-
-            if not nombre or not categoria:
-                raise ValueError("nombre/categoria vacíos")
-            if precio < 0 or costo < 0 or stock < 0:
-                raise ValueError("precio/costo/stock no pueden ser negativos")
-
-            if pid and pid in prod_by_id:
-                # actualizar
-                prod = prod_by_id[pid]
-                prod["nombre"] = nombre
-                prod["categoria"] = categoria
-                prod["precio"] = precio
-                prod["costo"] = costo
-                prod["stock"] = stock
-                actualizados += 1
-            else:
-                # crear
-                new_id = pid if pid and pid not in prod_by_id else next_id(productos)
-                prod = {
-                    "id": new_id,
-                    "nombre": nombre,
-                    "categoria": categoria,
-                    "precio": precio,
-                    "costo": costo,
-                    "stock": stock,
-                }
-                productos.append(prod)
-                prod_by_id[new_id] = prod
-                creados += 1
+def columnas_modelo(model) -> dict[str, str]:
+    """Columna -> dtype de pandas según el modelo (enteros opcionales como Int64)."""
+    tipos = {}
+    for nombre, campo in model.model_fields.items():
+        ann = campo.annotation
+        args = (ann, *typing.get_args(ann))
+        tipos[nombre] = "Int64" if int in args else "float64" if float in args else "object"
+    return tipos
 
-        except Exception as e:
-            errores.append({"fila": row_num, "error": str(e)})
 
-    save_json(PRODUCTOS_FILE, productos)
+def _bloques(rows: list[dict], columnas: dict[str, str]) -> Iterator[pd.DataFrame]:
+    for i in range(0, len(rows), EXPORT_CHUNK):
+        df = pd.DataFrame.from_records(
+            [{c: r.get(c) for c in columnas} for r in rows[i:i + EXPORT_CHUNK]],
+            columns=list(columnas),
+        )
+        yield df.astype(columnas)
+
+
+def _csv(rows: list[dict], columnas: dict[str, str]) -> Iterator[str]:
+    yield ",".join(columnas) + "\n"
+    for df in _bloques(rows, columnas):
+        yield df.to_csv(index=False, header=False)
+
+
+class _Salida(io.RawIOBase):
+    """Destino de escritura que acumula bytes para entregarlos al stream por partes."""
+
+    def __init__(self):
+        self.partes: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self.partes.append(bytes(b))
+        return len(b)
+
+    def tomar(self) -> bytes:
+        out = b"".join(self.partes)
+        self.partes.clear()
+        return out
+
+
+def _parquet(rows: list[dict], columnas: dict[str, str]) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    salida = _Salida()
+    writer = None
+    for df in _bloques(rows, columnas):
+        tabla = pa.Table.from_pandas(df, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(pa.PythonFile(salida, mode="w"), tabla.schema)
+        # Cada bloque es un row group; lo ya escrito se entrega de inmediato
+        writer.write_table(tabla.cast(writer.schema))
+        yield salida.tomar()
+    if writer is None:
+        vacia = pa.Table.from_pandas(pd.DataFrame(columns=list(columnas)).astype(columnas), preserve_index=False)
+        writer = pq.ParquetWriter(pa.PythonFile(salida, mode="w"), vacia.schema)
+    writer.close()
+    yield salida.tomar()
+
+
+def exportar(rows: list[dict], columnas: dict[str, str], formato: str, nombre: str) -> StreamingResponse:
+    rows = sorted(rows, key=lambda r: r["id"])
+    headers = {"Content-Disposition": f'attachment; filename="{nombre}.{formato}"'}
+    if formato == "parquet":
+        requiere_pyarrow()
+        return StreamingResponse(_parquet(rows, columnas), media_type="application/vnd.apache.parquet", headers=headers)
+    return StreamingResponse(_csv(rows, columnas), media_type="text/csv; charset=utf-8", headers=headers)
+
+
+@router.get("/exportar")
+@offload(heavy_pool, timeout=config.READ_TIMEOUT)
+def exportar_productos(formato: Literal["csv", "parquet"] = Query(default="csv")):
+    return exportar(store.productos.all(), columnas_modelo(Producto), formato, "productos")
+
 
-    return {
-        "ok": True,
-        "creados": creados,
-        "actualizados": actualizados,
-        "errores": errores[:50],  # evita respuestas gigantes
-        "total_errores": len(errores),
-    }
+@ventas_router.get("/exportar")
+@offload(heavy_pool, timeout=config.READ_TIMEOUT)
+def exportar_ventas(
+    formato: Literal["csv", "parquet"] = Query(default="csv"),
+    empresa_id: Optional[int] = Query(default=None),
+    producto_id: Optional[int] = Query(default=None),
+    desde: Optional[str] = Query(default=None, description="ISO date-time"),
+    hasta: Optional[str] = Query(default=None, description="ISO date-time"),
+):
+    d, h = rango_fechas(desde, hasta)
+    rows = store.query_ventas(empresa_id=empresa_id, producto_id=producto_id, desde=d, hasta=h)
+    return exportar(rows, columnas_modelo(Venta), formato, "ventas")
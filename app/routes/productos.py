@@ -1,54 +1,123 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
-from app.models.producto import Producto
-from app.utils import load_json, save_json, DATA_DIR
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from starlette.concurrency import run_in_threadpool
+from typing import List, Literal, Optional
+from app import sse
+from app.models.producto import AlertaStock, BusquedaProductos, Producto
+from app.storage.store import store
+from app.concurrency import io_pool, offload
+from app.pagination import ListParams, list_params, list_response
 
 router = APIRouter(prefix="/productos", tags=["Productos"])
 
-PRODUCTOS_FILE = DATA_DIR / "productos.json"
+@router.get("/", response_model=List[Producto])
+@offload(io_pool)
+def listar_productos(
+    categoria: Optional[str] = Query(default=None),
+    params: ListParams = Depends(list_params),
+):
+    # Por categoría se resuelve con el índice, sin recorrer el catálogo; sin filtro
+    # la colección busca directo la página pedida
+    rows = store.productos.find("categoria", categoria) if categoria is not None else store.productos
+    return list_response(rows, Producto, params)
 
-def next_id(items: list[dict]) -> int:
-    return (max((i.get("id", 0) for i in items), default=0) + 1)
+# Antes que /{producto_id}
+@router.get("/buscar", response_model=BusquedaProductos)
+@offload(io_pool)
+def buscar_productos(
+    q: Optional[str] = Query(default=None, max_length=200, description="Palabras o comienzos de palabras del nombre"),
+    categoria: Optional[List[str]] = Query(default=None, description="Una o más categorías"),
+    precio_min: Optional[float] = Query(default=None, ge=0),
+    precio_max: Optional[float] = Query(default=None, ge=0),
+    stock_min: Optional[int] = Query(default=None),
+    stock_max: Optional[int] = Query(default=None),
+    orden: Literal["relevancia", "nombre", "precio", "-precio", "stock"] = Query(default="relevancia"),
+    limite: int = Query(default=20, ge=1, le=200),
+    offset: int = Query(default=0, ge=0, le=10000),
+):
+    """
+    Búsqueda por nombre (prefijo, sin distinguir tildes ni mayúsculas) con
+    filtros de categoría, precio y stock; resuelta con el índice en memoria.
+    """
+    store.ensure_fresh()
+    return store.search.buscar(
+        q, categoria, precio_min, precio_max, stock_min, stock_max, orden, limite, offset
+    )
 
-@router.get("/", response_model=List[Producto])
-def listar_productos():
-    return load_json(PRODUCTOS_FILE, default=[])
+@router.get("/alertas", response_model=List[AlertaStock])
+@offload(io_pool)
+def alertas_stock(categoria: Optional[str] = Query(default=None)):
+    # Conjunto mantenido con cada cambio de stock: no recorre el catálogo
+    store.ensure_fresh()
+    return store.alerts.alertas(categoria)
+
+def _ultimo_evento(request: Request) -> tuple[Optional[str], int]:
+    """(generación, versión) del header Last-Event-ID con que se reconecta EventSource."""
+    generacion, _, version = (sse.ultimo_evento(request) or "").partition("-")
+    return (generacion, int(version)) if version.isdigit() else (None, 0)
+
+@router.get("/alertas/stream")
+async def stream_alertas(request: Request):
+    """
+    Server-sent events: primero `estado` con todas las alertas y después un
+    `alerta` por cada cambio (nueva, actualizada o resuelta). Al reconectarse
+    con Last-Event-ID recibe sólo lo que se perdió, si todavía está guardado.
+    """
+    alerts = store.alerts
+    suscripcion = sse.Suscripcion(request, alerts.listeners)
+
+    async def eventos():
+        with suscripcion:
+            await run_in_threadpool(store.ensure_fresh)
+            yield sse.RETRY
+            generacion, version = _ultimo_evento(request)
+            cambios = alerts.cambios_desde(generacion, version) if generacion else None
+            if cambios is None:
+                generacion, version, actuales = alerts.estado()
+                yield sse.evento("estado", {"alertas": actuales}, f"{generacion}-{version}")
+            else:
+                for version, evento in cambios:
+                    yield sse.evento("alerta", evento, f"{generacion}-{version}")
+            async for hubo_cambio in suscripcion.cambios():
+                if not hubo_cambio:
+                    yield sse.KEEPALIVE
+                    continue
+                cambios = alerts.cambios_desde(generacion, version)
+                if cambios is None:
+                    generacion, version, actuales = alerts.estado()
+                    yield sse.evento("estado", {"alertas": actuales}, f"{generacion}-{version}")
+                    continue
+                for version, evento in cambios:
+                    yield sse.evento("alerta", evento, f"{generacion}-{version}")
+
+    return sse.respuesta(eventos())
 
 @router.get("/{producto_id}", response_model=Producto)
+@offload(io_pool)
 def obtener_producto(producto_id: int):
-    productos = load_json(PRODUCTOS_FILE, default=[])
-    for p in productos:
-        if p["id"] == producto_id:
-            return p
-    raise HTTPException(status_code=404, detail="Producto no encontrado")
+    p = store.productos.get(producto_id)
+    if p is None:
+        raise HTTPException(status_code=404, detail="Producto no encontrado")
+    return p
 
 @router.post("/", response_model=Producto, status_code=201)
+@offload(io_pool)
 def crear_producto(producto: Producto):
-    productos = load_json(PRODUCTOS_FILE, default=[])
     data = producto.model_dump()
-    data["id"] = next_id(productos)
-    productos.append(data)
-    save_json(PRODUCTOS_FILE, productos)
-    return data
+    data["id"] = None
+    return store.productos.insert(data)
 
 @router.put("/{producto_id}", response_model=Producto)
+@offload(io_pool)
 def actualizar_producto(producto_id: int, producto: Producto):
-    productos = load_json(PRODUCTOS_FILE, default=[])
-    for idx, p in enumerate(productos):
-        if p["id"] == producto_id:
-            data = producto.model_dump()
-            data["id"] = producto_id
-            productos[idx] = data
-            save_json(PRODUCTOS_FILE, productos)
-            return data
-    raise HTTPException(status_code=404, detail="Producto no encontrado")
+    data = store.productos.update(producto_id, producto.model_dump())
+    if data is None:
+        raise HTTPException(status_code=404, detail="Producto no encontrado")
+    return data
 
 @router.delete("/{producto_id}", response_model=Producto)
+@offload(io_pool)
 def eliminar_producto(producto_id: int):
-    productos = load_json(PRODUCTOS_FILE, default=[])
-    for idx, p in enumerate(productos):
-        if p["id"] == producto_id:
-            eliminado = productos.pop(idx)
-            save_json(PRODUCTOS_FILE, productos)
-            return eliminado
-    raise HTTPException(status_code=404, detail="Producto no encontrado")
+    eliminado = store.productos.delete(producto_id)
+    if eliminado is None:
+        raise HTTPException(status_code=404, detail="Producto no encontrado")
+    return eliminado
@@ -1,25 +1,43 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
 from datetime import datetime
-from app.utils import load_json, DATA_DIR
+from functools import lru_cache
+from typing import Literal, Optional
+from starlette.concurrency import run_in_threadpool
+from app import config, sse
+from app.models.reportes import Kpis
+from app.storage.kpis import CAMPOS, recorrido
+from app.storage.store import store
+from app.concurrency import heavy_pool, io_pool, offload
+from app.utils import parse_iso, to_timestamp
 
 router = APIRouter(prefix="/reportes", tags=["Reportes"])
 
-VENTAS_FILE = DATA_DIR / "ventas.json"
-PRODUCTOS_FILE = DATA_DIR / "productos.json"
+def rango_opcional(desde: Optional[str], hasta: Optional[str]) -> tuple[Optional[float], Optional[float]]:
+    """desde/hasta ISO opcionales -> segundos epoch (None = sin límite)."""
+    try:
+        d = to_timestamp(parse_iso(desde)) if desde else None
+        h = to_timestamp(parse_iso(hasta)) if hasta else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Formato de fecha inválido. Usa ISO 8601.")
+    if d is not None and h is not None and h < d:
+        raise HTTPException(status_code=400, detail="'hasta' debe ser mayor o igual a 'desde'")
+    return d, h
 
-def parse_iso(dt_str: str) -> datetime:
-    """
-    Acepta ISO 8601 estándar y también strings con 'Z' (UTC),
-    por ejemplo: 2026-01-01T03:00:00.000Z
-    """
-    s = (dt_str or "").strip()
-    if not s:
-        raise ValueError("Fecha vacía")
-    if s.endswith("Z"):
-        s = s.replace("Z", "+00:00")
-    return datetime.fromisoformat(s)
+def nombres_productos(filas: list[dict]) -> list[dict]:
+    for f in filas:
+        p = store.productos.get(f["producto_id"])
+        f["nombre"] = p["nombre"] if p else None
+    return filas
+
+@lru_cache(maxsize=config.REPORT_CACHE_SIZE)
+def resumen_cacheado(desde: datetime, hasta: datetime, version: tuple) -> dict:
+    # `version` sólo es parte de la clave: con cualquier escritura en ventas
+    # cambia, y las entradas viejas salen por LRU sin volver a usarse. Editar
+    # productos no la cambia: el margen usa el costo guardado en cada venta
+    return store.resumen_ventas(desde, hasta)
 
 @router.get("/flujo_caja")
+@offload(heavy_pool, timeout=config.READ_TIMEOUT)
 def flujo_caja(
     desde: str = Query(..., description="ISO date-time, ej: 2026-01-01T00:00:00"),
     hasta: str = Query(..., description="ISO date-time, ej: 2026-01-31T23:59:59"),
@@ -30,57 +48,119 @@ def flujo_caja(
     except ValueError:
         raise HTTPException(status_code=400, detail="Formato de fecha inválido. Usa ISO 8601.")
 
-    if fecha_fin < fecha_inicio:
+    if to_timestamp(fecha_fin) < to_timestamp(fecha_inicio):
         raise HTTPException(status_code=400, detail="'hasta' debe ser mayor o igual a 'desde'")
 
-    ventas = load_json(VENTAS_FILE, default=[])
-    productos = load_json(PRODUCTOS_FILE, default=[])
-
-    # Índice por id
-    prod_by_id = {p["id"]: p for p in productos}
-
-    ventas_totales = 0.0
-    ganancias_totales = 0.0
-    productos_vendidos = 0
-
-    for v in ventas:
-        fecha_raw = v.get("fecha")
-        if not fecha_raw:
-            continue
-
-        try:
-            fv = parse_iso(fecha_raw)
-        except ValueError:
-            # si hay registros viejos con fecha mala, los ignoramos
-            continue
-
-        # comparar (si alguno trae tzinfo y otro no, normalizamos quitando tzinfo)
-        # para no caer en: "can't compare offset-naive and offset-aware"
-        if (fv.tzinfo is not None) != (fecha_inicio.tzinfo is not None):
-            fv = fv.replace(tzinfo=None)
-            fi = fecha_inicio.replace(tzinfo=None)
-            ff = fecha_fin.replace(tzinfo=None)
-        else:
-            fi = fecha_inicio
-            ff = fecha_fin
-
-        if fi <= fv <= ff:
-            total = float(v.get("total", 0.0) or 0.0)
-            cantidad = int(v.get("cantidad", 0) or 0)
-
-            ventas_totales += total
-            productos_vendidos += cantidad
-
-            producto = prod_by_id.get(v.get("producto_id"))
-            if producto:
-                precio = float(producto.get("precio", 0.0) or 0.0)
-                costo = float(producto.get("costo", 0.0) or 0.0)
-                ganancias_totales += (precio - costo) * cantidad
+    version = tuple(store.versiones(("ventas",)).items())
+    resumen = resumen_cacheado(fecha_inicio, fecha_fin, version)
 
     return {
         "fecha_inicio": fecha_inicio.isoformat(),
         "fecha_fin": fecha_fin.isoformat(),
-        "ventas_totales": ventas_totales,
-        "ganancias_totales": ganancias_totales,
-        "productos_vendidos": productos_vendidos,
+        **resumen,
     }
+
+@router.get("/ventas_por_periodo")
+@offload(heavy_pool, timeout=config.READ_TIMEOUT)
+def ventas_por_periodo(
+    periodo: Literal["dia", "semana", "mes"] = Query(default="dia"),
+    desde: Optional[str] = Query(default=None, description="ISO date-time"),
+    hasta: Optional[str] = Query(default=None, description="ISO date-time"),
+):
+    """Totales por día, semana (desde el lunes) o mes, en UTC."""
+    d, h = rango_opcional(desde, hasta)
+    return store.analytics.por_periodo(periodo, d, h)
+
+@router.get("/top_productos")
+@offload(heavy_pool, timeout=config.READ_TIMEOUT)
+def top_productos(
+    por: Literal["ingresos", "margen"] = Query(default="ingresos"),
+    limite: int = Query(default=10, ge=1, le=1000),
+    desde: Optional[str] = Query(default=None, description="ISO date-time"),
+    hasta: Optional[str] = Query(default=None, description="ISO date-time"),
+):
+    d, h = rango_opcional(desde, hasta)
+    return nombres_productos(store.analytics.top_productos(por, limite, d, h))
+
+@router.get("/por_empresa")
+@offload(heavy_pool, timeout=config.READ_TIMEOUT)
+def totales_por_empresa(
+    desde: Optional[str] = Query(default=None, description="ISO date-time"),
+    hasta: Optional[str] = Query(default=None, description="ISO date-time"),
+):
+    d, h = rango_opcional(desde, hasta)
+    filas = store.analytics.por_empresa(d, h)
+    for f in filas:
+        e = store.empresas.get(f["empresa_id"])
+        f["nombre"] = e["nombre"] if e else None
+    return filas
+
+@router.get("/rotacion_stock")
+@offload(heavy_pool, timeout=config.READ_TIMEOUT)
+def rotacion_stock(
+    desde: str = Query(..., description="ISO date-time"),
+    hasta: str = Query(..., description="ISO date-time"),
+):
+    """Unidades vendidas / stock promedio y días de inventario por producto."""
+    d, h = rango_opcional(desde, hasta)
+    return nombres_productos(store.analytics.rotacion_stock(d, h))
+
+@router.post("/reconstruir")
+@offload(heavy_pool)
+def reconstruir_agregados():
+    """Recalcula desde cero los agregados en memoria (p. ej. tras editar archivos a mano)."""
+    store.rebuild_views()
+    return {"ok": True}
+
+@router.get("/kpis", response_model=Kpis)
+@offload(io_pool)
+def kpis():
+    """Indicadores del dashboard, leídos de contadores que se mantienen con cada escritura."""
+    store.ensure_fresh()
+    return store.kpis.valores()
+
+@router.get("/kpis/stream")
+async def stream_kpis(request: Request):
+    """
+    Server-sent events: primero `kpis` con todos los indicadores y después
+    un `delta` sólo con los que cambiaron, agrupando los cambios de cada
+    INVENTARIO_KPIS_INTERVALO segundos.
+    """
+    suscripcion = sse.Suscripcion(request, store.kpis.listeners)
+
+    async def eventos():
+        with suscripcion:
+            await run_in_threadpool(store.ensure_fresh)
+            yield sse.RETRY
+            enviados = store.kpis.valores()
+            yield sse.evento("kpis", enviados)
+            async for hubo_cambio in suscripcion.cambios(config.KPIS_INTERVAL):
+                if not hubo_cambio:
+                    yield sse.KEEPALIVE
+                    continue
+                actuales = store.kpis.valores()
+                delta = {k: v for k, v in actuales.items() if enviados.get(k) != v}
+                if delta:
+                    enviados = actuales
+                    yield sse.evento("delta", delta)
+
+    return sse.respuesta(eventos())
+
+@router.post("/kpis/verificar")
+@offload(heavy_pool)
+def verificar_kpis():
+    """
+    Compara los contadores con un recorrido completo de los datos y, si no
+    coinciden, los reconstruye. Bloquea las escrituras mientras compara.
+    """
+    with store.transaction("empresas", "productos", "ventas"):
+        contadores = store.kpis.valores()
+        esperado = recorrido(store)
+        diferencias = {
+            k: {"contador": contadores[k], "recorrido": esperado[k]}
+            for k in CAMPOS
+            if abs(contadores[k] - esperado[k]) > 1e-6 * max(1.0, abs(esperado[k]))
+        }
+        if diferencias:
+            store.kpis.rebuild(store)
+    return {"ok": not diferencias, "diferencias": diferencias}
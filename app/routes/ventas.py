@@ -1,85 +1,83 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from typing import List, Optional
 from datetime import datetime
 from app.models.venta import Venta
-from app.utils import load_json, save_json, DATA_DIR
+from app.storage.store import store
+from app.concurrency import io_pool, offload
+from app.storage.transaction import Transaction
+from app.utils import parse_iso
+from app.pagination import ListParams, list_params, list_response
 from app.models.compra import CompraRequest, CompraResponse
+from app.models.bulk import BulkItem, BulkItemResult, BulkRequest, BulkResponse
 
 
 router = APIRouter(prefix="/ventas", tags=["Ventas"])
 
-VENTAS_FILE = DATA_DIR / "ventas.json"
-PRODUCTOS_FILE = DATA_DIR / "productos.json"
-EMPRESAS_FILE = DATA_DIR / "empresas.json"
-
-def next_id(items: list[dict]) -> int:
-    return (max((i.get("id", 0) for i in items), default=0) + 1)
-
-def get_producto(producto_id: int) -> dict:
-    productos = load_json(PRODUCTOS_FILE, default=[])
-    for p in productos:
-        if p["id"] == producto_id:
-            return p
-    raise HTTPException(status_code=404, detail="Producto no encontrado")
-
-def save_producto(updated: dict) -> None:
-    productos = load_json(PRODUCTOS_FILE, default=[])
-    for idx, p in enumerate(productos):
-        if p["id"] == updated["id"]:
-            productos[idx] = updated
-            save_json(PRODUCTOS_FILE, productos)
-            return
-    raise HTTPException(status_code=404, detail="Producto no encontrado al actualizar")
+def get_producto(tx: Transaction, producto_id: int) -> dict:
+    p = tx.get("productos", producto_id)
+    if p is None:
+        raise HTTPException(status_code=404, detail="Producto no encontrado")
+    return p
 
 def empresa_existe(empresa_id: int) -> bool:
-    empresas = load_json(EMPRESAS_FILE, default=[])
-    return any(e["id"] == empresa_id for e in empresas)
+    return empresa_id in store.empresas
+
+def rango_fechas(desde: Optional[str], hasta: Optional[str]) -> tuple[Optional[datetime], Optional[datetime]]:
+    try:
+        d = parse_iso(desde) if desde else None
+        h = parse_iso(hasta) if hasta else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Formato de fecha inválido. Usa ISO 8601.")
+    return d, h
 
 @router.get("/", response_model=List[Venta])
+@offload(io_pool)
 def listar_ventas(
     empresa_id: Optional[int] = Query(default=None),
     producto_id: Optional[int] = Query(default=None),
     desde: Optional[str] = Query(default=None, description="ISO date-time"),
     hasta: Optional[str] = Query(default=None, description="ISO date-time"),
+    params: ListParams = Depends(list_params),
 ):
-    ventas = load_json(VENTAS_FILE, default=[])
-    out = ventas
-
-    if empresa_id is not None:
-        out = [v for v in out if v.get("empresa_id") == empresa_id]
-    if producto_id is not None:
-        out = [v for v in out if v.get("producto_id") == producto_id]
+    d, h = rango_fechas(desde, hasta)
 
-    if desde:
-        d = datetime.fromisoformat(desde)
-        out = [v for v in out if datetime.fromisoformat(v["fecha"]) >= d]
-    if hasta:
-        h = datetime.fromisoformat(hasta)
-        out = [v for v in out if datetime.fromisoformat(v["fecha"]) <= h]
+    if empresa_id is None and producto_id is None and d is None and h is None:
+        # Sin filtros la colección busca directo la página pedida (por id)
+        out = store.ventas
+    else:
+        # El filtrado lo resuelve el backend (índices en SQLite)
+        out = store.query_ventas(empresa_id=empresa_id, producto_id=producto_id, desde=d, hasta=h)
 
-    return out
+    # Filas ya validadas al guardarlas: se serializan sin pasar por Pydantic
+    return list_response(out, Venta, params)
 
-@router.post("/", response_model=Venta, status_code=201)
-def crear_venta(venta: Venta):
-    # Validar empresa
-    if not empresa_existe(venta.empresa_id):
+def registrar_venta(tx: Transaction, venta: Venta) -> dict:
+    """Valida y agrega la venta a la transacción (empresas, productos y ventas bloqueados)."""
+    # Validar empresa (con la conexión de la transacción: en SQLite pedir otra puede agotar el pool)
+    if not tx.exists("empresas", venta.empresa_id):
         raise HTTPException(status_code=404, detail="Empresa no encontrada")
 
-    # Validar producto y stock
-    producto = get_producto(venta.producto_id)
     if venta.cantidad <= 0:
         raise HTTPException(status_code=400, detail="La cantidad debe ser mayor a 0")
+
+    # Validar producto y stock
+    producto = dict(get_producto(tx, venta.producto_id))
     if producto["stock"] < venta.cantidad:
         raise HTTPException(status_code=409, detail="Stock insuficiente")
 
     # Calcular total en base al precio actual del producto
-    total = float(producto["precio"]) * int(venta.cantidad)
+    precio = float(producto["precio"])
+    total = precio * int(venta.cantidad)
 
     # Persistir venta con id correlativo y fecha actual si viene vacía
-    ventas = load_json(VENTAS_FILE, default=[])
     data = venta.model_dump()
-    data["id"] = next_id(ventas)
+    data["id"] = None
     data["total"] = total
+    # Precio y costo de hoy quedan en la venta: editar el producto no cambia márgenes pasados
+    data["precio_unitario"] = precio
+    data["costo_unitario"] = float(producto["costo"])
     # Si el cliente manda fecha, la respetamos; si no, ponemos now()
     if not data.get("fecha"):
         data["fecha"] = datetime.utcnow().isoformat()
@@ -88,79 +86,84 @@ def crear_venta(venta: Venta):
         if isinstance(data["fecha"], datetime):
             data["fecha"] = data["fecha"].isoformat()
 
-    ventas.append(data)
-    save_json(VENTAS_FILE, ventas)
+    tx.insert("ventas", data)
 
     # Descontar stock
     producto["stock"] = int(producto["stock"]) - int(venta.cantidad)
-    save_producto(producto)
-
+    tx.put("productos", producto)
     return data
 
+@router.post("/", response_model=Venta, status_code=201)
+@offload(io_pool)
+def crear_venta(venta: Venta):
+    # Stock y venta se confirman juntos: nadie más puede vender este stock en medio
+    with store.transaction("empresas", "productos", "ventas") as tx:
+        return registrar_venta(tx, venta)
+
 @router.get("/empresas/{empresa_id}/historial", response_model=List[Venta])
+@offload(io_pool)
 def historial_por_empresa(empresa_id: int):
     if not empresa_existe(empresa_id):
         raise HTTPException(status_code=404, detail="Empresa no encontrada")
 
-    ventas = load_json(VENTAS_FILE, default=[])
-    historial = [v for v in ventas if v.get("empresa_id") == empresa_id]
+    historial = store.query_ventas(empresa_id=empresa_id)
     if not historial:
         raise HTTPException(status_code=404, detail="No se encontraron ventas para esta empresa")
-    return historial
+    return list_response(historial, Venta, ListParams())
 
-@router.post("/compra", response_model=CompraResponse, status_code=201)
-def crear_compra_multiple(req: CompraRequest):
+def registrar_compra(tx: Transaction, req: CompraRequest) -> dict:
+    """Valida la compra completa y agrega sus líneas a la transacción; si algo falla no escribe nada."""
     # Validar empresa
-    if not empresa_existe(req.empresa_id):
+    if not tx.exists("empresas", req.empresa_id):
         raise HTTPException(status_code=404, detail="Empresa no encontrada")
 
     if not req.items:
         raise HTTPException(status_code=400, detail="La compra debe incluir al menos 1 producto")
 
-    # Cargar data
-    ventas = load_json(VENTAS_FILE, default=[])
-
-    # Generar compra_id correlativo (independiente de venta id)
-    compra_id = max((v.get("compra_id", 0) or 0 for v in ventas), default=0) + 1
-
-    # Pre-cargar productos y validar stock completo antes de descontar
-    productos = load_json(PRODUCTOS_FILE, default=[])
-    prod_by_id = {p["id"]: p for p in productos}
-
-    # Validaciones
+    # Pre-cargar productos (copias) y validar stock completo antes de descontar
+    prod_by_id = {}
+    requerido: dict[int, int] = {}
     for item in req.items:
-        if item.producto_id not in prod_by_id:
+        p = tx.get("productos", item.producto_id)
+        if p is None:
             raise HTTPException(status_code=404, detail=f"Producto no encontrado: {item.producto_id}")
-        if prod_by_id[item.producto_id]["stock"] < item.cantidad:
+        prod_by_id[item.producto_id] = dict(p)
+        requerido[item.producto_id] = requerido.get(item.producto_id, 0) + item.cantidad
+
+    # Validaciones (si un producto viene en varias líneas, se suma lo pedido)
+    for producto_id, cantidad in requerido.items():
+        if prod_by_id[producto_id]["stock"] < cantidad:
             raise HTTPException(
                 status_code=409,
-                detail=f"Stock insuficiente para producto {item.producto_id}"
+                detail=f"Stock insuficiente para producto {producto_id}"
             )
 
+    # compra_id correlativo (independiente de venta id), de su propia secuencia
+    compra_id = tx.next_value("compra_id")
+
     # Si pasa validación, crear líneas (ventas) y descontar stock
     fecha = (req.fecha or datetime.utcnow())
     total_compra = 0.0
     total_items = 0
     lineas_creadas = 0
 
-    def next_venta_id() -> int:
-        return (max((i.get("id", 0) for i in ventas), default=0) + 1)
-
     for item in req.items:
         producto = prod_by_id[item.producto_id]
         precio = float(producto["precio"])
         total_linea = precio * int(item.cantidad)
 
         venta_linea = {
-            "id": next_venta_id(),
+            "id": None,
             "compra_id": compra_id,
             "producto_id": item.producto_id,
             "empresa_id": req.empresa_id,
             "cantidad": int(item.cantidad),
             "total": float(total_linea),
             "fecha": fecha.isoformat(),
+            "precio_unitario": precio,
+            "costo_unitario": float(producto["costo"]),
         }
-        ventas.append(venta_linea)
+        tx.insert("ventas", venta_linea)
 
         # Descontar stock
         producto["stock"] = int(producto["stock"]) - int(item.cantidad)
@@ -169,11 +172,9 @@ def crear_compra_multiple(req: CompraRequest):
         total_items += int(item.cantidad)
         lineas_creadas += 1
 
-    # Guardar ventas
-    save_json(VENTAS_FILE, ventas)
-
-    # Guardar productos actualizados (productos.json completo)
-    save_json(PRODUCTOS_FILE, list(prod_by_id.values()))
+    # Productos actualizados; todo se confirma en un único registro al salir
+    for producto in prod_by_id.values():
+        tx.put("productos", producto)
 
     return {
         "compra_id": compra_id,
@@ -183,3 +184,79 @@ def crear_compra_multiple(req: CompraRequest):
         "lineas_creadas": lineas_creadas,
         "fecha": fecha,
     }
+
+@router.post("/compra", response_model=CompraResponse, status_code=201)
+@offload(io_pool)
+def crear_compra_multiple(req: CompraRequest):
+    with store.transaction("empresas", "productos", "ventas") as tx:
+        return registrar_compra(tx, req)
+
+class _Rechazado(Exception):
+    """Aborta la transacción del lote en modo todo_o_nada."""
+
+def aplicar_item(tx: Transaction, indice: int, item: BulkItem) -> BulkItemResult:
+    if item.clave is not None:
+        # Reintento (en otra llamada o repetido en este mismo lote): no se vuelve a aplicar
+        previo = tx.get("idempotencia", item.clave)
+        if previo is not None:
+            return BulkItemResult(
+                indice=indice, clave=item.clave, ok=True, status=previo["status"],
+                repetido=True, resultado=previo["resultado"],
+            )
+    try:
+        if item.venta is not None:
+            resultado = registrar_venta(tx, item.venta)
+        else:
+            resultado = registrar_compra(tx, item.compra)
+    except HTTPException as e:
+        # Las validaciones fallan antes de escribir: la transacción queda como estaba
+        return BulkItemResult(indice=indice, clave=item.clave, ok=False, status=e.status_code, detalle=e.detail)
+
+    resultado = jsonable_encoder(resultado)
+    if item.clave is not None:
+        tx.insert("idempotencia", {
+            "clave": item.clave,
+            "status": 201,
+            "resultado": resultado,
+            "fecha": datetime.utcnow().isoformat(),
+        })
+    return BulkItemResult(indice=indice, clave=item.clave, ok=True, status=201, resultado=resultado)
+
+@router.post("/bulk", response_model=BulkResponse)
+@offload(io_pool)
+def crear_ventas_bulk(req: BulkRequest):
+    """
+    Carga por lotes desde los POS: ventas y compras en una sola transacción
+    (un único registro del journal / un único COMMIT). Los items con `clave`
+    ya procesada devuelven el resultado guardado sin volver a aplicarse.
+    En modo todo_o_nada, si un item falla no se aplica ninguno (409).
+    """
+    resultados: list[BulkItemResult] = []
+    try:
+        with store.transaction("empresas", "idempotencia", "productos", "ventas") as tx:
+            for i, item in enumerate(req.items):
+                r = aplicar_item(tx, i, item)
+                resultados.append(r)
+                if not r.ok and req.modo == "todo_o_nada":
+                    raise _Rechazado()
+    except _Rechazado:
+        # Nada se confirmó: los items que habían pasado quedan como no aplicados
+        for r in resultados[:-1]:
+            if not r.repetido:
+                r.ok, r.status, r.resultado = False, 424, None
+                r.detalle = "No aplicado: otro item del lote falló"
+        respuesta = BulkResponse(
+            ok=False, modo=req.modo, aplicados=0,
+            repetidos=sum(1 for r in resultados if r.repetido),
+            fallidos=1, resultados=resultados,
+        )
+        return JSONResponse(status_code=409, content=jsonable_encoder(respuesta))
+
+    return BulkResponse(
+        ok=all(r.ok for r in resultados),
+        modo=req.modo,
+        aplicados=sum(1 for r in resultados if r.ok and not r.repetido),
+        repetidos=sum(1 for r in resultados if r.repetido),
+        fallidos=sum(1 for r in resultados if not r.ok),
+        resultados=resultados,
+    )
@@ -0,0 +1,95 @@
+"""
+Server-sent events para las vistas en memoria que cambian con cada
+escritura (alertas de stock, indicadores del dashboard).
+
+Cada conexión se suscribe a los avisos de la vista (`Listeners`), que
+llegan desde el hilo que aplicó el cambio y despiertan al stream en el
+event loop; entre cambios se manda un comentario keep-alive. Las
+conexiones duran a lo más INVENTARIO_SSE_DURACION segundos: EventSource
+se reconecta solo (con Last-Event-ID), y así apagar el servidor no queda
+esperando a que cierren todos los dashboards.
+"""
+from __future__ import annotations
+import asyncio
+from typing import AsyncIterator, Optional
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from app import codec, config
+from app.storage.listeners import Listeners
+from app.storage.store import store
+
+# Reconexión rápida al cerrar el stream por duración
+RETRY = b"retry: 1000\n\n"
+KEEPALIVE = b": keepalive\n\n"
+
+
+def evento(nombre: str, data, id: Optional[str] = None) -> bytes:
+    cabecera = (f"id: {id}\n" if id is not None else "") + f"event: {nombre}\ndata: "
+    return cabecera.encode() + codec.dumps(data) + b"\n\n"
+
+
+def ultimo_evento(request: Request) -> Optional[str]:
+    """Header Last-Event-ID con que se reconecta EventSource."""
+    return request.headers.get("last-event-id") or None
+
+
+class Suscripcion:
+    """
+    Avisos de `listeners` para un stream. Se suscribe al entrar, antes de
+    leer el estado inicial, así no se pierde un cambio entre ambos.
+
+        with Suscripcion(request, vista.listeners) as s:
+            yield estado_inicial
+            async for hubo_cambio in s.cambios():
+                ...
+    """
+
+    def __init__(self, request: Request, listeners: Listeners):
+        self.request = request
+        self.listeners = listeners
+        self._loop = asyncio.get_running_loop()
+        self._hay_cambios = asyncio.Event()
+
+    def _avisar(self) -> None:
+        self._loop.call_soon_threadsafe(self._hay_cambios.set)
+
+    def __enter__(self) -> "Suscripcion":
+        self.listeners.add(self._avisar)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.listeners.remove(self._avisar)
+
+    async def cambios(self, intervalo: float = 0.0) -> AsyncIterator[bool]:
+        """
+        True después de cada aviso (agrupando los que lleguen en `intervalo`
+        segundos) y False en cada keep-alive. Termina al cumplirse la
+        duración máxima o si el cliente se desconectó.
+        """
+        fin = self._loop.time() + config.SSE_STREAM_SECONDS
+        while True:
+            restante = fin - self._loop.time()
+            if restante <= 0:
+                return
+            try:
+                await asyncio.wait_for(self._hay_cambios.wait(), min(config.SSE_KEEPALIVE, restante))
+            except asyncio.TimeoutError:
+                if await self.request.is_disconnected():
+                    return
+                # Con varios procesos los cambios de los otros llegan al ponerse al día con el journal
+                await run_in_threadpool(store.ensure_fresh)
+                if not self._hay_cambios.is_set():
+                    yield False
+                    continue
+            if intervalo > 0:
+                await asyncio.sleep(intervalo)
+            self._hay_cambios.clear()
+            yield True
+
+
+def respuesta(eventos: AsyncIterator[bytes]) -> StreamingResponse:
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(eventos, media_type="text/event-stream", headers=headers)
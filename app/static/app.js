@@ -223,13 +223,20 @@ async function loadEmpresas() {
 // ===== PRODUCTOS =======
 // =======================
 $("btnProdLimpiar")?.addEventListener("click", () => {
-  ["prod_id", "prod_nombre", "prod_categoria", "prod_precio", "prod_costo", "prod_stock"]
+  ["prod_id", "prod_nombre", "prod_categoria", "prod_precio", "prod_costo", "prod_stock", "prod_stock_minimo"]
     .forEach((id) => { if ($(id)) $(id).value = ""; });
   clearMsg($("prodMsg"));
 });
 
 $("btnProdRefrescar")?.addEventListener("click", loadProductos);
 
+// Búsqueda mientras se escribe: espera una pausa corta antes de consultar
+let buscarTimer = null;
+$("prod_buscar")?.addEventListener("input", () => {
+  clearTimeout(buscarTimer);
+  buscarTimer = setTimeout(loadProductos, 200);
+});
+
 $("btnProdGuardar")?.addEventListener("click", async () => {
   const msg = $("prodMsg");
   clearMsg(msg);
@@ -242,6 +249,8 @@ $("btnProdGuardar")?.addEventListener("click", async () => {
     precio: Number($("prod_precio")?.value || 0),
     costo: Number($("prod_costo")?.value || 0),
     stock: Number($("prod_stock")?.value || 0),
+    // Vacío = umbral de la categoría (o el general)
+    stock_minimo: $("prod_stock_minimo")?.value ? Number($("prod_stock_minimo").value) : null,
   };
 
   if (!payload.nombre || !payload.categoria) {
@@ -273,10 +282,24 @@ async function loadProductos() {
   tbody.innerHTML = "";
   clearMsg($("prodMsg"));
 
+  const q = $("prod_buscar")?.value?.trim() ?? "";
+  const info = $("prodBuscarInfo");
+  if (info) info.textContent = "";
+
   try {
-    const productos = await api("/productos/");
+    let productos;
+    if (q) {
+      const r = await api(`/productos/buscar?q=${encodeURIComponent(q)}&limite=50`);
+      // Si mientras tanto cambió el texto, esta respuesta ya no sirve
+      if (($("prod_buscar")?.value?.trim() ?? "") !== q) return;
+      productos = r.productos;
+      if (info) info.textContent = `${r.total} encontrados` + (r.total > productos.length ? ` (mostrando ${productos.length})` : "");
+    } else {
+      productos = await api("/productos/");
+    }
+    tbody.innerHTML = "";
     if (!productos.length) {
-      tbody.innerHTML = `<tr><td colspan="6" class="muted">Sin productos aún.</td></tr>`;
+      tbody.innerHTML = `<tr><td colspan="6" class="muted">${q ? "Sin resultados." : "Sin productos aún."}</td></tr>`;
       return;
     }
 
@@ -311,6 +334,7 @@ async function loadProductos() {
           $("prod_precio").value = p.precio ?? 0;
           $("prod_costo").value = p.costo ?? 0;
           $("prod_stock").value = p.stock ?? 0;
+          $("prod_stock_minimo").value = p.stock_minimo ?? "";
           showMsg($("prodMsg"), "Producto cargado para edición.", true);
         }
 
@@ -527,10 +551,45 @@ $("btnReporte")?.addEventListener("click", async () => {
 let chartVentasDia = null;
 let chartTopProductos = null;
 
-const LOW_STOCK_THRESHOLD = 3;
-
 $("btnDashRefresh")?.addEventListener("click", loadDashboard);
 
+// ===== Alertas de stock bajo (calculadas en el servidor; los cambios llegan por SSE)
+const lowStock = new Map();
+let lowStockStream = null;
+
+function renderLowStock() {
+  const lowBody = $("lowStockTable");
+  if (!lowBody) return;
+  const low = [...lowStock.values()].sort((a, b) => b.faltante - a.faltante || a.producto_id - b.producto_id);
+  lowBody.innerHTML = low.length
+    ? low.map((a) => `
+      <tr>
+        <td>${a.nombre}</td>
+        <td>${a.stock}</td>
+        <td>${a.stock_minimo}</td>
+      </tr>
+    `).join("")
+    : `<tr><td colspan="3" class="muted">Sin alertas.</td></tr>`;
+}
+
+function setLowStock(alertas) {
+  lowStock.clear();
+  for (const a of alertas) lowStock.set(a.producto_id, a);
+  renderLowStock();
+}
+
+function watchLowStock() {
+  if (lowStockStream || typeof EventSource === "undefined") return;
+  lowStockStream = new EventSource(base() + "/productos/alertas/stream");
+  lowStockStream.addEventListener("estado", (e) => setLowStock(JSON.parse(e.data).alertas));
+  lowStockStream.addEventListener("alerta", (e) => {
+    const ev = JSON.parse(e.data);
+    if (ev.alerta) lowStock.set(ev.producto_id, ev.alerta);
+    else lowStock.delete(ev.producto_id);
+    renderLowStock();
+  });
+}
+
 // ===== Helpers fechas para selector Día/Semana/Mes
 function pad2(n) { return String(n).padStart(2, "0"); }
 
@@ -586,45 +645,70 @@ function lastNMonthsLabels(n) {
   return out;
 }
 
-function renderVentasChartByPeriodo(ventas, periodo) {
+// Desde dónde pedir los totales por periodo (inicio del primer label del gráfico)
+function desdePeriodo(periodo) {
+  const d = new Date();
+  if (periodo === "semana") {
+    d.setDate(d.getDate() - 7 * 7);
+    d.setDate(d.getDate() - ((d.getDay() + 6) % 7));
+  } else if (periodo === "mes") {
+    d.setMonth(d.getMonth() - 11, 1);
+  } else {
+    d.setDate(d.getDate() - 13);
+  }
+  return `${isoDateOnly(d)}T00:00:00`;
+}
+
+// `filas` viene de /reportes/ventas_por_periodo: un total por periodo (día, lunes o primer día del mes)
+function renderVentasChartByPeriodo(filas, periodo) {
   const title = $("ventasChartTitle");
 
+  let labels;
+  let keyOf;
   if (periodo === "semana") {
     if (title) title.textContent = "Ventas por semana (últimas 8 semanas)";
-    const labels = lastNWeeksLabels(8);
-    const map = Object.fromEntries(labels.map((l) => [l, 0]));
-    for (const v of ventas) {
-      const d = new Date(v.fecha);
-      const key = getISOWeekKey(d);
-      if (map[key] !== undefined) map[key] += Number(v.total || 0);
-    }
-    renderChartVentasDia(labels, labels.map((l) => map[l]));
-    return;
-  }
-
-  if (periodo === "mes") {
+    labels = lastNWeeksLabels(8);
+    keyOf = (p) => getISOWeekKey(new Date(`${p}T00:00:00`));
+  } else if (periodo === "mes") {
     if (title) title.textContent = "Ventas por mes (últimos 12 meses)";
-    const labels = lastNMonthsLabels(12);
-    const map = Object.fromEntries(labels.map((l) => [l, 0]));
-    for (const v of ventas) {
-      const d = new Date(v.fecha);
-      const key = monthKey(d);
-      if (map[key] !== undefined) map[key] += Number(v.total || 0);
-    }
-    renderChartVentasDia(labels, labels.map((l) => map[l]));
-    return;
+    labels = lastNMonthsLabels(12);
+    keyOf = (p) => p.slice(0, 7);
+  } else {
+    if (title) title.textContent = "Ventas por día (últimos 14 días)";
+    labels = lastNDaysLabels(14);
+    keyOf = (p) => p;
   }
 
-  if (title) title.textContent = "Ventas por día (últimos 14 días)";
-  const labels = lastNDaysLabels(14);
   const map = Object.fromEntries(labels.map((l) => [l, 0]));
-  for (const v of ventas) {
-    const day = String(v.fecha).slice(0, 10);
-    if (map[day] !== undefined) map[day] += Number(v.total || 0);
+  for (const f of filas) {
+    const key = keyOf(f.periodo);
+    if (map[key] !== undefined) map[key] += Number(f.ventas_totales || 0);
   }
   renderChartVentasDia(labels, labels.map((l) => map[l]));
 }
 
+// ===== KPIs (contadores del servidor; los cambios llegan por SSE como deltas)
+const kpis = {};
+let kpisStream = null;
+
+function renderKpis() {
+  $("kpi_empresas").textContent = kpis.empresas ?? 0;
+  $("kpi_productos").textContent = kpis.productos ?? 0;
+  $("kpi_stock_total").textContent = Number(kpis.stock_total || 0).toLocaleString("es-CL");
+  $("kpi_ventas_total").textContent = toMoney(kpis.ventas_totales || 0);
+}
+
+function watchKpis() {
+  if (kpisStream || typeof EventSource === "undefined") return;
+  kpisStream = new EventSource(base() + "/reportes/kpis/stream");
+  const actualizar = (e) => {
+    Object.assign(kpis, JSON.parse(e.data));
+    renderKpis();
+  };
+  kpisStream.addEventListener("kpis", actualizar);
+  kpisStream.addEventListener("delta", actualizar);
+}
+
 async function loadDashboard() {
   if (!$("kpi_empresas") || !$("chartVentasDia")) return;
 
@@ -632,58 +716,29 @@ async function loadDashboard() {
   if (msg) clearMsg(msg);
 
   try {
-    const [empresas, productos, ventas] = await Promise.all([
-      api("/empresas/"),
-      api("/productos/"),
-      api("/ventas/"),
+    // Todo agregado en el servidor: el dashboard no descarga empresas, productos ni ventas
+    const periodo = $("ventasPeriodo")?.value || "dia";
+    const desde = encodeURIComponent(desdePeriodo(periodo));
+    const [valores, porPeriodo, top, alertas] = await Promise.all([
+      api("/reportes/kpis"),
+      api(`/reportes/ventas_por_periodo?periodo=${periodo}&desde=${desde}`),
+      api("/reportes/top_productos?limite=5"),
+      api("/productos/alertas"),
     ]);
 
-    $("kpi_empresas").textContent = empresas.length;
-    $("kpi_productos").textContent = productos.length;
-
-    const stockTotal = productos.reduce((acc, p) => acc + Number(p.stock || 0), 0);
-    $("kpi_stock_total").textContent = stockTotal.toLocaleString("es-CL");
-
-    const ventasTotal = ventas.reduce((acc, v) => acc + Number(v.total || 0), 0);
-    $("kpi_ventas_total").textContent = toMoney(ventasTotal);
-
-    const prodById = Object.fromEntries(productos.map((p) => [p.id, p.nombre]));
+    Object.assign(kpis, valores);
+    renderKpis();
+    watchKpis();
 
-    const periodo = $("ventasPeriodo")?.value || "dia";
-    renderVentasChartByPeriodo(ventas, periodo);
-
-    const ingresosPorProducto = {};
-    for (const v of ventas) {
-      const pid = v.producto_id;
-      ingresosPorProducto[pid] = (ingresosPorProducto[pid] || 0) + Number(v.total || 0);
-    }
-    const topProd = Object.entries(ingresosPorProducto)
-      .map(([pid, total]) => ({ pid: Number(pid), total: Number(total) }))
-      .sort((a, b) => b.total - a.total)
-      .slice(0, 5);
+    renderVentasChartByPeriodo(porPeriodo, periodo);
 
     renderChartTopProductos(
-      topProd.map((x) => prodById[x.pid] ?? `Producto ${x.pid}`),
-      topProd.map((x) => x.total)
+      top.map((x) => x.nombre ?? `Producto ${x.producto_id}`),
+      top.map((x) => Number(x.ventas_totales || 0))
     );
 
-    $("lowStockThresholdLabel").textContent = LOW_STOCK_THRESHOLD;
-    const low = productos
-      .filter((p) => Number(p.stock || 0) <= LOW_STOCK_THRESHOLD)
-      .sort((a, b) => Number(a.stock || 0) - Number(b.stock || 0));
-
-    const lowBody = $("lowStockTable");
-    if (lowBody) {
-      lowBody.innerHTML = low.length
-        ? low.map((p) => `
-          <tr>
-            <td>${p.nombre}</td>
-            <td>${p.stock}</td>
-            <td>${toMoney(p.precio)}</td>
-          </tr>
-        `).join("")
-        : `<tr><td colspan="3" class="muted">Sin alertas (stock > ${LOW_STOCK_THRESHOLD}).</td></tr>`;
-    }
+    setLowStock(alertas);
+    watchLowStock();
 
     if (msg) showMsg(msg, "Dashboard actualizado.", true);
   } catch (e) {
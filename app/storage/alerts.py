@@ -0,0 +1,126 @@
+"""
+Alertas de stock bajo mantenidas en memoria a medida que cambian los
+productos.
+
+Un producto está en alerta cuando su stock es menor o igual a su umbral:
+su `stock_minimo` si lo tiene, si no el de su categoría
+(INVENTARIO_STOCK_MINIMO_CATEGORIAS) y si no el general
+(INVENTARIO_STOCK_MINIMO).
+
+Como vista del Store recibe cada cambio de productos ya confirmado (ventas,
+compras, edición, importaciones, y los de otros procesos), así que consultar
+las alertas no recorre el catálogo. Cada cambio del conjunto queda además
+en un registro corto de eventos numerados, que es lo que empuja el stream
+SSE de `/productos/alertas/stream` a los dashboards conectados.
+"""
+from __future__ import annotations
+import threading
+import uuid
+from collections import deque
+from typing import Optional
+
+from app.storage.listeners import Listeners
+
+# Eventos recientes que se guardan para los clientes que se reconectan
+EVENTOS_MAXIMO = 1000
+
+
+class StockAlerts:
+    """Productos en alerta (id -> alerta) y los últimos cambios de ese conjunto."""
+
+    def __init__(self, default: int, por_categoria: dict[str, int]):
+        self.default = default
+        self.por_categoria = por_categoria
+        self.lock = threading.RLock()
+        self.listeners = Listeners()
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            self._alertas: dict[int, dict] = {}
+            # Cambia con cada reconstrucción: los números de evento de antes ya no sirven
+            self.generacion = uuid.uuid4().hex[:8]
+            self.version = 0
+            self._eventos: deque[tuple[int, dict]] = deque(maxlen=EVENTOS_MAXIMO)
+
+    # ---------- umbrales ----------
+
+    def umbral(self, p: dict) -> int:
+        minimo = p.get("stock_minimo")
+        if minimo is not None:
+            return int(minimo)
+        return self.por_categoria.get(p.get("categoria"), self.default)
+
+    def _alerta(self, p: Optional[dict]) -> Optional[dict]:
+        if p is None:
+            return None
+        umbral = self.umbral(p)
+        stock = int(p.get("stock", 0) or 0)
+        if stock > umbral:
+            return None
+        return {
+            "producto_id": p["id"],
+            "nombre": p.get("nombre"),
+            "categoria": p.get("categoria"),
+            "stock": stock,
+            "stock_minimo": umbral,
+            "faltante": umbral - stock,
+        }
+
+    # ---------- mantenimiento ----------
+
+    def rebuild(self, store) -> None:
+        with self.lock:
+            self.reset()
+            for p in store.productos.all():
+                alerta = self._alerta(p)
+                if alerta is not None:
+                    self._alertas[p["id"]] = alerta
+        self.listeners.notify()
+
+    def apply(self, name: str, old: Optional[dict], new: Optional[dict]) -> None:
+        if name != "productos":
+            return
+        pid = (new or old)["id"]
+        alerta = self._alerta(new)
+        with self.lock:
+            anterior = self._alertas.get(pid)
+            if alerta == anterior:
+                return
+            if alerta is None:
+                del self._alertas[pid]
+                evento = {"tipo": "resuelta", "producto_id": pid, "alerta": None}
+            else:
+                self._alertas[pid] = alerta
+                evento = {"tipo": "nueva" if anterior is None else "actualizada", "producto_id": pid, "alerta": alerta}
+            self.version += 1
+            self._eventos.append((self.version, evento))
+        self.listeners.notify()
+
+    # ---------- consulta ----------
+
+    def alertas(self, categoria: Optional[str] = None) -> list[dict]:
+        """Alertas vigentes, primero las de mayor faltante."""
+        with self.lock:
+            out = [dict(a) for a in self._alertas.values() if categoria is None or a["categoria"] == categoria]
+        out.sort(key=lambda a: (-a["faltante"], a["producto_id"]))
+        return out
+
+    def estado(self) -> tuple[str, int, list[dict]]:
+        """(generación, versión, alertas) leídos juntos."""
+        with self.lock:
+            return self.generacion, self.version, self.alertas()
+
+    def cambios_desde(self, generacion: str, version: int) -> Optional[list[tuple[int, dict]]]:
+        """
+        Eventos posteriores a `version`, o None si ya no se pueden reconstruir
+        (otra generación o eventos descartados): el cliente necesita el estado completo.
+        """
+        with self.lock:
+            if generacion != self.generacion or version > self.version:
+                return None
+            if version == self.version:
+                return []
+            if not self._eventos or self._eventos[0][0] > version + 1:
+                return None
+            return [(v, dict(e)) for v, e in self._eventos if v > version]
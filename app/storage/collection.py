@@ -0,0 +1,199 @@
+from __future__ import annotations
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, Optional
+
+from app import codec
+from app.storage.indexes import HashIndex
+from app.utils import load_json
+
+if TYPE_CHECKING:
+    from app.storage.store import Store
+
+
+class Collection:
+    """
+    Colección en memoria respaldada por un snapshot JSON (lista de objetos).
+
+    Se mantiene como un dict indexado por id, más la lista ordenada de ids
+    para paginar por id con búsqueda binaria. Las lecturas van directo al
+    dict; las escrituras pasan por una transacción del Store, que las deja
+    en el journal antes de aplicarlas aquí y marcar la colección como sucia
+    para el próximo checkpoint. Los índices secundarios (`add_index`) se
+    actualizan en el mismo paso.
+    """
+
+    def __init__(self, store: "Store", name: str, path: Path, key: str = "id"):
+        self.store = store
+        self.name = name
+        self.path = path
+        self.key = key
+        # Formato del snapshot al escribirlo (ver app.codec); al leer se reconoce solo
+        self.formato = "json"
+        self.lock = threading.RLock()
+        self._rows: dict = {}
+        # Claves ordenadas: `page` busca el after_id sin recorrer la colección
+        self._ids: list = []
+        self._max_id = 0
+        self._dirty = False
+        self.indexes: dict[str, HashIndex] = {}
+        # Cambia con cada escritura aplicada (ETag / Last-Modified de la API)
+        self.version = 0
+        self.modificado = time.time()
+
+    def add_index(self, field: str, unique: bool = False) -> HashIndex:
+        index = self.indexes[field] = HashIndex(field, unique=unique)
+        index.rebuild(self._rows.values(), self.key)
+        return index
+
+    # ---------- carga / volcado ----------
+
+    def load(self) -> None:
+        """Lee el snapshot desde disco (el Store re-aplica luego el journal)."""
+        rows = self._read_rows()
+        self._rows = {r[self.key]: r for r in rows}
+        self._ids = sorted(self._rows)
+        self._max_id = max((k for k in self._rows if isinstance(k, int)), default=0)
+        self._dirty = False
+        for index in self.indexes.values():
+            index.rebuild(self._rows.values(), self.key)
+        self._touch()
+
+    def _read_rows(self) -> list[dict]:
+        return load_json(self.path, default=[])
+
+    def _touch(self) -> None:
+        self.version += 1
+        self.modificado = time.time()
+
+    @property
+    def dirty(self) -> bool:
+        return self._dirty
+
+    def take_snapshot(self) -> Optional[list[dict]]:
+        """
+        Devuelve una copia (superficial) de las filas si hay cambios pendientes
+        y limpia la marca de sucio. Las filas nunca se mutan in-place, así que
+        la copia puede serializarse fuera del lock.
+        """
+        with self.lock:
+            if not self._dirty:
+                return None
+            self._dirty = False
+            return list(self._rows.values())
+
+    def encode_snapshot(self, snapshot) -> dict[Path, bytes]:
+        """Archivos a escribir en el checkpoint para lo devuelto por `take_snapshot`."""
+        return {self.path: codec.encode(snapshot, self.formato)}
+
+    def cleanup(self) -> None:
+        """Después de un checkpoint confirmado: borra archivos que ya no se usan."""
+
+    def mark_dirty(self) -> None:
+        """Vuelve a marcar la colección como sucia (p. ej. si falló el volcado)."""
+        self._dirty = True
+
+    # ---------- lectura ----------
+
+    def get(self, key) -> Optional[dict]:
+        self.store.ensure_fresh()
+        return self._rows.get(key)
+
+    def __contains__(self, key) -> bool:
+        self.store.ensure_fresh()
+        return key in self._rows
+
+    def __len__(self) -> int:
+        self.store.ensure_fresh()
+        return len(self._rows)
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self.all())
+
+    def all(self) -> list[dict]:
+        self.store.ensure_fresh()
+        with self.lock:
+            return list(self._rows.values())
+
+    def page(self, after_id=None, limit: Optional[int] = None) -> list[dict]:
+        """Filas con id mayor a `after_id` (todas si es None), ordenadas por id, hasta `limit`."""
+        self.store.ensure_fresh()
+        with self.lock:
+            i = 0 if after_id is None else bisect_right(self._ids, after_id)
+            ids = self._ids[i:] if limit is None else self._ids[i:i + limit]
+            return [self._rows[k] for k in ids]
+
+    def find(self, field: str, value) -> list[dict]:
+        """Filas con `field == value`, por el índice del campo (ordenadas por id)."""
+        self.store.ensure_fresh()
+        with self.lock:
+            keys = sorted(self.indexes[field].lookup(value))
+            return [self._rows[k] for k in keys]
+
+    # ---------- escritura (cada llamada es una transacción propia) ----------
+
+    def next_id(self) -> int:
+        """Próximo id que entregaría la secuencia (sin reservarlo)."""
+        self.store.ensure_fresh()
+        return self.store.sequences.current(self.name) + 1
+
+    def insert(self, row: dict) -> dict:
+        """Inserta la fila; si no trae id se le asigna el siguiente correlativo."""
+        return self.insert_many([row])[0]
+
+    def insert_many(self, rows: list[dict]) -> list[dict]:
+        with self.store.transaction(self.name) as tx:
+            for row in rows:
+                tx.insert(self.name, row)
+        return rows
+
+    def update(self, key, row: dict) -> Optional[dict]:
+        """Reemplaza la fila completa. Devuelve None si no existe."""
+        with self.store.transaction(self.name) as tx:
+            if tx.get(self.name, key) is None:
+                return None
+            row[self.key] = key
+            tx.put(self.name, row)
+        return row
+
+    def delete(self, key) -> Optional[dict]:
+        with self.store.transaction(self.name) as tx:
+            eliminado = tx.get(self.name, key)
+            if eliminado is not None:
+                tx.delete(self.name, key)
+        return eliminado
+
+    # ---------- aplicación de cambios ya registrados en el journal ----------
+
+    def apply(self, puts, deletes) -> None:
+        notify = self.store.notify
+        indexes = self.indexes.values()
+        for row in puts:
+            k = row[self.key]
+            old = self._rows.get(k)
+            self._rows[k] = row
+            if old is None:
+                # Los ids nuevos casi siempre son el mayor: se agregan al final
+                if not self._ids or k > self._ids[-1]:
+                    self._ids.append(k)
+                else:
+                    insort(self._ids, k)
+            if isinstance(k, int) and k > self._max_id:
+                self._max_id = k
+            for index in indexes:
+                if old is not None:
+                    index.remove(old, self.key)
+                index.add(row, self.key)
+            notify(self.name, old, row)
+        for key in deletes:
+            old = self._rows.pop(key, None)
+            if old is not None:
+                self._ids.pop(bisect_left(self._ids, key))
+                for index in indexes:
+                    index.remove(old, self.key)
+                notify(self.name, old, None)
+        if puts or deletes:
+            self._dirty = True
+            self._touch()
@@ -0,0 +1,269 @@
+"""
+Vista columnar de ventas y productos para los reportes analíticos.
+
+Las ventas viven en arreglos NumPy paralelos (fecha en segundos epoch,
+producto_id, empresa_id, cantidad, total y margen con el costo guardado en
+la venta) y el stock de los productos en arreglos indexados por id. Se
+mantienen como una vista más del Store: cada cambio aplicado escribe sólo
+su posición, y los reportes filtran con máscaras y agrupan con pandas sin
+recorrer filas en Python ni cruzar con el catálogo.
+"""
+from __future__ import annotations
+import math
+import threading
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from app.storage.rollups import margen_venta
+from app.storage.time_index import venta_ts
+
+PERIODOS = ("dia", "semana", "mes")
+
+_VENTAS_DTYPES = {
+    "ts": np.float64,
+    "producto_id": np.int64,
+    "empresa_id": np.int64,
+    "cantidad": np.int64,
+    "total": np.float64,
+    "margen": np.float64,
+    "vivo": np.bool_,
+}
+
+
+def _crecer(arr: np.ndarray, minimo: int) -> np.ndarray:
+    nuevo = np.zeros(max(minimo, 2 * len(arr), 64), dtype=arr.dtype)
+    nuevo[: len(arr)] = arr
+    return nuevo
+
+
+def _entero(valor) -> int:
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return -1
+
+
+class ColumnarVentas:
+    """
+    Arreglos de ventas y productos mantenidos incrementalmente.
+
+    Cada venta ocupa una posición fija (`_pos[id]`); una actualización la
+    sobrescribe y un borrado sólo la marca como no viva. Las posiciones
+    muertas se compactan cuando llegan a la mitad del total.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            self._v = {k: np.zeros(0, dtype=t) for k, t in _VENTAS_DTYPES.items()}
+            self._pos: dict[int, int] = {}
+            self._n = 0
+            self._muertas = 0
+            self._stock = np.zeros(0, dtype=np.int64)
+            self._existe = np.zeros(0, dtype=np.bool_)
+
+    # ---------- mantenimiento ----------
+
+    def rebuild(self, store) -> None:
+        with self.lock:
+            self.reset()
+            for p in store.productos.all():
+                self._set_producto(p)
+            ventas = [v for v in store.ventas.all() if not math.isnan(venta_ts(v))]
+            n = len(ventas)
+            self._v = {
+                "ts": np.fromiter((venta_ts(v) for v in ventas), np.float64, n),
+                "producto_id": np.fromiter((_entero(v.get("producto_id")) for v in ventas), np.int64, n),
+                "empresa_id": np.fromiter((_entero(v.get("empresa_id")) for v in ventas), np.int64, n),
+                "cantidad": np.fromiter((int(v.get("cantidad", 0) or 0) for v in ventas), np.int64, n),
+                "total": np.fromiter((float(v.get("total", 0.0) or 0.0) for v in ventas), np.float64, n),
+                "margen": np.fromiter((margen_venta(v) for v in ventas), np.float64, n),
+                "vivo": np.ones(n, dtype=np.bool_),
+            }
+            self._pos = {v["id"]: i for i, v in enumerate(ventas)}
+            self._n = n
+
+    def apply(self, name: str, old: Optional[dict], new: Optional[dict]) -> None:
+        with self.lock:
+            if name == "ventas":
+                if old is not None:
+                    self._quitar_venta(old["id"])
+                if new is not None:
+                    self._set_venta(new)
+            elif name == "productos":
+                if new is not None:
+                    self._set_producto(new)
+                elif old is not None and 0 <= _entero(old["id"]) < len(self._existe):
+                    self._existe[old["id"]] = False
+
+    def _set_producto(self, p: dict) -> None:
+        pid = _entero(p.get("id"))
+        if pid < 0:
+            return
+        if pid >= len(self._existe):
+            self._stock = _crecer(self._stock, pid + 1)
+            self._existe = _crecer(self._existe, pid + 1)
+        self._stock[pid] = int(p.get("stock", 0) or 0)
+        self._existe[pid] = True
+
+    def _set_venta(self, v: dict) -> None:
+        ts = venta_ts(v)
+        if math.isnan(ts):
+            return
+        i = self._pos.get(v["id"])
+        if i is None:
+            if self._n >= len(self._v["ts"]):
+                self._v = {k: _crecer(a, self._n + 1) for k, a in self._v.items()}
+            i = self._pos[v["id"]] = self._n
+            self._n += 1
+        c = self._v
+        c["ts"][i] = ts
+        c["producto_id"][i] = _entero(v.get("producto_id"))
+        c["empresa_id"][i] = _entero(v.get("empresa_id"))
+        c["cantidad"][i] = int(v.get("cantidad", 0) or 0)
+        c["total"][i] = float(v.get("total", 0.0) or 0.0)
+        c["margen"][i] = margen_venta(v)
+        c["vivo"][i] = True
+
+    def _quitar_venta(self, vid) -> None:
+        i = self._pos.pop(vid, None)
+        if i is None:
+            return
+        self._v["vivo"][i] = False
+        self._muertas += 1
+        if self._muertas * 2 > self._n:
+            self._compactar()
+
+    def _compactar(self) -> None:
+        vivo = self._v["vivo"][: self._n]
+        orden = np.flatnonzero(vivo)
+        nuevas = {old: new for new, old in enumerate(orden.tolist())}
+        self._pos = {vid: nuevas[i] for vid, i in self._pos.items()}
+        self._v = {k: a[: self._n][vivo].copy() for k, a in self._v.items()}
+        self._n = len(orden)
+        self._muertas = 0
+
+    # ---------- consultas ----------
+
+    def frame(self, desde: Optional[float] = None, hasta: Optional[float] = None) -> pd.DataFrame:
+        """Ventas vivas con desde <= ts <= hasta como DataFrame."""
+        with self.lock:
+            n = self._n
+            mask = self._v["vivo"][:n].copy()
+            ts = self._v["ts"][:n]
+            if desde is not None:
+                mask &= ts >= desde
+            if hasta is not None:
+                mask &= ts <= hasta
+            cols = {k: a[:n][mask] for k, a in self._v.items() if k != "vivo"}
+        return pd.DataFrame(cols)
+
+    def stock(self) -> pd.Series:
+        """Stock actual por producto_id."""
+        with self.lock:
+            ids = np.flatnonzero(self._existe)
+            return pd.Series(self._stock[ids], index=ids)
+
+    def por_periodo(self, periodo: str, desde: Optional[float] = None, hasta: Optional[float] = None) -> list[dict]:
+        """Totales por día, semana (lunes a domingo, UTC) o mes."""
+        if periodo not in PERIODOS:
+            raise ValueError(f"periodo debe ser uno de {PERIODOS}")
+        df = self.frame(desde, hasta)
+        dias = (df["ts"].to_numpy() // 86400).astype("int64")
+        if periodo == "semana":
+            # 1970-01-01 fue jueves: se retrocede hasta el lunes
+            dias = dias - (dias + 3) % 7
+        inicio = dias.astype("datetime64[D]")
+        if periodo == "mes":
+            inicio = inicio.astype("datetime64[M]").astype("datetime64[D]")
+        df["periodo"] = inicio
+        g = df.groupby("periodo", sort=True).agg(
+            ventas=("total", "size"),
+            ventas_totales=("total", "sum"),
+            productos_vendidos=("cantidad", "sum"),
+            ganancias_totales=("margen", "sum"),
+        )
+        return [
+            {
+                "periodo": str(np.datetime64(p, "D")),
+                "ventas": int(r.ventas),
+                "ventas_totales": float(r.ventas_totales),
+                "productos_vendidos": int(r.productos_vendidos),
+                "ganancias_totales": float(r.ganancias_totales),
+            }
+            for p, r in zip(g.index.to_numpy(), g.itertuples(index=False))
+        ]
+
+    def top_productos(self, por: str = "ingresos", limite: int = 10,
+                      desde: Optional[float] = None, hasta: Optional[float] = None) -> list[dict]:
+        """Productos con más ingresos (`por="ingresos"`) o más margen (`por="margen"`)."""
+        columna = {"ingresos": "ventas_totales", "margen": "ganancias_totales"}.get(por)
+        if columna is None:
+            raise ValueError("por debe ser 'ingresos' o 'margen'")
+        g = self.frame(desde, hasta).groupby("producto_id").agg(
+            ventas_totales=("total", "sum"),
+            productos_vendidos=("cantidad", "sum"),
+            ganancias_totales=("margen", "sum"),
+        )
+        g = g.nlargest(limite, columna)
+        return [
+            {
+                "producto_id": int(pid),
+                "ventas_totales": float(r.ventas_totales),
+                "productos_vendidos": int(r.productos_vendidos),
+                "ganancias_totales": float(r.ganancias_totales),
+            }
+            for pid, r in zip(g.index, g.itertuples(index=False))
+        ]
+
+    def por_empresa(self, desde: Optional[float] = None, hasta: Optional[float] = None) -> list[dict]:
+        """Totales por empresa, de mayor a menor ingreso."""
+        g = self.frame(desde, hasta).groupby("empresa_id").agg(
+            ventas=("total", "size"),
+            ventas_totales=("total", "sum"),
+            productos_vendidos=("cantidad", "sum"),
+            ganancias_totales=("margen", "sum"),
+        ).sort_values("ventas_totales", ascending=False)
+        return [
+            {
+                "empresa_id": int(eid),
+                "ventas": int(r.ventas),
+                "ventas_totales": float(r.ventas_totales),
+                "productos_vendidos": int(r.productos_vendidos),
+                "ganancias_totales": float(r.ganancias_totales),
+            }
+            for eid, r in zip(g.index, g.itertuples(index=False))
+        ]
+
+    def rotacion_stock(self, desde: float, hasta: float) -> list[dict]:
+        """
+        Rotación de inventario por producto en [desde, hasta]: unidades
+        vendidas / stock promedio, y días de inventario al ritmo de venta
+        del período. Como no hay historial de stock, el stock inicial se
+        estima como stock actual + lo vendido en el período.
+        """
+        dias = max((hasta - desde) / 86400, 1.0)
+        vendidos = self.frame(desde, hasta).groupby("producto_id")["cantidad"].sum()
+        stock = self.stock()
+        df = pd.DataFrame({"stock": stock}).join(vendidos.rename("vendidos"), how="left").fillna({"vendidos": 0})
+        promedio = df["stock"] + df["vendidos"] / 2
+        df["rotacion"] = np.where(promedio > 0, df["vendidos"] / promedio.where(promedio > 0, 1), 0.0)
+        diario = df["vendidos"] / dias
+        df["dias_inventario"] = np.where(diario > 0, df["stock"] / diario.where(diario > 0, 1), np.inf)
+        df = df.sort_values("rotacion", ascending=False)
+        return [
+            {
+                "producto_id": int(pid),
+                "stock": int(r.stock),
+                "vendidos": int(r.vendidos),
+                "rotacion": float(r.rotacion),
+                # Sin ventas en el período no hay ritmo con qué estimar
+                "dias_inventario": None if math.isinf(r.dias_inventario) else float(r.dias_inventario),
+            }
+            for pid, r in zip(df.index, df.itertuples(index=False))
+        ]
@@ -0,0 +1,53 @@
+from __future__ import annotations
+from typing import Iterable, Optional
+
+
+class UniqueViolation(Exception):
+    """Otra fila de la colección ya tiene ese valor en un campo único."""
+
+    def __init__(self, collection: str, field: str, value):
+        super().__init__(f"{collection}.{field} duplicado: {value!r}")
+        self.collection = collection
+        self.field = field
+        self.value = value
+
+
+class HashIndex:
+    """
+    Índice secundario valor -> ids de un campo de la colección. Lo mantiene
+    `Collection.apply` con cada cambio confirmado; con `unique=True` las
+    transacciones además rechazan valores repetidos.
+    """
+
+    def __init__(self, field: str, unique: bool = False):
+        self.field = field
+        self.unique = unique
+        self._map: dict = {}
+
+    def rebuild(self, rows: Iterable[dict], key: str) -> None:
+        self._map = {}
+        for row in rows:
+            self.add(row, key)
+
+    def add(self, row: dict, key: str) -> None:
+        value = row.get(self.field)
+        if value is not None:
+            self._map.setdefault(value, set()).add(row[key])
+
+    def remove(self, row: dict, key: str) -> None:
+        value = row.get(self.field)
+        keys = self._map.get(value)
+        if keys is not None:
+            keys.discard(row[key])
+            if not keys:
+                del self._map[value]
+
+    def lookup(self, value) -> set:
+        return self._map.get(value, set())
+
+    def values(self) -> list:
+        return list(self._map)
+
+    def first(self, value) -> Optional[object]:
+        keys = self._map.get(value)
+        return next(iter(keys)) if keys else None
@@ -0,0 +1,161 @@
+from __future__ import annotations
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Iterator, Optional
+
+from app import codec, metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Journal:
+    """
+    Archivo JSONL append-only: un registro JSON por línea.
+
+    Cada `append` escribe una línea completa y hace fsync, así que un
+    registro devuelto sin error sobrevive a una caída. Si la caída ocurre a
+    mitad de una escritura, la última línea queda incompleta; `replay` la
+    descarta y trunca el archivo en el último registro válido.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        # Registros en el archivo actual (los del archivo rotado no cuentan)
+        self.records = 0
+        self._lock = threading.Lock()
+        self._fh = None
+
+    def _open(self):
+        if self._fh is not None and self._stale():
+            # Otro proceso rotó el archivo: seguimos escribiendo en el nuevo
+            self._fh.close()
+            self._fh = None
+        if self._fh is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._fh = open(self.path, "ab")
+        return self._fh
+
+    def _stale(self) -> bool:
+        try:
+            return os.stat(self.path).st_ino != os.fstat(self._fh.fileno()).st_ino
+        except FileNotFoundError:
+            return True
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+    def append(self, record: dict) -> int:
+        """Agrega el registro y devuelve el offset en que termina."""
+        line = codec.dumps(record) + b"\n"
+        with self._lock:
+            fh = self._open()
+            fh.write(line)
+            fh.flush()
+            os.fsync(fh.fileno())
+            self.records += 1
+            metrics.bytes_written.inc(len(line), file=self.path.name)
+            return fh.tell()
+
+    def identity(self) -> Optional[tuple[int, int]]:
+        """(inodo, tamaño) del archivo actual, o None si no existe."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_size
+
+    # ---------- lectura ----------
+
+    def replay(self) -> Iterator[dict]:
+        """
+        Recorre los registros válidos del journal rotado (si quedó uno) y del
+        actual, truncando colas incompletas. Sólo debe llamarse cuando nadie
+        más está escribiendo.
+        """
+        self.records = 0
+        for path in (self.rotated_path, self.path):
+            for record in self._read(path):
+                if path == self.path:
+                    self.records += 1
+                yield record
+
+    def _read(self, path: Path) -> Iterator[dict]:
+        if not path.exists():
+            return
+        good = 0
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = codec.loads(line)
+                except codec.FormatoInvalido:
+                    break
+                good += len(line)
+                yield record
+        metrics.bytes_read.inc(good, file=path.name)
+        if good != path.stat().st_size:
+            logger.warning("Journal %s con cola incompleta; se trunca en el byte %d", path, good)
+            with open(path, "r+b") as f:
+                f.truncate(good)
+                os.fsync(f.fileno())
+
+    def read_from(self, offset: int) -> tuple[list[dict], int]:
+        """
+        Lee los registros completos agregados desde `offset` (lo que otros
+        procesos escribieron). Devuelve los registros y el nuevo offset.
+        """
+        records = []
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return records, offset
+        inicio = offset
+        with f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                records.append(codec.loads(line))
+                offset += len(line)
+        metrics.bytes_read.inc(offset - inicio, file=self.path.name)
+        self.records += len(records)
+        return records, offset
+
+    # ---------- compactación ----------
+
+    @property
+    def rotated_path(self) -> Path:
+        return self.path.with_name(self.path.name + ".compacting")
+
+    def rotate(self) -> None:
+        """
+        Aparta el journal actual para compactarlo y empieza uno vacío.
+        Si quedó una rotación anterior sin terminar, se le agregan los
+        registros nuevos en vez de pisarla.
+        """
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+            self.records = 0
+            if not self.path.exists():
+                return
+            rotated = self.rotated_path
+            if rotated.exists():
+                with open(rotated, "ab") as dst, open(self.path, "rb") as src:
+                    dst.write(src.read())
+                    dst.flush()
+                    os.fsync(dst.fileno())
+                self.path.unlink()
+            else:
+                os.replace(self.path, rotated)
+
+    def discard_rotated(self) -> None:
+        """Se llama cuando el snapshot que incluye el journal rotado ya está en disco."""
+        self.rotated_path.unlink(missing_ok=True)
@@ -0,0 +1,150 @@
+"""
+Indicadores del dashboard mantenidos como contadores: cantidad de
+empresas y productos, stock total y valorizado, y ventas, unidades,
+ingresos y margen acumulados.
+
+Como vista del Store recibe cada cambio confirmado (de cualquier endpoint,
+importación o proceso) y ajusta los contadores con la diferencia entre la
+fila anterior y la nueva, así que leerlos no recorre ninguna colección.
+
+El margen es el de cada venta (total - cantidad * costo_unitario guardado
+al vender), así que editar un producto sólo mueve los indicadores de stock.
+
+    python -m app.storage.kpis
+
+recalcula los indicadores recorriendo los archivos y los compara con los
+contadores (sale con código 1 si no coinciden).
+"""
+from __future__ import annotations
+import math
+import sys
+import threading
+from typing import Optional
+
+from app.storage.listeners import Listeners
+from app.storage.rollups import margen_venta
+
+CAMPOS = (
+    "empresas",
+    "productos",
+    "stock_total",
+    "valor_inventario",
+    "ventas",
+    "productos_vendidos",
+    "ventas_totales",
+    "ganancias_totales",
+)
+
+
+def _num(row: dict, campo: str) -> float:
+    return float(row.get(campo, 0) or 0)
+
+
+class RunningKpis:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.listeners = Listeners()
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.empresas = 0
+            self.productos = 0
+            self.stock_total = 0
+            self.valor_inventario = 0.0
+            self.ventas = 0
+            self.productos_vendidos = 0
+            self.ventas_totales = 0.0
+            self.ganancias_totales = 0.0
+
+    # ---------- mantenimiento ----------
+
+    def rebuild(self, store) -> None:
+        with self.lock:
+            self.reset()
+            self.empresas = len(store.empresas)
+            for p in store.productos.all():
+                self._producto(p, +1)
+            for v in store.ventas.all():
+                self._venta(v, +1)
+        self.listeners.notify()
+
+    def apply(self, name: str, old: Optional[dict], new: Optional[dict]) -> None:
+        if name not in ("empresas", "productos", "ventas"):
+            return
+        with self.lock:
+            if name == "empresas":
+                self.empresas += (new is not None) - (old is not None)
+            elif name == "productos":
+                if old is not None:
+                    self._producto(old, -1)
+                if new is not None:
+                    self._producto(new, +1)
+            else:
+                if old is not None:
+                    self._venta(old, -1)
+                if new is not None:
+                    self._venta(new, +1)
+        self.listeners.notify()
+
+    def _producto(self, p: dict, signo: int) -> None:
+        self.productos += signo
+        self.stock_total += int(p.get("stock", 0) or 0) * signo
+        self.valor_inventario += int(p.get("stock", 0) or 0) * _num(p, "costo") * signo
+
+    def _venta(self, v: dict, signo: int) -> None:
+        self.ventas += signo
+        self.productos_vendidos += int(v.get("cantidad", 0) or 0) * signo
+        self.ventas_totales += _num(v, "total") * signo
+        self.ganancias_totales += margen_venta(v) * signo
+
+    # ---------- consulta ----------
+
+    def valores(self) -> dict:
+        with self.lock:
+            return {
+                "empresas": self.empresas,
+                "productos": self.productos,
+                "stock_total": self.stock_total,
+                "valor_inventario": round(self.valor_inventario, 6),
+                "ventas": self.ventas,
+                "productos_vendidos": self.productos_vendidos,
+                "ventas_totales": round(self.ventas_totales, 6),
+                "ganancias_totales": round(self.ganancias_totales, 6),
+            }
+
+
+def recorrido(store) -> dict:
+    """Los mismos indicadores calculados recorriendo todas las filas."""
+    productos = store.productos.all()
+    ventas = store.ventas.all()
+    return {
+        "empresas": len(store.empresas),
+        "productos": len(productos),
+        "stock_total": sum(int(p.get("stock", 0) or 0) for p in productos),
+        "valor_inventario": sum(int(p.get("stock", 0) or 0) * _num(p, "costo") for p in productos),
+        "ventas": len(ventas),
+        "productos_vendidos": sum(int(v.get("cantidad", 0) or 0) for v in ventas),
+        "ventas_totales": sum(_num(v, "total") for v in ventas),
+        "ganancias_totales": sum(margen_venta(v) for v in ventas),
+    }
+
+
+def main() -> int:
+    from app import config
+    from app.storage.store import store
+
+    store.ensure_fresh()
+    contadores = store.kpis.valores()
+    esperado = recorrido(store)
+    ok = True
+    for k in CAMPOS:
+        coincide = math.isclose(contadores[k], esperado[k], rel_tol=1e-9, abs_tol=1e-6)
+        ok = ok and coincide
+        print(f"{k}: contador={contadores[k]} recorrido={esperado[k]} {'OK' if coincide else 'DIFERENTE'}")
+    print(f"backend: {config.STORAGE_BACKEND}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
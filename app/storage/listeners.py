@@ -0,0 +1,29 @@
+"""
+Avisos de cambio de las vistas en memoria para quien espera en otro hilo
+(los streams SSE de la API, que viven en el event loop).
+"""
+from __future__ import annotations
+import threading
+from typing import Callable
+
+
+class Listeners:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._fns: list[Callable[[], None]] = []
+
+    def add(self, fn: Callable[[], None]) -> None:
+        with self._lock:
+            self._fns.append(fn)
+
+    def remove(self, fn: Callable[[], None]) -> None:
+        with self._lock:
+            if fn in self._fns:
+                self._fns.remove(fn)
+
+    def notify(self) -> None:
+        """Llama a cada suscriptor desde el hilo que aplicó el cambio: deben ser rápidos y no bloquear."""
+        with self._lock:
+            fns = list(self._fns)
+        for fn in fns:
+            fn()
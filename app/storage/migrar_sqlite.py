@@ -0,0 +1,64 @@
+"""
+Migración única de los archivos JSON (snapshots + journal) a SQLite.
+
+    python -m app.storage.migrar_sqlite [--data-dir DIR] [--db RUTA] [--reemplazar]
+
+Después de migrar, arrancar la app con INVENTARIO_BACKEND=sqlite.
+"""
+from __future__ import annotations
+import argparse
+from pathlib import Path
+
+from app import config
+from app.storage.rollups import con_costos
+from app.storage.sqlite_store import SqliteStore
+from app.storage.store import Store
+
+
+def migrar(data_dir: Path, db_path: Path, reemplazar: bool = False) -> dict[str, int]:
+    origen = Store(data_dir, flush_interval=0, compact_every=config.JOURNAL_COMPACT_EVERY)
+    origen.ensure_fresh()
+
+    destino = SqliteStore(db_path)
+    destino.open()
+    try:
+        if not reemplazar and any(len(c) for c in destino.collections()):
+            raise SystemExit(f"{db_path} ya tiene datos; usa --reemplazar para sobrescribirlos")
+
+        nombres = [c.name for c in destino.collections()]
+        conteo = {}
+        with destino.transaction(*nombres) as tx:
+            if reemplazar:
+                tx._conn.execute("DELETE FROM sequences")
+            for nombre in nombres:
+                if reemplazar:
+                    tx._conn.execute(f"DELETE FROM {nombre}")
+                filas = origen.collection(nombre).all()
+                for fila in filas:
+                    if nombre == "ventas" and "costo_unitario" not in fila:
+                        fila = con_costos(fila, origen.productos.get(fila.get("producto_id")))
+                    tx.put(nombre, dict(fila))
+                conteo[nombre] = len(filas)
+            # Las secuencias siguen donde quedaron (ids borrados no se reutilizan)
+            secuencias = [c.name for c in destino.collections() if c.key == "id"]
+            for nombre in [*secuencias, "compra_id"]:
+                tx.advance(nombre, origen.sequences.current(nombre))
+        return conteo
+    finally:
+        destino.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Importa empresas, productos y ventas JSON a SQLite")
+    parser.add_argument("--data-dir", type=Path, default=config.DATA_DIR)
+    parser.add_argument("--db", type=Path, default=config.SQLITE_PATH)
+    parser.add_argument("--reemplazar", action="store_true", help="borra lo que ya tenga la base")
+    args = parser.parse_args()
+
+    conteo = migrar(args.data_dir, args.db, reemplazar=args.reemplazar)
+    for nombre, n in conteo.items():
+        print(f"{nombre}: {n} registros")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Ventas particionadas por mes en disco.
+
+    data/ventas/manifest.json     particiones y su estado
+    data/ventas/2026-10.json      mes abierto (formato de la colección)
+    data/ventas/2026-01.json.gz   mes archivado (comprimido)
+
+En memoria la colección sigue siendo una sola: índices, agregados y
+consultas por fecha no cambian. Lo que cambia es el checkpoint: sólo se
+reescriben los meses que tuvieron cambios, así que una venta de hoy cuesta
+lo mismo con uno o con diez años de historia.
+
+Los meses con más de INVENTARIO_ARCHIVAR_MESES de antigüedad se archivan
+en el checkpoint siguiente: se reescriben comprimidos y desde entonces no
+se vuelven a escribir salvo que llegue un cambio para ese mes (p. ej. una
+carga atrasada de un POS).
+
+    python -m app.storage.partitions
+
+muestra las particiones del manifest.
+"""
+from __future__ import annotations
+import math
+import os
+import re
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+from app import codec, config
+from app.storage.collection import Collection
+from app.storage.time_index import venta_ts
+from app.utils import load_json
+
+if TYPE_CHECKING:
+    from app.storage.store import Store
+
+SIN_FECHA = "sin_fecha"
+
+_EXTENSIONES = {"json": ".json", "compact": ".json", "gzip": ".json.gz", "msgpack": ".msgpack"}
+_ARCHIVO_PARTICION = re.compile(rf"^(\d{{4}}-\d{{2}}|{SIN_FECHA})\.(json|json\.gz|msgpack)$")
+
+
+def mes_de(row: dict) -> str:
+    """Partición de una venta: 'AAAA-MM' (UTC) según su fecha."""
+    ts = venta_ts(row)
+    if math.isnan(ts):
+        return SIN_FECHA
+    t = time.gmtime(ts)
+    return f"{t.tm_year:04d}-{t.tm_mon:02d}"
+
+
+def mes_limite(meses: int, hoy: Optional[datetime] = None) -> str:
+    """Primer mes que todavía no se archiva: el actual menos `meses`."""
+    hoy = hoy or datetime.now(timezone.utc)
+    total = hoy.year * 12 + (hoy.month - 1) - meses
+    return f"{total // 12:04d}-{total % 12 + 1:02d}"
+
+
+class PartitionedCollection(Collection):
+    """
+    Colección cuyo snapshot es un archivo por mes más un manifest.
+
+    `path` es el manifest; `legacy_path` el ventas.json único de versiones
+    anteriores, que se lee si todavía no hay manifest y se borra después
+    del primer checkpoint particionado.
+    """
+
+    def __init__(self, store: "Store", name: str, directory: Path, legacy_path: Path, key: str = "id"):
+        super().__init__(store, name, directory / "manifest.json", key=key)
+        self.directory = directory
+        self.legacy_path = legacy_path
+        self.archive_format = config.ARCHIVE_FORMAT
+        self.archive_after = config.ARCHIVE_AFTER_MONTHS
+        # mes -> ids de sus filas
+        self._meses: dict[str, set] = {}
+        self._sucios: set[str] = set()
+        self._manifest: dict[str, dict] = {}
+
+    # ---------- carga ----------
+
+    def _read_rows(self) -> list[dict]:
+        self._meses = {}
+        self._sucios = set()
+        if self.path.exists():
+            self._manifest = load_json(self.path, default={}).get("particiones", {})
+            rows = []
+            for mes, info in self._manifest.items():
+                rows.extend(load_json(self.directory / info["archivo"], default=[]))
+            # Mismo orden que el ventas.json único (por id); casi ordenado, así que es barato
+            rows.sort(key=lambda r: r[self.key])
+        else:
+            self._manifest = {}
+            rows = load_json(self.legacy_path, default=[]) if self.legacy_path.exists() else []
+        for r in rows:
+            mes = mes_de(r)
+            self._meses.setdefault(mes, set()).add(r[self.key])
+        if not self.path.exists() and rows:
+            # Primer arranque con datos de un ventas.json único: se particiona en el próximo checkpoint
+            self._sucios = set(self._meses)
+        return rows
+
+    # ---------- cambios ----------
+
+    def apply(self, puts, deletes) -> None:
+        for row in puts:
+            k = row[self.key]
+            old = self._rows.get(k)
+            if old is not None:
+                self._quitar(mes_de(old), k)
+            mes = mes_de(row)
+            self._meses.setdefault(mes, set()).add(k)
+            self._sucios.add(mes)
+        for k in deletes:
+            old = self._rows.get(k)
+            if old is not None:
+                self._quitar(mes_de(old), k)
+        super().apply(puts, deletes)
+
+    def _quitar(self, mes: str, k) -> None:
+        ids = self._meses.get(mes)
+        if ids is not None:
+            ids.discard(k)
+            if not ids:
+                del self._meses[mes]
+        self._sucios.add(mes)
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._sucios) or self._dirty
+
+    # ---------- checkpoint ----------
+
+    def _por_archivar(self) -> set[str]:
+        if self.archive_after <= 0:
+            return set()
+        limite = mes_limite(self.archive_after)
+        return {
+            mes for mes, info in self._manifest.items()
+            if mes != SIN_FECHA and mes < limite and info.get("estado") != "archivada"
+        }
+
+    def take_snapshot(self) -> Optional[dict]:
+        """
+        Filas de los meses con cambios (o por archivar) y el manifest que
+        queda después de escribirlas.
+        """
+        with self.lock:
+            meses = self._sucios | self._por_archivar()
+            if not meses and not self._dirty:
+                return None
+            limite = mes_limite(self.archive_after) if self.archive_after > 0 else None
+            particiones = {}
+            manifest = dict(self._manifest)
+            for mes in sorted(meses):
+                ids = self._meses.get(mes)
+                if not ids:
+                    manifest.pop(mes, None)
+                    continue
+                archivada = limite is not None and mes != SIN_FECHA and mes < limite
+                formato = self.archive_format if archivada else self.formato
+                rows = [self._rows[k] for k in sorted(ids)]
+                manifest[mes] = {
+                    "archivo": f"{mes}{_EXTENSIONES[formato]}",
+                    "formato": formato,
+                    "estado": "archivada" if archivada else "abierta",
+                    "filas": len(rows),
+                    "min_id": rows[0][self.key],
+                    "max_id": rows[-1][self.key],
+                }
+                particiones[mes] = rows
+            self._manifest = manifest
+            self._sucios = set()
+            self._dirty = False
+            return {"particiones": particiones, "manifest": manifest}
+
+    def encode_snapshot(self, snapshot: dict) -> dict[Path, bytes]:
+        manifest = snapshot["manifest"]
+        files = {
+            self.directory / manifest[mes]["archivo"]: codec.encode(rows, manifest[mes]["formato"])
+            for mes, rows in snapshot["particiones"].items()
+        }
+        files[self.path] = codec.encode({"version": 1, "particiones": manifest}, "json")
+        return files
+
+    def mark_dirty(self) -> None:
+        # Si falló el volcado no se sabe qué quedó escrito: se reescribe todo
+        with self.lock:
+            self._sucios = set(self._meses) | set(self._manifest)
+
+    def cleanup(self) -> None:
+        """Borra archivos de meses que cambiaron de formato o quedaron vacíos, y el ventas.json viejo."""
+        vigentes = {info["archivo"] for info in self._manifest.values()} | {self.path.name}
+        try:
+            nombres = os.listdir(self.directory)
+        except FileNotFoundError:
+            return
+        for nombre in nombres:
+            if nombre not in vigentes and _ARCHIVO_PARTICION.match(nombre):
+                (self.directory / nombre).unlink(missing_ok=True)
+        if self.path.exists():
+            self.legacy_path.unlink(missing_ok=True)
+
+    # ---------- consulta ----------
+
+    def particiones(self) -> dict[str, dict]:
+        with self.lock:
+            return {mes: dict(info) for mes, info in sorted(self._manifest.items())}
+
+
+def main() -> None:
+    from app.storage.store import Store
+
+    store = Store(config.DATA_DIR, flush_interval=0, compact_every=config.JOURNAL_COMPACT_EVERY)
+    store.ensure_fresh()
+    particiones = store.ventas.particiones()
+    if not particiones:
+        print("Sin particiones (todavía no hubo checkpoint particionado)")
+    for mes, info in particiones.items():
+        print(f"{mes}  {info['estado']:<9}  {info['filas']:>8} filas  {info['archivo']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Agregados diarios de ventas, mantenidos en memoria a medida que cambian
+las ventas.
+
+    python -m app.storage.rollups
+
+reconstruye los agregados desde los archivos y los compara con un recorrido
+completo de las ventas (sale con código 1 si no coinciden).
+"""
+from __future__ import annotations
+import math
+import sys
+import threading
+from bisect import bisect_left, bisect_right, insort
+from typing import Optional
+
+from app.storage.time_index import VentasIndex, venta_ts
+
+DIA = 86400
+
+
+class Totales:
+    __slots__ = ("total", "cantidad", "margen", "ventas")
+
+    def __init__(self):
+        self.total = 0.0
+        self.cantidad = 0
+        self.margen = 0.0
+        self.ventas = 0
+
+
+def margen_venta(v: dict) -> float:
+    """Total menos cantidad * costo unitario guardado en la venta (0 si la venta no lo tiene)."""
+    costo = v.get("costo_unitario")
+    if costo is None:
+        return 0.0
+    return float(v.get("total", 0.0) or 0.0) - int(v.get("cantidad", 0) or 0) * float(costo)
+
+
+def con_costos(v: dict, producto: Optional[dict]) -> dict:
+    """
+    Venta guardada antes de que cada línea llevara precio y costo, completada:
+    el precio unitario sale del total y el costo es el actual del producto
+    (None si el producto ya no existe).
+    """
+    cantidad = int(v.get("cantidad", 0) or 0)
+    return {
+        **v,
+        "precio_unitario": float(v.get("total", 0.0) or 0.0) / cantidad if cantidad else None,
+        "costo_unitario": float(producto["costo"]) if producto else None,
+    }
+
+
+class DailyRollups:
+    """
+    Totales por día (UTC) y por (día, producto_id, empresa_id): ingresos,
+    cantidad y margen.
+
+    El margen sale de cada venta (total - cantidad * costo_unitario, con el
+    costo guardado al vender), así que editar un producto no cambia los
+    agregados de días pasados.
+
+    `resumen` suma los días completos del rango desde los agregados y sólo
+    recorre (con el índice de fechas) las ventas de los días de borde que el
+    rango cubre a medias.
+    """
+
+    def __init__(self, index: VentasIndex):
+        self.lock = threading.RLock()
+        self._index = index
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            self._dias: list[int] = []
+            self._por_dia: dict[int, Totales] = {}
+            self._detalle: dict[tuple[int, int, int], Totales] = {}
+
+    # ---------- mantenimiento ----------
+
+    def rebuild(self, store) -> None:
+        with self.lock:
+            self.reset()
+            for v in store.ventas.all():
+                self._add(v)
+
+    def apply(self, name: str, old: Optional[dict], new: Optional[dict]) -> None:
+        if name != "ventas":
+            return
+        with self.lock:
+            if old is not None:
+                self._remove(old)
+            if new is not None:
+                self._add(new)
+
+    def _add(self, v: dict) -> None:
+        self._sumar(v, +1)
+
+    def _remove(self, v: dict) -> None:
+        self._sumar(v, -1)
+
+    def _sumar(self, v: dict, signo: int) -> None:
+        ts = venta_ts(v)
+        if math.isnan(ts):
+            return
+        dia = int(ts // DIA)
+        total = float(v.get("total", 0.0) or 0.0) * signo
+        cantidad = int(v.get("cantidad", 0) or 0) * signo
+        margen = margen_venta(v) * signo
+
+        b = self._por_dia.get(dia)
+        if b is None:
+            b = self._por_dia[dia] = Totales()
+            insort(self._dias, dia)
+        b.total += total
+        b.cantidad += cantidad
+        b.margen += margen
+        b.ventas += signo
+
+        clave = (dia, v.get("producto_id"), v.get("empresa_id"))
+        d = self._detalle.get(clave)
+        if d is None:
+            d = self._detalle[clave] = Totales()
+        d.total += total
+        d.cantidad += cantidad
+        d.margen += margen
+        d.ventas += signo
+        if d.ventas <= 0:
+            del self._detalle[clave]
+
+        if b.ventas <= 0:
+            del self._por_dia[dia]
+            self._dias.pop(bisect_left(self._dias, dia))
+
+    # ---------- consultas ----------
+
+    def resumen(self, desde: float, hasta: float) -> dict:
+        """Totales de las ventas con desde <= ts <= hasta (segundos epoch)."""
+        total = 0.0
+        cantidad = 0
+        margen = 0.0
+        with self.lock:
+            i = bisect_left(self._dias, desde // DIA)
+            j = bisect_right(self._dias, hasta // DIA)
+            for dia in self._dias[i:j]:
+                inicio = dia * DIA
+                fin = inicio + DIA
+                if desde <= inicio and fin <= hasta:
+                    b = self._por_dia[dia]
+                    total += b.total
+                    cantidad += b.cantidad
+                    margen += b.margen
+                    continue
+                # Día de borde: sólo sus ventas dentro del rango
+                borde = self._index.range_rows(max(desde, inicio), min(hasta, fin), incluir_hasta=hasta < fin)
+                for _ts, v in borde:
+                    c = int(v.get("cantidad", 0) or 0)
+                    total += float(v.get("total", 0.0) or 0.0)
+                    cantidad += c
+                    margen += margen_venta(v)
+        return {
+            "ventas_totales": total,
+            "ganancias_totales": margen,
+            "productos_vendidos": cantidad,
+        }
+
+    def detalle(self, desde_dia: int, hasta_dia: int) -> list[dict]:
+        """Totales por (día, producto, empresa) para los días [desde_dia, hasta_dia]."""
+        with self.lock:
+            return [
+                {
+                    "dia": dia,
+                    "producto_id": pid,
+                    "empresa_id": eid,
+                    "total": d.total,
+                    "cantidad": d.cantidad,
+                    "margen": d.margen,
+                }
+                for (dia, pid, eid), d in self._detalle.items()
+                if desde_dia <= dia <= hasta_dia
+            ]
+
+
+def main() -> int:
+    from app.storage.store import Store
+    from app import config
+
+    store = Store(config.DATA_DIR, flush_interval=0, compact_every=config.JOURNAL_COMPACT_EVERY)
+    store.ensure_fresh()
+    rollups = store.rollups
+
+    agregado = rollups.resumen(-math.inf, math.inf)
+    esperado = {"ventas_totales": 0.0, "ganancias_totales": 0.0, "productos_vendidos": 0}
+    for v in store.ventas.all():
+        if math.isnan(venta_ts(v)):
+            continue
+        c = int(v.get("cantidad", 0) or 0)
+        esperado["ventas_totales"] += float(v.get("total", 0.0) or 0.0)
+        esperado["productos_vendidos"] += c
+        esperado["ganancias_totales"] += margen_venta(v)
+
+    print(f"días con ventas: {len(rollups._dias)}")
+    ok = True
+    for k, v in esperado.items():
+        coincide = math.isclose(agregado[k], v, rel_tol=1e-9, abs_tol=1e-6)
+        ok = ok and coincide
+        print(f"{k}: agregado={agregado[k]} recorrido={v} {'OK' if coincide else 'DIFERENTE'}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,290 @@
+"""
+Búsqueda de productos en memoria: por palabras del nombre (prefijo, sin
+distinguir tildes ni mayúsculas), con faceta de categoría y rangos de
+precio y stock.
+
+    _indice               palabra normalizada -> ids de productos
+    _facetas_palabra      palabra -> cuántos de esos productos hay por categoría
+    _terminos             palabras ordenadas: un prefijo es un tramo contiguo (bisect)
+    _por_precio/_stock    (valor, id) ordenados: un rango es un tramo contiguo
+    _por_nombre           (nombre, id) ordenados: la primera página de muchos
+                          resultados sale recorriéndolo, sin ordenarlos
+
+Como vista del Store recibe cada alta, edición, borrado e importación ya
+confirmados y actualiza sólo las entradas del producto que cambió, así que
+buscar no recorre el catálogo.
+"""
+from __future__ import annotations
+import math
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from itertools import islice
+from operator import itemgetter
+from typing import Iterable, Optional
+
+_PALABRA = re.compile(r"\w+")
+
+ORDENES = ("relevancia", "nombre", "precio", "-precio", "stock")
+
+_ID = itemgetter(1)
+
+# Hasta esta cantidad de resultados se ordenan completos; con más se recorre
+# el arreglo ya ordenado hasta juntar la página
+ORDENAR_HASTA = 2000
+
+
+def normalizar(texto) -> str:
+    """Minúsculas y sin tildes ('Café Ñandú' -> 'cafe nandu')."""
+    texto = str(texto)
+    if texto.isascii():
+        return texto.casefold()
+    descompuesto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in descompuesto if not unicodedata.combining(c)).casefold()
+
+
+def palabras(texto) -> list[str]:
+    return _PALABRA.findall(normalizar(texto)) if texto else []
+
+
+def _quitar(arr: list[tuple], item: tuple) -> None:
+    i = bisect_left(arr, item)
+    if i < len(arr) and arr[i] == item:
+        arr.pop(i)
+
+
+class ProductSearch:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            self._docs: dict[int, dict] = {}
+            # Valores con que quedó indexado cada id (nombre normalizado)
+            self._nombre: dict[int, str] = {}
+            self._palabras: dict[int, frozenset] = {}
+            self._categoria: dict[int, str] = {}
+            self._precio: dict[int, float] = {}
+            self._stock: dict[int, int] = {}
+            self._indice: dict[str, set[int]] = {}
+            self._facetas_palabra: dict[str, Counter] = {}
+            self._terminos: list[str] = []
+            self._categorias: dict[str, set[int]] = {}
+            self._por_nombre: list[tuple[str, int]] = []
+            self._por_precio: list[tuple[float, int]] = []
+            self._por_stock: list[tuple[int, int]] = []
+
+    def _ordenados(self) -> list[tuple[list, dict]]:
+        return [(self._por_nombre, self._nombre), (self._por_precio, self._precio), (self._por_stock, self._stock)]
+
+    # ---------- mantenimiento ----------
+
+    def rebuild(self, store) -> None:
+        with self.lock:
+            self.reset()
+            for p in store.productos.all():
+                self._indexar(p, ordenar=False)
+            self._terminos.sort()
+            for arr, _valores in self._ordenados():
+                arr.sort()
+
+    def apply(self, name: str, old: Optional[dict], new: Optional[dict]) -> None:
+        if name != "productos":
+            return
+        with self.lock:
+            if new is not None:
+                self._indexar(new)
+            else:
+                self._desindexar(old["id"])
+
+    def _indexar(self, p: dict, ordenar: bool = True) -> None:
+        pid = p["id"]
+        if pid in self._docs:
+            self._desindexar(pid)
+        agregar = insort if ordenar else list.append
+        self._docs[pid] = p
+        nombre = self._nombre[pid] = normalizar(p.get("nombre") or "")
+        tokens = self._palabras[pid] = frozenset(_PALABRA.findall(nombre))
+        categoria = self._categoria[pid] = p.get("categoria")
+        for t in tokens:
+            ids = self._indice.get(t)
+            if ids is None:
+                ids = self._indice[t] = set()
+                self._facetas_palabra[t] = Counter()
+                agregar(self._terminos, t)
+            ids.add(pid)
+            self._facetas_palabra[t][categoria] += 1
+        self._categorias.setdefault(categoria, set()).add(pid)
+        self._precio[pid] = float(p.get("precio", 0.0) or 0.0)
+        self._stock[pid] = int(p.get("stock", 0) or 0)
+        for arr, valores in self._ordenados():
+            agregar(arr, (valores[pid], pid))
+
+    def _desindexar(self, pid: int) -> None:
+        if self._docs.pop(pid, None) is None:
+            return
+        for arr, valores in self._ordenados():
+            _quitar(arr, (valores.pop(pid), pid))
+        categoria = self._categoria.pop(pid)
+        for t in self._palabras.pop(pid):
+            ids = self._indice[t]
+            ids.discard(pid)
+            facetas = self._facetas_palabra[t]
+            facetas[categoria] -= 1
+            if not facetas[categoria]:
+                del facetas[categoria]
+            if not ids:
+                del self._indice[t]
+                del self._facetas_palabra[t]
+                _quitar(self._terminos, t)
+        ids = self._categorias.get(categoria)
+        if ids is not None:
+            ids.discard(pid)
+            if not ids:
+                del self._categorias[categoria]
+
+    # ---------- consulta ----------
+
+    def _coincidentes(self, prefijo: str) -> list[str]:
+        """Palabras indexadas que empiezan con `prefijo`."""
+        i = bisect_left(self._terminos, prefijo)
+        j = i
+        while j < len(self._terminos) and self._terminos[j].startswith(prefijo):
+            j += 1
+        return self._terminos[i:j]
+
+    def _prefijo(self, coincidentes: list[str]) -> set[int]:
+        """
+        Ids con alguna de esas palabras. Con una sola se devuelve el conjunto
+        del índice, sin copiarlo: no hay que modificarlo.
+        """
+        if len(coincidentes) == 1:
+            return self._indice[coincidentes[0]]
+        return set().union(*(self._indice[t] for t in coincidentes))
+
+    @staticmethod
+    def _tramo(arr: list[tuple], minimo, maximo) -> list[tuple]:
+        lo = 0 if minimo is None else bisect_left(arr, (minimo, -math.inf))
+        hi = len(arr) if maximo is None else bisect_right(arr, (maximo, math.inf))
+        return arr[lo:hi]
+
+    def buscar(
+        self,
+        q: Optional[str] = None,
+        categorias: Optional[Iterable[str]] = None,
+        precio_min: Optional[float] = None,
+        precio_max: Optional[float] = None,
+        stock_min: Optional[int] = None,
+        stock_max: Optional[int] = None,
+        orden: str = "relevancia",
+        limite: int = 20,
+        offset: int = 0,
+    ) -> dict:
+        """
+        Productos cuyo nombre tiene palabras que empiezan con cada palabra de
+        `q`, en `categorias` y dentro de los rangos. `facetas` cuenta las
+        categorías de lo encontrado sin el filtro de categoría (para que la
+        UI pueda ofrecer las otras).
+
+        Con `orden="relevancia"` van primero los nombres que empiezan con la
+        primera palabra buscada; dentro de cada grupo, por nombre.
+        """
+        if orden not in ORDENES:
+            raise ValueError(f"orden debe ser uno de {ORDENES}")
+        terminos = palabras(q)
+        with self.lock:
+            # None = todo el catálogo (sin copiarlo)
+            candidatos: Optional[set[int]] = None
+            coincidentes = [self._coincidentes(t) for t in terminos]
+            if terminos:
+                # Intersección empezando por la palabra más selectiva
+                for ids in sorted(map(self._prefijo, coincidentes), key=len):
+                    candidatos = ids if candidatos is None else candidatos & ids
+                    if not candidatos:
+                        break
+
+            rangos = [
+                (self._por_precio, self._precio, precio_min, precio_max),
+                (self._por_stock, self._stock, stock_min, stock_max),
+            ]
+            for arr, valores, lo, hi in rangos:
+                if lo is None and hi is None:
+                    continue
+                tramo = self._tramo(arr, lo, hi)
+                # Armar el conjunto del tramo corre en C; filtrar candidatos uno a uno, en Python
+                if candidatos is None or len(tramo) < 5 * len(candidatos):
+                    en_rango = set(map(_ID, tramo))
+                    candidatos = en_rango if candidatos is None else candidatos & en_rango
+                else:
+                    candidatos = {
+                        pid for pid in candidatos
+                        if (lo is None or valores[pid] >= lo) and (hi is None or valores[pid] <= hi)
+                    }
+
+            sin_rangos = all(lo is None and hi is None for _arr, _valores, lo, hi in rangos)
+            if candidatos is None:
+                facetas = {c: len(ids) for c, ids in self._categorias.items()}
+            elif sin_rangos and len(coincidentes) == 1 and len(coincidentes[0]) == 1:
+                # Una sola palabra del índice: sus facetas ya están contadas
+                facetas = self._facetas_palabra[coincidentes[0][0]]
+            else:
+                facetas = Counter(map(self._categoria.__getitem__, candidatos))
+
+            if categorias:
+                elegidas = [self._categorias.get(c, set()) for c in set(categorias)]
+                if candidatos is not None:
+                    elegidas = [candidatos.intersection(ids) for ids in elegidas]
+                candidatos = elegidas[0] if len(elegidas) == 1 else set().union(*elegidas)
+            elif candidatos is None:
+                candidatos = self._docs.keys()
+
+            total = len(candidatos)
+            pagina = self._ordenar(candidatos, terminos, orden, offset + limite)[offset:]
+            productos = [dict(self._docs[pid]) for pid in pagina]
+            facetas = dict(sorted(facetas.items(), key=lambda kv: (-kv[1], str(kv[0]))))
+        return {"total": total, "productos": productos, "facetas": facetas}
+
+    def _primeros(self, ids, arr: list[tuple], valores: dict, n: int, descendente: bool = False) -> list[int]:
+        """Los primeros `n` de `ids` en el orden de `arr` (un arreglo ordenado o un tramo)."""
+        if n <= 0 or not ids:
+            return []
+        if len(ids) > ORDENAR_HASTA:
+            # Se recorre a lo más ~2 veces la cantidad de resultados antes de ordenarlos completos
+            out = []
+            for pasos, (_valor, pid) in enumerate(reversed(arr) if descendente else arr):
+                if pid in ids:
+                    out.append(pid)
+                    if len(out) >= n:
+                        return out
+                if pasos > 2 * len(ids):
+                    break
+            else:
+                return out
+        # sorted por id y luego (estable) por valor: todo en C, empates por id
+        return sorted(sorted(ids), key=valores.__getitem__, reverse=descendente)[:n]
+
+    def _ordenar(self, ids, terminos: list[str], orden: str, n: int) -> list[int]:
+        if orden in ("precio", "-precio"):
+            return self._primeros(ids, self._por_precio, self._precio, n, descendente=orden == "-precio")
+        if orden == "stock":
+            return self._primeros(ids, self._por_stock, self._stock, n)
+        if orden == "relevancia" and terminos:
+            t = terminos[0]
+            if len(ids) <= ORDENAR_HASTA:
+                por_nombre = sorted(sorted(ids), key=self._nombre.__getitem__)
+                return sorted(por_nombre, key=lambda pid: not self._nombre[pid].startswith(t))[:n]
+            # Los nombres que empiezan con la primera palabra son un tramo contiguo de _por_nombre
+            arr = self._por_nombre
+            lo = bisect_left(arr, (t, -math.inf))
+            hi = bisect_left(arr, (t + "\uffff", -math.inf))
+            out = []
+            for _nombre, pid in islice(arr, lo, hi):
+                if pid in ids:
+                    out.append(pid)
+                    if len(out) >= n:
+                        return out
+            return out + self._primeros(ids.difference(out), arr, self._nombre, n - len(out))
+        return self._primeros(ids, self._por_nombre, self._nombre, n)
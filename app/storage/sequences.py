@@ -0,0 +1,68 @@
+from __future__ import annotations
+import threading
+from pathlib import Path
+from typing import Optional
+
+from app.utils import load_json
+
+# Secuencias que no son el id de una colección, con la colección cuyo lock las protege
+OWNERS = {"compra_id": "ventas"}
+
+
+def owner(name: str) -> str:
+    """Colección que hay que tener bloqueada para avanzar la secuencia `name`."""
+    return OWNERS.get(name, name)
+
+
+class Sequences:
+    """
+    Contadores persistentes (último valor entregado) para los ids de cada
+    colección y para compra_id.
+
+    Una transacción que reserva valores los escribe en su propio registro
+    del journal (`"seq": {nombre: último}`), así que avanzan junto con los
+    datos y los demás procesos los reciben al leer el journal. Cada
+    secuencia sólo se avanza con el lock de su colección tomado. Nunca
+    retroceden: un id borrado no se vuelve a entregar.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.Lock()
+        self._values: dict[str, int] = {}
+        self._dirty = False
+
+    def load(self) -> None:
+        self._values = {k: int(v) for k, v in load_json(self.path, default={}).items()}
+        self._dirty = False
+
+    def current(self, name: str) -> int:
+        """Último valor entregado (0 si nunca se usó)."""
+        return self._values.get(name, 0)
+
+    def advance(self, name: str, value: Optional[int]) -> None:
+        """Lleva la secuencia al menos hasta `value`."""
+        if not isinstance(value, int):
+            return
+        with self.lock:
+            if value > self._values.get(name, 0):
+                self._values[name] = value
+                self._dirty = True
+
+    def apply(self, values: dict) -> None:
+        for name, value in values.items():
+            self.advance(name, value)
+
+    @property
+    def dirty(self) -> bool:
+        return self._dirty
+
+    def take_snapshot(self) -> Optional[dict]:
+        with self.lock:
+            if not self._dirty:
+                return None
+            self._dirty = False
+            return dict(self._values)
+
+    def mark_dirty(self) -> None:
+        self._dirty = True
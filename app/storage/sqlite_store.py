@@ -0,0 +1,561 @@
+from __future__ import annotations
+import json
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional
+
+from app import config, metrics
+from app.storage.alerts import StockAlerts
+from app.storage.columnar import ColumnarVentas
+from app.storage.indexes import UniqueViolation
+from app.storage.kpis import RunningKpis
+from app.storage.search import ProductSearch
+from app.storage.sequences import owner
+from app.utils import to_timestamp
+
+# Columnas de cada tabla. Si se agrega una columna aquí, `open` la crea en
+# bases existentes con ALTER TABLE.
+SCHEMA: dict[str, dict[str, str]] = {
+    "empresas": {
+        "id": "INTEGER PRIMARY KEY",
+        "nombre": "TEXT NOT NULL",
+        "rut": "TEXT NOT NULL",
+        "giro": "TEXT",
+        "telefono": "TEXT",
+        "email": "TEXT",
+        "direccion": "TEXT",
+    },
+    "productos": {
+        "id": "INTEGER PRIMARY KEY",
+        "nombre": "TEXT NOT NULL",
+        "precio": "REAL NOT NULL",
+        "stock": "INTEGER NOT NULL",
+        "costo": "REAL NOT NULL",
+        "categoria": "TEXT NOT NULL",
+        "stock_minimo": "INTEGER",
+    },
+    "ventas": {
+        "id": "INTEGER PRIMARY KEY",
+        "compra_id": "INTEGER",
+        "producto_id": "INTEGER NOT NULL",
+        "empresa_id": "INTEGER NOT NULL",
+        "cantidad": "INTEGER NOT NULL",
+        "total": "REAL NOT NULL",
+        "fecha": "TEXT NOT NULL",
+        # precio y costo del producto al momento de la venta
+        "precio_unitario": "REAL",
+        "costo_unitario": "REAL",
+        # fecha en segundos epoch (UTC), para filtrar y ordenar por índice
+        "ts": "REAL",
+    },
+    "idempotencia": {
+        "clave": "TEXT PRIMARY KEY",
+        "status": "INTEGER",
+        "resultado": "TEXT",
+        "fecha": "TEXT",
+    },
+}
+
+# Clave primaria de las tablas que no usan "id"
+KEYS = {"idempotencia": "clave"}
+
+# Columnas guardadas como texto JSON
+JSON_COLUMNS = {"idempotencia": ("resultado",)}
+
+# Campos con índice UNIQUE, para traducir IntegrityError a UniqueViolation
+UNIQUE_FIELDS = {"empresas": ("rut",)}
+
+# Columnas internas que no se devuelven a la API
+INTERNAL_COLUMNS = {"ts"}
+
+# Contadores de ids y compra_id (ver app.storage.sequences)
+SEQUENCES_DDL = "CREATE TABLE IF NOT EXISTS sequences (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+
+# Versión por tabla, compartida por todos los procesos (ETag / Last-Modified de la API)
+VERSIONS_DDL = (
+    "CREATE TABLE IF NOT EXISTS versiones "
+    "(name TEXT PRIMARY KEY, version INTEGER NOT NULL, modificado REAL NOT NULL)"
+)
+
+# Ventas de antes de guardar precio/costo por línea (ver rollups.con_costos);
+# corre una vez, al agregar las columnas a una base existente
+COMPLETAR_COSTOS = """
+    UPDATE ventas SET
+        precio_unitario = CASE WHEN cantidad > 0 THEN total / cantidad END,
+        costo_unitario = (SELECT p.costo FROM productos p WHERE p.id = ventas.producto_id)
+    WHERE costo_unitario IS NULL
+"""
+
+INDEXES = [
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_empresas_rut ON empresas(rut)",
+    "CREATE INDEX IF NOT EXISTS ix_productos_categoria ON productos(categoria)",
+    "CREATE INDEX IF NOT EXISTS ix_ventas_fecha ON ventas(ts)",
+    "CREATE INDEX IF NOT EXISTS ix_ventas_empresa ON ventas(empresa_id, ts)",
+    "CREATE INDEX IF NOT EXISTS ix_ventas_producto ON ventas(producto_id, ts)",
+    "CREATE INDEX IF NOT EXISTS ix_ventas_compra ON ventas(compra_id)",
+]
+
+
+class PoolAgotado(Exception):
+    """No se liberó ninguna conexión del pool dentro del tiempo de espera."""
+
+
+class ConnectionPool:
+    """
+    Pool simple de conexiones SQLite compartidas entre hilos. Con todas en
+    uso se espera a lo más `timeout` segundos a que se libere una y luego
+    se lanza PoolAgotado (la app responde 503), en vez de colgar el hilo.
+    """
+
+    def __init__(self, path: Path, size: int, timeout: float = 10.0):
+        self.path = path
+        self.size = max(1, size)
+        self.timeout = timeout
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # isolation_level=None: autocommit; las transacciones se abren con BEGIN explícito
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                crear = self._created < self.size
+                if crear:
+                    self._created += 1
+            if crear:
+                conn = self._connect()
+            else:
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise PoolAgotado(
+                        f"Sin conexiones SQLite libres tras {self.timeout:g} s ({self.size} en uso)"
+                    ) from None
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        self._created = 0
+
+
+def _key(name: str) -> str:
+    return KEYS.get(name, "id")
+
+
+def sequence_value(conn: sqlite3.Connection, name: str) -> int:
+    """Último valor entregado de la secuencia; la primera vez parte del máximo guardado."""
+    row = conn.execute("SELECT value FROM sequences WHERE name = ?", (name,)).fetchone()
+    if row is not None:
+        return row[0]
+    table = owner(name)
+    field = name if name != table else "id"
+    return conn.execute(f"SELECT MAX({field}) FROM {table}").fetchone()[0] or 0
+
+
+def _to_dict(row: sqlite3.Row, name: Optional[str] = None) -> dict:
+    out = {k: row[k] for k in row.keys() if k not in INTERNAL_COLUMNS}
+    for c in JSON_COLUMNS.get(name, ()):
+        if out.get(c) is not None:
+            out[c] = json.loads(out[c])
+    return out
+
+
+def _prepare(name: str, row: dict) -> dict:
+    """Fila lista para INSERT: sólo columnas conocidas, más las internas."""
+    data = {c: row.get(c) for c in SCHEMA[name] if c not in INTERNAL_COLUMNS}
+    for c in JSON_COLUMNS.get(name, ()):
+        if data.get(c) is not None:
+            data[c] = json.dumps(data[c], ensure_ascii=False, default=str)
+    if name == "ventas":
+        try:
+            data["ts"] = to_timestamp(row.get("fecha") or "")
+        except ValueError:
+            data["ts"] = None
+    return data
+
+
+class SqliteCollection:
+    """Misma interfaz de lectura/escritura que `Collection`, sobre una tabla."""
+
+    def __init__(self, store: "SqliteStore", name: str, key: str = "id"):
+        self.store = store
+        self.name = name
+        self.key = key
+
+    def _query(self, sql: str, params=()) -> list[sqlite3.Row]:
+        with self.store.pool.connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def get(self, key) -> Optional[dict]:
+        rows = self._query(f"SELECT * FROM {self.name} WHERE {self.key} = ?", (key,))
+        return _to_dict(rows[0], self.name) if rows else None
+
+    def __contains__(self, key) -> bool:
+        return bool(self._query(f"SELECT 1 FROM {self.name} WHERE {self.key} = ?", (key,)))
+
+    def __len__(self) -> int:
+        return self._query(f"SELECT COUNT(*) FROM {self.name}")[0][0]
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self.all())
+
+    def all(self) -> list[dict]:
+        return [_to_dict(r, self.name) for r in self._query(f"SELECT * FROM {self.name} ORDER BY {self.key}")]
+
+    def page(self, after_id=None, limit: Optional[int] = None) -> list[dict]:
+        """Filas con id mayor a `after_id` (todas si es None), ordenadas por id, hasta `limit`."""
+        where, params = ("", ()) if after_id is None else (f"WHERE {self.key} > ?", (after_id,))
+        sql = f"SELECT * FROM {self.name} {where} ORDER BY {self.key}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params += (limit,)
+        return [_to_dict(r, self.name) for r in self._query(sql, params)]
+
+    def find(self, field: str, value) -> list[dict]:
+        if field not in SCHEMA[self.name]:
+            raise KeyError(field)
+        rows = self._query(f"SELECT * FROM {self.name} WHERE {field} = ? ORDER BY {self.key}", (value,))
+        return [_to_dict(r, self.name) for r in rows]
+
+    def next_id(self) -> int:
+        with self.store.pool.connection() as conn:
+            return sequence_value(conn, self.name) + 1
+
+    def insert(self, row: dict) -> dict:
+        return self.insert_many([row])[0]
+
+    def insert_many(self, rows: list[dict]) -> list[dict]:
+        with self.store.transaction(self.name) as tx:
+            for row in rows:
+                tx.insert(self.name, row)
+        return rows
+
+    def update(self, key, row: dict) -> Optional[dict]:
+        with self.store.transaction(self.name) as tx:
+            if not tx.exists(self.name, key):
+                return None
+            row[self.key] = key
+            tx.put(self.name, row)
+        return row
+
+    def delete(self, key) -> Optional[dict]:
+        with self.store.transaction(self.name) as tx:
+            eliminado = tx.get(self.name, key)
+            if eliminado is not None:
+                tx.delete(self.name, key)
+        return eliminado
+
+
+class SqliteTransaction:
+    """
+    Misma interfaz que `Transaction`, sobre una transacción SQLite.
+    BEGIN IMMEDIATE toma el lock de escritura de la base al entrar, así que
+    las validaciones de stock y la escritura quedan serializadas también
+    entre procesos.
+    """
+
+    def __init__(self, store: "SqliteStore", names):
+        self.store = store
+        self.names = sorted(set(names))
+        self._ctx = None
+        self._conn: Optional[sqlite3.Connection] = None
+        # (colección, antes, después) para avisar a las vistas tras el COMMIT
+        self._cambios: list[tuple[str, Optional[dict], Optional[dict]]] = []
+
+    def __enter__(self) -> "SqliteTransaction":
+        self._ctx = self.store.pool.connection()
+        self._conn = self._ctx.__enter__()
+        # BEGIN IMMEDIATE espera (hasta el timeout de la conexión) a que se libere el lock de escritura
+        try:
+            with metrics.lock_wait.time(lock="sqlite", kind="base"):
+                self._conn.execute("BEGIN IMMEDIATE")
+        except BaseException:
+            # Sin transacción abierta __exit__ no corre: la conexión vuelve al pool acá
+            self._ctx.__exit__(None, None, None)
+            self._conn = None
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            if exc_type is None:
+                self._bump_versions()
+                with metrics.commit_seconds.time(backend="sqlite"):
+                    self._conn.execute("COMMIT")
+            else:
+                self._conn.execute("ROLLBACK")
+        finally:
+            self._ctx.__exit__(None, None, None)
+            self._conn = None
+        if exc_type is None:
+            for name, old, new in self._cambios:
+                self.store.notify(name, old, new)
+
+    def _bump_versions(self) -> None:
+        ahora = time.time()
+        for name in {c[0] for c in self._cambios}:
+            self._conn.execute(
+                "INSERT INTO versiones (name, version, modificado) VALUES (?, 1, ?) "
+                "ON CONFLICT(name) DO UPDATE SET version = version + 1, modificado = excluded.modificado",
+                (name, ahora),
+            )
+
+    def _check(self, name: str) -> None:
+        if name not in self.names:
+            raise KeyError(f"La colección '{name}' no está bloqueada por esta transacción")
+
+    def get(self, name: str, key) -> Optional[dict]:
+        self._check(name)
+        row = self._conn.execute(f"SELECT * FROM {name} WHERE {_key(name)} = ?", (key,)).fetchone()
+        return _to_dict(row, name) if row else None
+
+    def exists(self, name: str, key) -> bool:
+        self._check(name)
+        return self._conn.execute(f"SELECT 1 FROM {name} WHERE {_key(name)} = ?", (key,)).fetchone() is not None
+
+    # ---------- secuencias ----------
+
+    def _seq_value(self, name: str) -> int:
+        self._check(owner(name))
+        return sequence_value(self._conn, name)
+
+    def _seq_set(self, name: str, value: int) -> None:
+        self._conn.execute(
+            "INSERT INTO sequences (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+            (name, value),
+        )
+
+    def reserve(self, name: str, n: int = 1) -> int:
+        first = self._seq_value(name) + 1
+        self._seq_set(name, first + n - 1)
+        return first
+
+    def next_value(self, name: str) -> int:
+        return self.reserve(name, 1)
+
+    def advance(self, name: str, value: int) -> None:
+        if value > self._seq_value(name):
+            self._seq_set(name, value)
+
+    def insert(self, name: str, row: dict) -> dict:
+        self._check(name)
+        data = _prepare(name, row)
+        key = _key(name)
+        if key == "id":
+            if data.get("id") is None:
+                data["id"] = self.next_value(name)
+            elif isinstance(data["id"], int):
+                self.advance(name, data["id"])
+        cols = ", ".join(data)
+        marks = ", ".join("?" * len(data))
+        self._write(name, f"INSERT INTO {name} ({cols}) VALUES ({marks})", data)
+        row[key] = data[key]
+        self._cambios.append((name, None, row))
+        return row
+
+    def put(self, name: str, row: dict) -> dict:
+        self._check(name)
+        key = _key(name)
+        old = self.get(name, row[key])
+        data = _prepare(name, row)
+        cols = ", ".join(data)
+        marks = ", ".join("?" * len(data))
+        # Upsert por id (no INSERT OR REPLACE, que borraría otra fila con el mismo RUT)
+        sets = ", ".join(f"{c} = excluded.{c}" for c in data if c != key)
+        self._write(name, f"INSERT INTO {name} ({cols}) VALUES ({marks}) ON CONFLICT({key}) DO UPDATE SET {sets}", data)
+        self._cambios.append((name, old, row))
+        return row
+
+    def _write(self, name: str, sql: str, data: dict) -> None:
+        try:
+            self._conn.execute(sql, tuple(data.values()))
+        except sqlite3.IntegrityError as e:
+            for field in UNIQUE_FIELDS.get(name, ()):
+                if f"{name}.{field}" in str(e):
+                    raise UniqueViolation(name, field, data.get(field)) from e
+            raise
+
+    def delete(self, name: str, key) -> None:
+        self._check(name)
+        old = self.get(name, key)
+        self._conn.execute(f"DELETE FROM {name} WHERE {_key(name)} = ?", (key,))
+        if old is not None:
+            self._cambios.append((name, old, None))
+
+
+class SqliteStore:
+    """
+    Backend SQLite (modo WAL) con la misma interfaz que `Store`.
+    Los filtros de ventas por empresa, producto y fecha se resuelven con
+    los índices de la base en vez de recorrer listas en Python.
+
+    Las vistas en memoria (`views`) se cargan desde la base al abrir y
+    reciben los cambios de las transacciones de este proceso; con varios
+    workers, cada uno ve en ellas sólo sus propias escrituras hasta el
+    próximo `rebuild_views`.
+    """
+
+    def __init__(self, path: Path, pool_size: int = 8, pool_timeout: float = 10.0):
+        self.path = path
+        self.pool = ConnectionPool(path, pool_size, pool_timeout)
+        self.empresas = SqliteCollection(self, "empresas")
+        self.productos = SqliteCollection(self, "productos")
+        self.ventas = SqliteCollection(self, "ventas")
+        self.idempotencia = SqliteCollection(self, "idempotencia", key="clave")
+        self._by_name = {c.name: c for c in self.collections()}
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+        # Las versiones viven en la base, así que valen para todos los procesos
+        self.instancia = "sqlite"
+
+        self.analytics = ColumnarVentas()
+        self.alerts = StockAlerts(config.STOCK_MINIMO, config.STOCK_MINIMO_CATEGORIAS)
+        self.kpis = RunningKpis()
+        self.search = ProductSearch()
+        self.views = [self.analytics, self.alerts, self.kpis, self.search]
+
+    def collections(self) -> list[SqliteCollection]:
+        return [self.empresas, self.productos, self.ventas, self.idempotencia]
+
+    def collection(self, name: str) -> SqliteCollection:
+        return self._by_name[name]
+
+    # ---------- ciclo de vida ----------
+
+    def open(self) -> None:
+        self.ensure_fresh()
+
+    def close(self) -> None:
+        self.pool.close()
+
+    def flush(self, force: bool = False) -> None:
+        """Cada transacción ya queda confirmada en la base; nada que volcar."""
+
+    def rebuild_views(self) -> None:
+        """Recarga desde la base las vistas en memoria (los agregados de flujo de caja van en SQL)."""
+        for view in self.views:
+            view.rebuild(self)
+
+    def notify(self, name: str, old, new) -> None:
+        for view in self.views:
+            view.apply(name, old, new)
+
+    def ensure_fresh(self) -> None:
+        if self._schema_ready:
+            return
+        with self._schema_lock:
+            if self._schema_ready:
+                return
+            with self.pool.connection() as conn:
+                agregadas = set()
+                for table, columns in SCHEMA.items():
+                    cols = ", ".join(f"{c} {t}" for c, t in columns.items())
+                    conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({cols})")
+                    existentes = {r["name"] for r in conn.execute(f"PRAGMA table_info({table})")}
+                    for c, t in columns.items():
+                        if c not in existentes:
+                            conn.execute(f"ALTER TABLE {table} ADD COLUMN {c} {t.replace('NOT NULL', '')}")
+                            agregadas.add((table, c))
+                conn.execute(SEQUENCES_DDL)
+                conn.execute(VERSIONS_DDL)
+                conn.executemany(
+                    "INSERT OR IGNORE INTO versiones (name, version, modificado) VALUES (?, 0, ?)",
+                    [(c.name, time.time()) for c in self.collections()],
+                )
+                if ("ventas", "costo_unitario") in agregadas:
+                    conn.execute("BEGIN IMMEDIATE")
+                    conn.execute(COMPLETAR_COSTOS)
+                    conn.execute(
+                        "UPDATE versiones SET version = version + 1, modificado = ? WHERE name = 'ventas'",
+                        (time.time(),),
+                    )
+                    conn.execute("COMMIT")
+                for ddl in INDEXES:
+                    conn.execute(ddl)
+            self.rebuild_views()
+            self._schema_ready = True
+
+    def transaction(self, *names: str) -> SqliteTransaction:
+        self.ensure_fresh()
+        return SqliteTransaction(self, names)
+
+    # ---------- consultas ----------
+
+    def versiones(self, names) -> dict[str, tuple[int, float]]:
+        """(versión, fecha de la última escritura en segundos epoch) de cada tabla."""
+        self.ensure_fresh()
+        with self.pool.connection() as conn:
+            rows = {r["name"]: (r["version"], r["modificado"]) for r in conn.execute("SELECT * FROM versiones")}
+        return {n: rows.get(n, (0, 0.0)) for n in names}
+
+    def query_ventas(
+        self,
+        empresa_id: Optional[int] = None,
+        producto_id: Optional[int] = None,
+        desde: Optional[datetime] = None,
+        hasta: Optional[datetime] = None,
+    ) -> list[dict]:
+        where, params = self._ventas_where(empresa_id, producto_id, desde, hasta)
+        sql = f"SELECT * FROM ventas {where} ORDER BY id"
+        with self.pool.connection() as conn:
+            return [_to_dict(r) for r in conn.execute(sql, params)]
+
+    def resumen_ventas(self, desde: datetime, hasta: datetime) -> dict:
+        where, params = self._ventas_where(None, None, desde, hasta, alias="v")
+        # Margen con el costo guardado en cada venta: sin JOIN con productos
+        sql = f"""
+            SELECT COALESCE(SUM(v.total), 0),
+                   COALESCE(SUM(v.cantidad), 0),
+                   COALESCE(SUM(v.total - v.cantidad * v.costo_unitario), 0)
+            FROM ventas v
+            {where}
+        """
+        with self.pool.connection() as conn:
+            total, cantidad, ganancia = conn.execute(sql, params).fetchone()
+        return {
+            "ventas_totales": float(total),
+            "ganancias_totales": float(ganancia),
+            "productos_vendidos": int(cantidad),
+        }
+
+    @staticmethod
+    def _ventas_where(empresa_id, producto_id, desde, hasta, alias: str = "ventas"):
+        conds, params = [], []
+        if empresa_id is not None:
+            conds.append(f"{alias}.empresa_id = ?")
+            params.append(empresa_id)
+        if producto_id is not None:
+            conds.append(f"{alias}.producto_id = ?")
+            params.append(producto_id)
+        if desde is not None:
+            conds.append(f"{alias}.ts >= ?")
+            params.append(to_timestamp(desde))
+        if hasta is not None:
+            conds.append(f"{alias}.ts <= ?")
+            params.append(to_timestamp(hasta))
+        where = ("WHERE " + " AND ".join(conds)) if conds else ""
+        return where, params
@@ -0,0 +1,419 @@
+from __future__ import annotations
+import logging
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from app import codec, config, metrics
+from app.storage.alerts import StockAlerts
+from app.storage.collection import Collection
+from app.storage.columnar import ColumnarVentas
+from app.storage.journal import Journal
+from app.storage.kpis import RunningKpis
+from app.storage.partitions import PartitionedCollection
+from app.storage.locks import FileLock, supports_file_locks
+from app.storage.rollups import DailyRollups, con_costos
+from app.storage.search import ProductSearch
+from app.storage.sequences import Sequences
+from app.storage.time_index import VentasIndex
+from app.storage.transaction import Transaction
+from app.utils import atomic_write_many, recover_atomic_write, to_timestamp
+
+logger = logging.getLogger(__name__)
+
+# Ventas por transacción al completar precio/costo de las ventas antiguas
+LOTE_COSTOS = 10_000
+
+
+class Store:
+    """
+    Repositorio compartido por todos los routers.
+
+    Mantiene cada colección en memoria. Toda escritura es una transacción
+    que se registra como una línea en el journal (journal.jsonl, con fsync)
+    antes de aplicarse en memoria; los snapshots JSON se actualizan en
+    segundo plano con un checkpoint cada `compact_every` registros y al
+    apagar la app. El checkpoint reemplaza todos los snapshots sucios de una
+    vez (temporales + marcador de commit + renombres) y luego descarta el
+    journal ya incluido. Al arrancar se leen los snapshots y se re-aplica el
+    journal.
+
+    Con `multiprocess=True` (varios workers de uvicorn sobre el mismo
+    DATA_DIR) las transacciones además toman locks de archivo por colección
+    y cada proceso se pone al día leyendo lo que los otros agregaron al
+    journal antes de leer o escribir.
+
+    Las vistas derivadas (`views`: índice de fechas, agregados diarios,
+    columnas para analítica, alertas de stock, indicadores, búsqueda) se
+    reconstruyen al cargar y luego reciben cada cambio aplicado, venga de
+    este proceso o de otro.
+    """
+
+    def __init__(self, data_dir: Path, flush_interval: float, compact_every: int,
+                 multiprocess: bool = False):
+        self.data_dir = data_dir
+        self.flush_interval = flush_interval
+        self.compact_every = compact_every
+        self.multiprocess = multiprocess and supports_file_locks()
+
+        self.empresas = Collection(self, "empresas", data_dir / "empresas.json")
+        self.productos = Collection(self, "productos", data_dir / "productos.json")
+        # Un archivo por mes en data/ventas/ (el ventas.json único de antes se migra solo)
+        self.ventas = PartitionedCollection(self, "ventas", data_dir / "ventas", data_dir / "ventas.json")
+        # Resultados de operaciones con clave de idempotencia (POST /ventas/bulk)
+        self.idempotencia = Collection(self, "idempotencia", data_dir / "idempotencia.json", key="clave")
+        self._by_name = {c.name: c for c in self.collections()}
+        for c in self.collections():
+            c.formato = config.SNAPSHOT_FORMATS.get(c.name, "json")
+            codec.check_formato(c.formato)
+        codec.check_formato(self.ventas.archive_format)
+        # Los contadores de versión son de este proceso: la instancia los distingue
+        self.instancia = uuid.uuid4().hex[:12]
+        self.empresas.add_index("rut", unique=True)
+        self.productos.add_index("categoria")
+
+        # Contadores de ids y de compra_id (se vuelcan con los snapshots)
+        self.sequences = Sequences(data_dir / "secuencias.json")
+
+        self.journal = Journal(data_dir / "journal.jsonl")
+        self._commit_marker = data_dir / "checkpoint.commit"
+        self._locks_dir = data_dir / ".locks"
+
+        self.ventas_index = VentasIndex()
+        self.rollups = DailyRollups(self.ventas_index)
+        self.analytics = ColumnarVentas()
+        self.alerts = StockAlerts(config.STOCK_MINIMO, config.STOCK_MINIMO_CATEGORIAS)
+        self.kpis = RunningKpis()
+        self.search = ProductSearch()
+        # El índice va primero: los agregados lo usan para los días de borde
+        self.views = [self.ventas_index, self.rollups, self.analytics, self.alerts, self.kpis, self.search]
+
+        self._loaded = False
+        self._loading = False
+        self._load_lock = threading.Lock()
+        # Serializa la lectura/escritura del journal dentro del proceso. Reentrante:
+        # una recarga desde _sync reconstruye las vistas, que vuelven a leer colecciones
+        self._journal_lock = threading.RLock()
+        # Hasta dónde del journal (inodo, offset) ya aplicó cambios este proceso
+        self._journal_ino: int | None = None
+        self._journal_pos = 0
+
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def collections(self) -> list[Collection]:
+        return [self.empresas, self.productos, self.ventas, self.idempotencia]
+
+    def collection(self, name: str) -> Collection:
+        return self._by_name[name]
+
+    # ---------- ciclo de vida ----------
+
+    def open(self) -> None:
+        """Carga todas las colecciones y arranca el hilo de checkpoint."""
+        self.ensure_fresh()
+        self._completar_costos()
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="store-flusher", daemon=True)
+            self._thread.start()
+
+    def close(self) -> None:
+        """Detiene el hilo de checkpoint y deja los snapshots al día."""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush(force=True)
+        self.journal.close()
+
+    def _completar_costos(self) -> None:
+        """
+        Migración de las ventas anteriores a precio_unitario/costo_unitario
+        por línea (ver `con_costos`), por lotes. Con varios procesos el
+        primero las completa y los demás ya no encuentran pendientes.
+        """
+        pendientes = [v["id"] for v in self.ventas.all() if "costo_unitario" not in v]
+        completadas = 0
+        for i in range(0, len(pendientes), LOTE_COSTOS):
+            with self.transaction("productos", "ventas") as tx:
+                for vid in pendientes[i:i + LOTE_COSTOS]:
+                    v = tx.get("ventas", vid)
+                    if v is not None and "costo_unitario" not in v:
+                        tx.put("ventas", con_costos(v, tx.get("productos", v.get("producto_id"))))
+                        completadas += 1
+        if completadas:
+            logger.info("Precio y costo completados en %d ventas antiguas", completadas)
+
+    def load(self) -> None:
+        """(Re)carga snapshots y journal desde disco."""
+        with self._file_lock("checkpoint", shared=True), self._file_lock("journal"):
+            self._loading = True
+            try:
+                recover_atomic_write(self._commit_marker)
+                for c in self.collections():
+                    c.load()
+                self.sequences.load()
+                self._replay_legacy_ventas_journal()
+                for record in self.journal.replay():
+                    self._apply(record)
+                self._seed_sequences()
+                ident = self.journal.identity()
+                self._journal_ino, self._journal_pos = ident if ident else (None, 0)
+            finally:
+                self._loading = False
+            self._loaded = True
+            self.rebuild_views()
+
+    def rebuild_views(self) -> None:
+        """Recalcula desde cero todas las vistas derivadas."""
+        for view in self.views:
+            view.rebuild(self)
+
+    def notify(self, name: str, old, new) -> None:
+        """Avisa a las vistas de un cambio ya aplicado en memoria."""
+        if self._loading:
+            return
+        for view in self.views:
+            view.apply(name, old, new)
+
+    def _seed_sequences(self) -> None:
+        # Datos anteriores a las secuencias (o editados a mano): nunca por debajo del máximo guardado
+        for c in self.collections():
+            self.sequences.advance(c.name, c._max_id)
+        self.sequences.advance(
+            "compra_id",
+            max((v.get("compra_id") or 0 for v in self.ventas._rows.values()), default=0),
+        )
+
+    def _replay_legacy_ventas_journal(self) -> None:
+        # Versiones anteriores tenían un journal propio sólo para ventas
+        legacy = Journal(self.data_dir / "ventas.jsonl")
+        for record in legacy.replay():
+            self.ventas.apply(record.get("put", ()), record.get("del", ()))
+
+    def ensure_fresh(self) -> None:
+        """
+        Garantiza que la memoria refleja el disco: carga la primera vez y,
+        en modo multiproceso, aplica lo que otros procesos agregaron al journal.
+        """
+        if not self._loaded:
+            with self._load_lock:
+                if not self._loaded:
+                    self.load()
+            return
+        if self.multiprocess:
+            self._sync()
+
+    def _sync(self) -> None:
+        with self._journal_lock:
+            ident = self.journal.identity()
+            if ident is None and self._journal_ino is None:
+                return
+            if ident == (self._journal_ino, self._journal_pos):
+                return
+            if ident is None or ident[0] != self._journal_ino or ident[1] < self._journal_pos:
+                # Otro proceso hizo checkpoint y rotó el journal: recargar todo
+                self.load()
+                return
+            records, self._journal_pos = self.journal.read_from(self._journal_pos)
+            for record in records:
+                self._apply(record)
+
+    # ---------- transacciones ----------
+
+    def transaction(self, *names: str) -> Transaction:
+        return Transaction(self, names)
+
+    def begin(self, names: list[str]):
+        """
+        Toma los locks (de archivo y luego en memoria, siempre en el mismo
+        orden) de las colecciones de una transacción y se pone al día con el
+        disco. Devuelve la función que libera los locks.
+        """
+        stack = ExitStack()
+        try:
+            for name in names:
+                self._wait(stack, self._file_lock(name), name, "archivo")
+            self.ensure_fresh()
+            for name in names:
+                self._wait(stack, self.collection(name).lock, name, "memoria")
+        except BaseException:
+            stack.close()
+            raise
+        return stack.close
+
+    def _wait(self, stack: ExitStack, lock, name: str, kind: str) -> None:
+        """Toma `lock` dentro de `stack` registrando cuánto hubo que esperarlo."""
+        if lock is _NO_LOCK:
+            return
+        with metrics.lock_wait.time(lock=name, kind=kind):
+            stack.enter_context(lock)
+
+    def commit(self, record: dict) -> None:
+        """Escribe el registro en el journal (con fsync) y lo aplica en memoria."""
+        with ExitStack() as stack:
+            self._wait(stack, self._journal_lock, "journal", "memoria")
+            self._wait(stack, self._file_lock("journal"), "journal", "archivo")
+            t = time.perf_counter()
+            if self.multiprocess:
+                # Lo que otros procesos agregaron desde nuestro begin no toca
+                # nuestras colecciones (tenemos sus locks), pero va antes que lo nuestro
+                records, self._journal_pos = self.journal.read_from(self._journal_pos)
+                for r in records:
+                    self._apply(r)
+            self._journal_pos = self.journal.append(record)
+            metrics.commit_seconds.observe(time.perf_counter() - t, backend="json")
+            ident = self.journal.identity()
+            self._journal_ino = ident[0] if ident else None
+            self._apply(record)
+        if self.journal.records >= self.compact_every:
+            self._wakeup.set()
+
+    def _apply(self, record: dict) -> None:
+        puts = record.get("put", {})
+        deletes = record.get("del", {})
+        for name in puts.keys() | deletes.keys():
+            self.collection(name).apply(puts.get(name, ()), deletes.get(name, ()))
+        self.sequences.apply(record.get("seq", {}))
+
+    def _file_lock(self, name: str, shared: bool = False):
+        if not self.multiprocess:
+            return _NO_LOCK
+        return FileLock(self._locks_dir / f"{name}.lock", shared=shared)
+
+    # ---------- checkpoint ----------
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                # No matamos el hilo: el journal sigue intacto y se reintenta
+                logger.exception("Error en checkpoint de colecciones")
+
+    def flush(self, force: bool = False) -> None:
+        """
+        Checkpoint: escribe los snapshots de las colecciones sucias y descarta
+        el journal que ya quedó incluido en ellos. Sin `force` sólo actúa si
+        el journal llegó a `compact_every` registros.
+        """
+        if not self._loaded:
+            return
+        names = sorted(self._by_name)
+        legacy = self.data_dir / "ventas.jsonl"
+        with self._flush_lock, ExitStack() as stack:
+            for name in names:
+                stack.enter_context(self._file_lock(name))
+            self.ensure_fresh()
+            stack.enter_context(self._file_lock("checkpoint"))
+
+            if not force and self.journal.records < self.compact_every:
+                return
+            if not any(c.dirty for c in self.collections()) and not self.sequences.dirty and not legacy.exists():
+                return
+
+            t = time.perf_counter()
+            with ExitStack() as mem_locks:
+                for name in names:
+                    mem_locks.enter_context(self.collection(name).lock)
+                snapshots = {c: c.take_snapshot() for c in self.collections()}
+                sequences = self.sequences.take_snapshot()
+                self.journal.rotate()
+                self._journal_ino, self._journal_pos = None, 0
+
+            files = {}
+            for c, snapshot in snapshots.items():
+                if snapshot is not None:
+                    files.update(c.encode_snapshot(snapshot))
+            if sequences is not None:
+                files[self.sequences.path] = codec.encode(sequences, "json")
+            try:
+                atomic_write_many(files, self._commit_marker)
+            except Exception:
+                for c, snapshot in snapshots.items():
+                    if snapshot is not None:
+                        c.mark_dirty()
+                if sequences is not None:
+                    self.sequences.mark_dirty()
+                raise
+            self.journal.discard_rotated()
+            for c in self.collections():
+                c.cleanup()
+            legacy.unlink(missing_ok=True)
+            legacy.with_name(legacy.name + ".compacting").unlink(missing_ok=True)
+            metrics.checkpoint_seconds.observe(time.perf_counter() - t)
+
+
+    # ---------- consultas ----------
+
+    def versiones(self, names) -> dict[str, tuple[int, float]]:
+        """(versión, fecha de la última escritura en segundos epoch) de cada colección."""
+        self.ensure_fresh()
+        return {n: (self._by_name[n].version, self._by_name[n].modificado) for n in names}
+
+    def query_ventas(
+        self,
+        empresa_id: Optional[int] = None,
+        producto_id: Optional[int] = None,
+        desde: Optional[datetime] = None,
+        hasta: Optional[datetime] = None,
+    ) -> list[dict]:
+        """Ventas filtradas, ordenadas por id; los filtros se resuelven con el índice."""
+        if empresa_id is None and producto_id is None and desde is None and hasta is None:
+            return self.ventas.page()
+        self.ensure_fresh()
+        return self.ventas_index.query(
+            empresa_id,
+            producto_id,
+            to_timestamp(desde) if desde is not None else None,
+            to_timestamp(hasta) if hasta is not None else None,
+        )
+
+    def resumen_ventas(self, desde: datetime, hasta: datetime) -> dict:
+        """
+        Totales de las ventas en [desde, hasta]; la ganancia usa el costo
+        guardado en cada venta. Sale de los agregados diarios, no de recorrer
+        las ventas.
+        """
+        return self.rollups.resumen(to_timestamp(desde), to_timestamp(hasta))
+
+
+class _NoLock:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return None
+
+
+_NO_LOCK = _NoLock()
+
+
+def create_store():
+    """Instancia el backend configurado en INVENTARIO_BACKEND."""
+    if config.STORAGE_BACKEND == "sqlite":
+        from app.storage.sqlite_store import SqliteStore
+        return SqliteStore(
+            config.SQLITE_PATH, pool_size=config.SQLITE_POOL_SIZE, pool_timeout=config.SQLITE_POOL_TIMEOUT
+        )
+    if config.STORAGE_BACKEND != "json":
+        raise ValueError(f"INVENTARIO_BACKEND desconocido: {config.STORAGE_BACKEND!r}")
+    return Store(
+        config.DATA_DIR,
+        config.FLUSH_INTERVAL,
+        config.JOURNAL_COMPACT_EVERY,
+        multiprocess=config.MULTIPROCESS,
+    )
+
+
+store = create_store()
@@ -0,0 +1,174 @@
+from __future__ import annotations
+import math
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Iterable, Optional
+
+from app.utils import to_timestamp
+
+
+def venta_ts(v: dict) -> float:
+    # Registros viejos sin fecha o con fecha mala quedan fuera de cualquier rango
+    try:
+        return to_timestamp(v.get("fecha") or "")
+    except ValueError:
+        return math.nan
+
+
+class Postings:
+    """
+    Lista de ventas ordenada por fecha en dos arrays paralelos: segundos
+    epoch (`array('d')`) e id de venta (`array('q')`). Un rango de fechas se
+    resuelve con bisect. Las ventas sin fecha válida van aparte.
+    """
+
+    __slots__ = ("ts", "ids", "sin_fecha")
+
+    def __init__(self):
+        self.ts = array("d")
+        self.ids = array("q")
+        self.sin_fecha: set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self.ids) + len(self.sin_fecha)
+
+    def add(self, ts: float, vid: int) -> None:
+        if math.isnan(ts):
+            self.sin_fecha.add(vid)
+            return
+        # Caso común: las ventas llegan en orden cronológico
+        if not self.ts or ts >= self.ts[-1]:
+            self.ts.append(ts)
+            self.ids.append(vid)
+            return
+        i = bisect_right(self.ts, ts)
+        self.ts.insert(i, ts)
+        self.ids.insert(i, vid)
+
+    def remove(self, ts: float, vid: int) -> None:
+        if math.isnan(ts):
+            self.sin_fecha.discard(vid)
+            return
+        i = bisect_left(self.ts, ts)
+        while i < len(self.ts) and self.ts[i] == ts:
+            if self.ids[i] == vid:
+                del self.ts[i]
+                del self.ids[i]
+                return
+            i += 1
+
+    def range(self, desde: Optional[float], hasta: Optional[float]) -> Iterable[int]:
+        """Ids con desde <= ts <= hasta; sin límites incluye también las sin fecha."""
+        if desde is None and hasta is None:
+            yield from self.ids
+            yield from self.sin_fecha
+            return
+        i = 0 if desde is None else bisect_left(self.ts, desde)
+        j = len(self.ts) if hasta is None else bisect_right(self.ts, hasta)
+        yield from self.ids[i:j]
+
+    def count_range(self, desde: Optional[float], hasta: Optional[float]) -> int:
+        if desde is None and hasta is None:
+            return len(self)
+        i = 0 if desde is None else bisect_left(self.ts, desde)
+        j = len(self.ts) if hasta is None else bisect_right(self.ts, hasta)
+        return max(0, j - i)
+
+
+class VentasIndex:
+    """
+    Índice de ventas por fecha, con listas por empresa_id y por producto_id
+    también ordenadas por fecha. Una consulta elige la lista más corta para
+    el filtro pedido, corta el rango con bisect y sólo revisa esas filas,
+    así que el costo depende del tamaño del resultado y no del historial.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self._ventas = None
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            self._todas = Postings()
+            self._por_empresa: dict[int, Postings] = {}
+            self._por_producto: dict[int, Postings] = {}
+
+    # ---------- mantenimiento ----------
+
+    def rebuild(self, store) -> None:
+        with self.lock:
+            self._ventas = store.ventas
+            self.reset()
+            filas = sorted(((venta_ts(v), v) for v in store.ventas.all()),
+                           key=lambda x: (math.isnan(x[0]), x[0]))
+            for ts, v in filas:
+                self._add(ts, v)
+
+    def apply(self, name: str, old: Optional[dict], new: Optional[dict]) -> None:
+        if name != "ventas":
+            return
+        with self.lock:
+            if old is not None:
+                self._remove(venta_ts(old), old)
+            if new is not None:
+                self._add(venta_ts(new), new)
+
+    def _add(self, ts: float, v: dict) -> None:
+        vid = v["id"]
+        self._todas.add(ts, vid)
+        self._por_empresa.setdefault(v.get("empresa_id"), Postings()).add(ts, vid)
+        self._por_producto.setdefault(v.get("producto_id"), Postings()).add(ts, vid)
+
+    def _remove(self, ts: float, v: dict) -> None:
+        vid = v["id"]
+        self._todas.remove(ts, vid)
+        for lista, clave in ((self._por_empresa, v.get("empresa_id")), (self._por_producto, v.get("producto_id"))):
+            p = lista.get(clave)
+            if p is not None:
+                p.remove(ts, vid)
+                if not len(p):
+                    del lista[clave]
+
+    # ---------- consultas ----------
+
+    def query(
+        self,
+        empresa_id: Optional[int] = None,
+        producto_id: Optional[int] = None,
+        desde: Optional[float] = None,
+        hasta: Optional[float] = None,
+    ) -> list[dict]:
+        """Ventas que cumplen todos los filtros, ordenadas por id."""
+        with self.lock:
+            candidatas = [self._todas]
+            if empresa_id is not None:
+                candidatas.append(self._por_empresa.get(empresa_id, Postings()))
+            if producto_id is not None:
+                candidatas.append(self._por_producto.get(producto_id, Postings()))
+            base = min(candidatas, key=lambda p: p.count_range(desde, hasta))
+            ids = sorted(base.range(desde, hasta))
+
+        rows = self._ventas._rows
+        out = []
+        for vid in ids:
+            v = rows.get(vid)
+            if v is None:
+                continue
+            if empresa_id is not None and v.get("empresa_id") != empresa_id:
+                continue
+            if producto_id is not None and v.get("producto_id") != producto_id:
+                continue
+            out.append(v)
+        return out
+
+    def range_rows(self, desde: float, hasta: float, incluir_hasta: bool = True) -> list[tuple[float, dict]]:
+        """(ts, venta) de las ventas con desde <= ts <= hasta (o < hasta), en orden de fecha."""
+        with self.lock:
+            p = self._todas
+            i = bisect_left(p.ts, desde)
+            j = bisect_right(p.ts, hasta) if incluir_hasta else bisect_left(p.ts, hasta)
+            pares = list(zip(p.ts[i:j], p.ids[i:j]))
+        rows = self._ventas._rows
+        return [(ts, rows[vid]) for ts, vid in pares if vid in rows]
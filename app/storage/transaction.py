@@ -0,0 +1,163 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, Optional
+
+from app.storage.indexes import UniqueViolation
+from app.storage.sequences import owner
+
+if TYPE_CHECKING:
+    from app.storage.store import Store
+
+
+class Transaction:
+    """
+    Unidad de trabajo sobre una o varias colecciones.
+
+    Al entrar toma los locks de las colecciones indicadas (siempre en el
+    mismo orden, para no generar deadlocks) y, si la app corre con varios
+    procesos, también sus locks de archivo. Dentro, las lecturas ven los
+    cambios propios aún no confirmados. Al salir sin excepción, todos los
+    cambios se escriben como un único registro del journal y recién
+    entonces se aplican en memoria: o se confirma todo, o nada.
+
+        with store.transaction("productos", "ventas") as tx:
+            producto = tx.get("productos", 1)
+            tx.put("productos", {**producto, "stock": producto["stock"] - 1})
+            tx.insert("ventas", {...})
+    """
+
+    def __init__(self, store: "Store", names):
+        self.store = store
+        self.names = sorted(set(names))
+        self._puts: dict[str, dict] = {n: {} for n in self.names}
+        self._deletes: dict[str, set] = {n: set() for n in self.names}
+        # Último valor reservado por secuencia en esta transacción
+        self._seq: dict[str, int] = {}
+        # (colección, campo único) -> {valor: id} de las filas pendientes
+        self._unique: dict[tuple[str, str], dict] = {}
+        self._release = None
+
+    def __enter__(self) -> "Transaction":
+        self._release = self.store.begin(self.names)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            if exc_type is None:
+                self.commit()
+        finally:
+            self._release()
+
+    def _check(self, name: str) -> None:
+        if name not in self._puts:
+            raise KeyError(f"La colección '{name}' no está bloqueada por esta transacción")
+
+    # ---------- lectura ----------
+
+    def get(self, name: str, key) -> Optional[dict]:
+        self._check(name)
+        if key in self._puts[name]:
+            return self._puts[name][key]
+        if key in self._deletes[name]:
+            return None
+        return self.store.collection(name)._rows.get(key)
+
+    def exists(self, name: str, key) -> bool:
+        return self.get(name, key) is not None
+
+    # ---------- secuencias ----------
+
+    def _seq_value(self, name: str) -> int:
+        self._check(owner(name))
+        return self._seq.get(name, self.store.sequences.current(name))
+
+    def reserve(self, name: str, n: int = 1) -> int:
+        """Reserva `n` valores consecutivos de la secuencia y devuelve el primero."""
+        first = self._seq_value(name) + 1
+        self._seq[name] = first + n - 1
+        return first
+
+    def next_value(self, name: str) -> int:
+        return self.reserve(name, 1)
+
+    def advance(self, name: str, value: int) -> None:
+        """Lleva la secuencia al menos hasta `value` (p. ej. al insertar con id explícito)."""
+        if value > self._seq_value(name):
+            self._seq[name] = value
+
+    # ---------- escritura ----------
+
+    def insert(self, name: str, row: dict) -> dict:
+        """Inserta una fila nueva, asignando id correlativo si no trae uno."""
+        self._check(name)
+        col = self.store.collection(name)
+        key = row.get(col.key)
+        if key is None:
+            key = row[col.key] = self.next_value(name)
+        elif isinstance(key, int):
+            self.advance(name, key)
+        return self.put(name, row)
+
+    def put(self, name: str, row: dict) -> dict:
+        self._check(name)
+        col = self.store.collection(name)
+        key = row[col.key]
+        unique = [i for i in col.indexes.values() if i.unique]
+        for index in unique:
+            self._check_unique(name, index, key, row.get(index.field))
+        self._forget_unique(name, key)
+        for index in unique:
+            if row.get(index.field) is not None:
+                self._unique.setdefault((name, index.field), {})[row[index.field]] = key
+        self._deletes[name].discard(key)
+        self._puts[name][key] = row
+        return row
+
+    def _check_unique(self, name: str, index, key, value) -> None:
+        if value is None:
+            return
+        pending = self._puts[name]
+        # Otra fila pendiente de esta transacción con el mismo valor
+        other = self._unique.get((name, index.field), {}).get(value)
+        if other is not None and other != key:
+            raise UniqueViolation(name, index.field, value)
+        # Confirmadas con ese valor, salvo las que esta transacción borra o cambia
+        for other in index.lookup(value):
+            if other == key or other in self._deletes[name]:
+                continue
+            if other in pending and pending[other].get(index.field) != value:
+                continue
+            raise UniqueViolation(name, index.field, value)
+
+    def _forget_unique(self, name: str, key) -> None:
+        prev = self._puts[name].get(key)
+        if prev is None:
+            return
+        for (n, field), values in self._unique.items():
+            if n == name and values.get(prev.get(field)) == key:
+                del values[prev[field]]
+
+    def delete(self, name: str, key) -> None:
+        self._check(name)
+        self._forget_unique(name, key)
+        self._puts[name].pop(key, None)
+        self._deletes[name].add(key)
+
+    # ---------- commit ----------
+
+    def commit(self) -> None:
+        record = {}
+        puts = {n: list(rows.values()) for n, rows in self._puts.items() if rows}
+        deletes = {n: list(keys) for n, keys in self._deletes.items() if keys}
+        if puts:
+            record["put"] = puts
+        if deletes:
+            record["del"] = deletes
+        if self._seq:
+            record["seq"] = dict(self._seq)
+        if record:
+            self.store.commit(record)
+        for n in self.names:
+            self._puts[n].clear()
+            self._deletes[n].clear()
+        self._seq.clear()
+        self._unique.clear()
@@ -1,25 +1,131 @@
 from __future__ import annotations
 import json
+import os
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any
+from typing import Any, Union
 
-DATA_DIR = Path(__file__).resolve().parent / "data"
+from app import codec, metrics
+from app.config import DATA_DIR
 
 def ensure_data_file(path: Path, default: Any) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
     if not path.exists():
-        path.write_text(json.dumps(default, ensure_ascii=False, indent=2), encoding="utf-8")
+        path.write_bytes(codec.encode(default, "json"))
 
 def load_json(path: Path, default: Any):
+    """Lee un archivo de datos en cualquiera de los formatos de `app.codec` (json, compact, gzip, msgpack)."""
     ensure_data_file(path, default)
+    data = path.read_bytes()
+    archivo = metrics.file_label(path)
+    metrics.bytes_read.inc(len(data), file=archivo)
     try:
-        return json.loads(path.read_text(encoding="utf-8"))
-    except json.JSONDecodeError:
+        with metrics.decode_seconds.time(file=archivo):
+            return codec.decode(data)
+    except codec.FormatoInvalido:
         backup = path.with_suffix(path.suffix + ".bak")
-        backup.write_text(path.read_text(encoding="utf-8", errors="ignore"), encoding="utf-8")
-        path.write_text(json.dumps(default, ensure_ascii=False, indent=2), encoding="utf-8")
+        backup.write_bytes(data)
+        path.write_bytes(codec.encode(default, "json"))
         return default
 
-def save_json(path: Path, data: Any) -> None:
+def _as_bytes(content: Union[str, bytes]) -> bytes:
+    return content.encode("utf-8") if isinstance(content, str) else content
+
+def atomic_write_text(path: Path, text: Union[str, bytes]) -> None:
+    """Escribe en un temporal, hace fsync y lo renombra: nunca deja el archivo a medias."""
     path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp = path.with_name(path.name + ".tmp")
+    data = _as_bytes(text)
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    metrics.bytes_written.inc(len(data), file=metrics.file_label(path))
+
+def save_json(path: Path, data: Any, formato: str = "json") -> None:
+    atomic_write_text(path, codec.encode(data, formato))
+
+def atomic_write_many(files: dict[Path, Union[str, bytes]], marker: Path) -> None:
+    """
+    Reemplaza varios archivos como una sola operación.
+
+    1. escribe cada contenido en un temporal y hace fsync;
+    2. escribe el marcador de commit con la lista de renombres (punto de no retorno);
+    3. renombra cada temporal sobre su destino y borra el marcador.
+
+    Si el proceso muere antes del paso 2 quedan sólo temporales huérfanos;
+    si muere después, `recover_atomic_write` completa los renombres.
+    """
+    renames = []
+    for path, text in files.items():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        data = _as_bytes(text)
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        metrics.bytes_written.inc(len(data), file=metrics.file_label(path))
+        renames.append([str(tmp), str(path)])
+    atomic_write_text(marker, json.dumps(renames))
+    _apply_renames(renames)
+    marker.unlink()
+
+def recover_atomic_write(marker: Path) -> None:
+    """Termina (hacia adelante) un `atomic_write_many` interrumpido."""
+    if not marker.exists():
+        return
+    try:
+        renames = json.loads(marker.read_text(encoding="utf-8"))
+    except json.JSONDecodeError:
+        # El marcador nunca llegó a quedar completo: el commit no ocurrió
+        renames = []
+    _apply_renames(renames)
+    marker.unlink(missing_ok=True)
+
+def _apply_renames(renames: list) -> None:
+    for tmp, final in renames:
+        try:
+            os.replace(tmp, final)
+        except FileNotFoundError:
+            # ya renombrado en un intento anterior
+            pass
+    dirs = {os.path.dirname(final) for _, final in renames}
+    for d in dirs:
+        _fsync_dir(d)
+
+def _fsync_dir(path: str) -> None:
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def parse_iso(dt_str: str) -> datetime:
+    """
+    Acepta ISO 8601 estándar y también strings con 'Z' (UTC),
+    por ejemplo: 2026-01-01T03:00:00.000Z
+    """
+    s = (dt_str or "").strip()
+    if not s:
+        raise ValueError("Fecha vacía")
+    if s.endswith("Z"):
+        s = s.replace("Z", "+00:00")
+    return datetime.fromisoformat(s)
+
+def to_timestamp(value: Union[str, datetime]) -> float:
+    """
+    Segundos epoch de una fecha ISO o datetime, para comparar fechas con y
+    sin zona horaria: las que traen zona se pasan a UTC y las que no se
+    asumen en UTC (así las guarda la API con utcnow()).
+    """
+    dt = parse_iso(value) if isinstance(value, str) else value
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
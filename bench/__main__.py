@@ -0,0 +1,173 @@
+"""
+Benchmarks de la API sobre datos sintéticos.
+
+    python -m bench --ventas 1000000 --repeticiones 200
+    python -m bench --backend sqlite --carga --concurrencia 32
+    python -m bench --solo listar_ventas,flujo_caja --salida resultados.json
+    python -m bench --comparar resultados.json
+
+Genera los datos en un directorio temporal, levanta la app en el mismo
+proceso (httpx + ASGI, sin red de por medio) y mide cada escenario:
+latencias p50/p90/p99 y throughput. Con --carga además corre clientes
+concurrentes y verifica que el stock no quede negativo ni descuadrado;
+si falla, el proceso termina con código 1 (sirve como prueba en CI).
+
+El resultado es JSON (stdout o --salida) para comparar corridas; el
+resumen legible va a stderr. Con --comparar se agrega la variación de
+p50/p99 respecto de una corrida anterior.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(prog="python -m bench", description="Benchmarks de la API de inventario")
+    p.add_argument("--ventas", type=int, default=10_000, help="Ventas históricas generadas (default 10000)")
+    p.add_argument("--productos", type=int, default=1_000)
+    p.add_argument("--empresas", type=int, default=200)
+    p.add_argument("--repeticiones", type=int, default=100, help="Requests por escenario")
+    p.add_argument("--filas-excel", type=int, default=1_000, help="Filas por libro en importar_productos_excel")
+    p.add_argument("--backend", choices=("json", "sqlite"), default="json")
+    p.add_argument("--solo", default="", help="Escenarios a correr, separados por coma")
+    p.add_argument("--carga", action="store_true", help="Corre además la prueba de carga concurrente")
+    p.add_argument("--concurrencia", type=int, default=16)
+    p.add_argument("--requests-carga", type=int, default=50, help="Requests por cliente en la prueba de carga")
+    p.add_argument("--semilla", type=int, default=1)
+    p.add_argument("--salida", type=Path, default=None, help="Archivo JSON de resultados (default: stdout)")
+    p.add_argument("--comparar", type=Path, default=None, help="JSON de una corrida anterior para comparar")
+    p.add_argument("--datos", type=Path, default=None, help="Directorio de datos (default: uno temporal)")
+    return p.parse_args(argv)
+
+
+def preparar_entorno(args: argparse.Namespace, data_dir: Path) -> None:
+    # La configuración se lee al importar app.config: esto va antes de cualquier import de app
+    os.environ["INVENTARIO_DATA_DIR"] = str(data_dir)
+    os.environ["INVENTARIO_BACKEND"] = args.backend
+    os.environ["INVENTARIO_SQLITE_PATH"] = str(data_dir / "inventario.db")
+
+
+def _variacion(actual: float, base: float) -> str:
+    if not base:
+        return "-"
+    return f"{(actual - base) / base * 100:+.1f}%"
+
+
+def comparar(resultados: dict, anterior: dict) -> dict:
+    """Variación de p50/p99 y throughput por escenario respecto de `anterior`."""
+    out = {}
+    for nombre, r in resultados.items():
+        base = anterior.get("resultados", {}).get(nombre)
+        if base:
+            out[nombre] = {k: _variacion(r[k] or 0, base[k] or 0) for k in ("p50_ms", "p99_ms", "throughput_rps")}
+    return out
+
+
+def imprimir(resultados: dict, carga: dict | None) -> None:
+    filas = list(resultados.items()) + ([("carga_concurrente", carga)] if carga else [])
+    print(f"{'escenario':<26}{'req':>6}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'req/s':>10}  status",
+          file=sys.stderr)
+    for nombre, r in filas:
+        print(f"{nombre:<26}{r['requests']:>6}{r['p50_ms']:>10.2f}{r['p90_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+              f"{r['throughput_rps'] or 0:>10.1f}  {r['status']}", file=sys.stderr)
+    if carga:
+        estado = "OK" if carga["ok"] else f"FALLÓ: {carga['violaciones']}"
+        print(f"verificación de stock: {estado}", file=sys.stderr)
+
+
+async def correr(args: argparse.Namespace, data_dir: Path) -> dict:
+    from bench import datos
+    from bench.escenarios import ESCENARIOS
+
+    t = time.perf_counter()
+    generado = datos.escribir(data_dir, args.ventas, args.productos, args.empresas, args.semilla)
+    if args.backend == "sqlite":
+        from app.storage.migrar_sqlite import migrar
+        migrar(data_dir, data_dir / "inventario.db")
+    generacion_s = time.perf_counter() - t
+
+    import httpx
+    from app import codec
+    from app.main import app
+
+    solo = [s.strip() for s in args.solo.split(",") if s.strip()]
+    desconocidos = set(solo) - set(ESCENARIOS)
+    if desconocidos:
+        raise SystemExit(f"Escenarios desconocidos: {', '.join(sorted(desconocidos))} (hay: {', '.join(ESCENARIOS)})")
+
+    tam = {"productos": args.productos, "empresas": args.empresas, "filas_excel": args.filas_excel}
+    resultados = {}
+    carga = None
+    t = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        arranque_s = time.perf_counter() - t
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as c:
+            for nombre, (fn, fraccion) in ESCENARIOS.items():
+                if solo and nombre not in solo:
+                    continue
+                n = max(1, int(args.repeticiones * fraccion))
+                m = await fn(c, n, tam, random.Random(args.semilla))
+                resultados[nombre] = m.resumen()
+            if args.carga:
+                from bench import carga as carga_mod
+                carga = await carga_mod.correr(
+                    c, args.concurrencia, args.requests_carga, args.empresas, args.semilla
+                )
+
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "parametros": {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()},
+        "entorno": {
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "codec_json": codec.BACKEND,
+            "backend": args.backend,
+        },
+        "datos": generado,
+        "generacion_s": round(generacion_s, 3),
+        "arranque_s": round(arranque_s, 3),
+        "resultados": resultados,
+        "carga": carga,
+    }
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    tmp = None
+    if args.datos is None:
+        tmp = tempfile.TemporaryDirectory(prefix="inventario-bench-")
+        data_dir = Path(tmp.name)
+    else:
+        data_dir = args.datos
+    try:
+        preparar_entorno(args, data_dir)
+        out = asyncio.run(correr(args, data_dir))
+    finally:
+        if tmp is not None:
+            tmp.cleanup()
+
+    imprimir(out["resultados"], out["carga"])
+    if args.comparar:
+        out["comparacion"] = comparar(out["resultados"], json.loads(args.comparar.read_text(encoding="utf-8")))
+        for nombre, v in out["comparacion"].items():
+            print(f"{nombre:<26}p50 {v['p50_ms']:>8}  p99 {v['p99_ms']:>8}  req/s {v['throughput_rps']:>8}", file=sys.stderr)
+    texto = json.dumps(out, ensure_ascii=False, indent=2)
+    if args.salida:
+        args.salida.write_text(texto + "\n", encoding="utf-8")
+    else:
+        print(texto)
+    return 0 if out["carga"] is None or out["carga"]["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
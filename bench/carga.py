@@ -0,0 +1,77 @@
+"""
+Prueba de carga concurrente: C clientes registran ventas y compras sobre
+un puñado de productos con stock limitado, y al final se verifica que el
+stock nunca quedó negativo y que cuadra con lo vendido según las
+respuestas 201.
+"""
+from __future__ import annotations
+import asyncio
+import random
+
+import httpx
+
+from bench.medicion import Medicion, medir
+
+
+async def _crear_productos(c: httpx.AsyncClient, n: int, stock: int) -> list[int]:
+    ids = []
+    for i in range(n):
+        body = {"id": 0, "nombre": f"Carga {i}", "precio": 1000, "stock": stock, "costo": 600, "categoria": "carga"}
+        r = await c.post("/productos/", json=body)
+        r.raise_for_status()
+        ids.append(r.json()["id"])
+    return ids
+
+
+async def _cliente(c: httpx.AsyncClient, m: Medicion, ids: list[int], empresas: int, n: int,
+                   rnd: random.Random, vendido: dict[int, int]) -> None:
+    for _ in range(n):
+        empresa_id = rnd.randint(1, empresas)
+        if rnd.random() < 0.7:
+            pid = rnd.choice(ids)
+            cantidad = rnd.randint(1, 5)
+            body = {"id": 0, "producto_id": pid, "empresa_id": empresa_id, "cantidad": cantidad, "total": 0,
+                    "fecha": "2026-01-01T00:00:00"}
+            r = await medir(m, c.post("/ventas/", json=body))
+            if r.status_code == 201:
+                vendido[pid] += cantidad
+        else:
+            items = [{"producto_id": pid, "cantidad": rnd.randint(1, 5)} for pid in rnd.sample(ids, min(3, len(ids)))]
+            r = await medir(m, c.post("/ventas/compra", json={"empresa_id": empresa_id, "items": items}))
+            if r.status_code == 201:
+                for it in items:
+                    vendido[it["producto_id"]] += it["cantidad"]
+
+
+async def correr(c: httpx.AsyncClient, concurrencia: int, requests_por_cliente: int, empresas: int,
+                 semilla: int, productos: int = 20, stock: int = 500) -> dict:
+    """Devuelve el resumen de latencias más el resultado de las verificaciones de stock."""
+    ids = await _crear_productos(c, productos, stock)
+    vendido = {pid: 0 for pid in ids}
+    m = Medicion("carga_concurrente")
+    await asyncio.gather(*(
+        _cliente(c, m, ids, empresas, requests_por_cliente, random.Random(semilla * 1000 + i), vendido)
+        for i in range(concurrencia)
+    ))
+    m.terminar()
+
+    violaciones = []
+    for pid in ids:
+        r = await c.get(f"/productos/{pid}")
+        final = r.json()["stock"]
+        if final < 0:
+            violaciones.append({"producto_id": pid, "error": "stock negativo", "stock": final})
+        elif stock - vendido[pid] != final:
+            violaciones.append({
+                "producto_id": pid, "error": "stock no cuadra con lo vendido",
+                "esperado": stock - vendido[pid], "stock": final,
+            })
+    return {
+        "concurrencia": concurrencia,
+        "productos": productos,
+        "stock_inicial": stock,
+        "unidades_vendidas": sum(vendido.values()),
+        **m.resumen(),
+        "violaciones": violaciones,
+        "ok": not violaciones,
+    }
@@ -0,0 +1,128 @@
+"""
+Datos sintéticos para los benchmarks: empresas, productos y ventas escritos
+directo como archivos de DATA_DIR (sin pasar por la API), y libros Excel
+para la importación.
+
+Las ventas se escriben por bloques al ventas.json único (el formato de
+versiones anteriores), así que generar millones no requiere tenerlas todas
+en memoria; la app las particiona por mes en su primer checkpoint.
+"""
+from __future__ import annotations
+import io
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from app import codec
+
+CATEGORIAS = ["abarrotes", "bebidas", "limpieza", "panadería", "lácteos", "congelados", "ferretería", "librería"]
+
+# Filas de ventas por bloque escrito
+BLOQUE = 100_000
+
+# Nombres de productos (tipo + marca + número), con tildes para la búsqueda
+TIPOS = ["Café", "Té", "Azúcar", "Jabón", "Detergente", "Galletas", "Leche", "Pan", "Arroz", "Fideos",
+         "Aceite", "Atún", "Cuaderno", "Lápiz", "Tornillo", "Martillo", "Helado", "Yogur", "Jugo", "Agua"]
+MARCAS = ["Andino", "Austral", "Ñandú", "Cóndor", "Pehuén", "Lautaro", "Copihue", "Volcán", "Pacífico", "Araucaria"]
+
+
+def empresas(n: int) -> list[dict]:
+    return [
+        {
+            "id": i,
+            "nombre": f"Empresa {i}",
+            "rut": f"{76_000_000 + i}-{i % 10}",
+            "giro": "comercio",
+            "telefono": None,
+            "email": f"contacto{i}@empresa{i}.cl",
+            "direccion": None,
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def productos(n: int, rnd: random.Random, stock: int = 1_000_000) -> list[dict]:
+    out = []
+    for i in range(1, n + 1):
+        costo = round(rnd.uniform(100, 5000), 0)
+        out.append({
+            "id": i,
+            # Determinista por id: no consume el Random (mismos precios y ventas que antes)
+            "nombre": f"{TIPOS[i % len(TIPOS)]} {MARCAS[i // len(TIPOS) % len(MARCAS)]} {i}",
+            "precio": round(costo * rnd.uniform(1.1, 1.8), 0),
+            "stock": stock,
+            "costo": costo,
+            "categoria": rnd.choice(CATEGORIAS),
+        })
+    return out
+
+
+def ventas(n: int, n_empresas: int, catalogo: list[dict], rnd: random.Random, dias: int = 730):
+    """Genera `n` ventas repartidas en los últimos `dias` días, en orden de fecha."""
+    inicio = datetime.utcnow() - timedelta(days=dias)
+    paso = dias * 86400 / max(n, 1)
+    compra_id = 0
+    i = 1
+    while i <= n:
+        # ~1 de cada 5 es una compra de varias líneas
+        lineas = rnd.randint(2, 4) if rnd.random() < 0.2 else 1
+        cid = None
+        if lineas > 1:
+            compra_id += 1
+            cid = compra_id
+        empresa_id = rnd.randint(1, n_empresas)
+        fecha = (inicio + timedelta(seconds=i * paso)).isoformat(timespec="seconds")
+        for _ in range(min(lineas, n - i + 1)):
+            p = rnd.choice(catalogo)
+            cantidad = rnd.randint(1, 5)
+            yield {
+                "id": i,
+                "compra_id": cid,
+                "producto_id": p["id"],
+                "empresa_id": empresa_id,
+                "cantidad": cantidad,
+                "total": float(p["precio"] * cantidad),
+                "fecha": fecha,
+                "precio_unitario": float(p["precio"]),
+                "costo_unitario": float(p["costo"]),
+            }
+            i += 1
+
+
+def escribir(data_dir: Path, n_ventas: int, n_productos: int, n_empresas: int, semilla: int = 1) -> dict:
+    """Crea los archivos de datos en `data_dir` y devuelve un resumen de lo generado."""
+    rnd = random.Random(semilla)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    catalogo = productos(n_productos, rnd)
+    (data_dir / "empresas.json").write_bytes(codec.encode(empresas(n_empresas), "compact"))
+    (data_dir / "productos.json").write_bytes(codec.encode(catalogo, "compact"))
+
+    with open(data_dir / "ventas.json", "wb") as f:
+        f.write(b"[")
+        bloque = []
+        primero = True
+        for v in ventas(n_ventas, n_empresas, catalogo, rnd):
+            bloque.append(v)
+            if len(bloque) >= BLOQUE:
+                f.write((b"" if primero else b",") + codec.dumps(bloque)[1:-1])
+                primero = False
+                bloque = []
+        if bloque:
+            f.write((b"" if primero else b",") + codec.dumps(bloque)[1:-1])
+        f.write(b"]")
+    return {"empresas": n_empresas, "productos": n_productos, "ventas": n_ventas}
+
+
+def excel_productos(filas: int, rnd: random.Random) -> bytes:
+    """Libro .xlsx con la hoja 'productos' y `filas` productos nuevos."""
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("productos")
+    ws.append(["id", "nombre", "categoria", "precio", "costo", "stock"])
+    for i in range(filas):
+        costo = round(rnd.uniform(100, 5000), 0)
+        ws.append([None, f"Importado {i}", rnd.choice(CATEGORIAS), round(costo * 1.4, 0), costo, rnd.randint(0, 500)])
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
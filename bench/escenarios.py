@@ -0,0 +1,111 @@
+"""
+Escenarios por endpoint. Cada uno recibe el cliente httpx (ASGI, en el
+mismo proceso), el tamaño de los datos y un Random con semilla, y devuelve
+una `Medicion` con sus latencias.
+"""
+from __future__ import annotations
+import random
+from datetime import datetime, timedelta
+
+import httpx
+
+from bench import datos
+from bench.medicion import Medicion, medir
+
+
+def _ahora() -> str:
+    return datetime.utcnow().isoformat(timespec="seconds")
+
+
+async def crear_venta(c: httpx.AsyncClient, n: int, tam: dict, rnd: random.Random) -> Medicion:
+    m = Medicion("crear_venta")
+    for _ in range(n):
+        body = {
+            "id": 0,
+            "producto_id": rnd.randint(1, tam["productos"]),
+            "empresa_id": rnd.randint(1, tam["empresas"]),
+            "cantidad": rnd.randint(1, 3),
+            "total": 0,
+            "fecha": _ahora(),
+        }
+        await medir(m, c.post("/ventas/", json=body))
+    return m.terminar()
+
+
+async def crear_compra_multiple(c: httpx.AsyncClient, n: int, tam: dict, rnd: random.Random) -> Medicion:
+    m = Medicion("crear_compra_multiple")
+    for _ in range(n):
+        items = [
+            {"producto_id": pid, "cantidad": rnd.randint(1, 3)}
+            for pid in rnd.sample(range(1, tam["productos"] + 1), min(4, tam["productos"]))
+        ]
+        body = {"empresa_id": rnd.randint(1, tam["empresas"]), "items": items}
+        await medir(m, c.post("/ventas/compra", json=body))
+    return m.terminar()
+
+
+def _rango(rnd: random.Random, dias_max: int = 90) -> tuple[str, str]:
+    # Rangos distintos en cada request: sin esto mediríamos sólo la caché de flujo_caja
+    fin = datetime.utcnow() - timedelta(days=rnd.randint(0, 700), seconds=rnd.randint(0, 86399))
+    inicio = fin - timedelta(days=rnd.randint(1, dias_max))
+    return inicio.isoformat(timespec="seconds"), fin.isoformat(timespec="seconds")
+
+
+async def listar_ventas(c: httpx.AsyncClient, n: int, tam: dict, rnd: random.Random) -> Medicion:
+    """Filtros combinados como los del historial: empresa, producto y rango de fechas, paginados."""
+    m = Medicion("listar_ventas")
+    for i in range(n):
+        desde, hasta = _rango(rnd, 30)
+        params = {"desde": desde, "hasta": hasta, "limit": 500}
+        if i % 2 == 0:
+            params["empresa_id"] = rnd.randint(1, tam["empresas"])
+        if i % 3 == 0:
+            params["producto_id"] = rnd.randint(1, tam["productos"])
+        await medir(m, c.get("/ventas/", params=params))
+    return m.terminar()
+
+
+async def flujo_caja(c: httpx.AsyncClient, n: int, tam: dict, rnd: random.Random) -> Medicion:
+    m = Medicion("flujo_caja")
+    for _ in range(n):
+        desde, hasta = _rango(rnd, 365)
+        await medir(m, c.get("/reportes/flujo_caja", params={"desde": desde, "hasta": hasta}))
+    return m.terminar()
+
+
+async def importar_excel(c: httpx.AsyncClient, n: int, tam: dict, rnd: random.Random) -> Medicion:
+    """Importa `n` libros generados de `tam['filas_excel']` filas cada uno (el armado del xlsx no se mide)."""
+    libros = [datos.excel_productos(tam["filas_excel"], rnd) for _ in range(n)]
+    m = Medicion("importar_productos_excel")
+    for libro in libros:
+        files = {"file": ("productos.xlsx", libro, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")}
+        await medir(m, c.post("/productos/importar_excel", files=files))
+    return m.terminar()
+
+
+async def buscar_productos(c: httpx.AsyncClient, n: int, tam: dict, rnd: random.Random) -> Medicion:
+    """Typeahead: prefijos de 2 a 5 letras (sin tildes), a veces con categoría o rango de precio."""
+    m = Medicion("buscar_productos")
+    for i in range(n):
+        nombre = f"{rnd.choice(datos.TIPOS)} {rnd.choice(datos.MARCAS)}"
+        palabras_q = nombre.split()[: rnd.randint(1, 2)]
+        q = " ".join(w[: rnd.randint(2, 5)] for w in palabras_q)
+        params = {"q": q, "limite": 10}
+        if i % 3 == 0:
+            params["categoria"] = rnd.choice(datos.CATEGORIAS)
+        if i % 4 == 0:
+            params["precio_max"] = rnd.randint(500, 5000)
+        await medir(m, c.get("/productos/buscar", params=params))
+    return m.terminar()
+
+
+# nombre -> (función, fracción de las repeticiones que usa)
+ESCENARIOS = {
+    "crear_venta": (crear_venta, 1.0),
+    "crear_compra_multiple": (crear_compra_multiple, 1.0),
+    "listar_ventas": (listar_ventas, 1.0),
+    "flujo_caja": (flujo_caja, 1.0),
+    "buscar_productos": (buscar_productos, 1.0),
+    # Cada importación procesa un libro entero: bastan unas pocas
+    "importar_productos_excel": (importar_excel, 0.02),
+}
@@ -0,0 +1,55 @@
+"""Medición de latencias: percentiles, throughput y conteo de códigos HTTP."""
+from __future__ import annotations
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+
+def percentil(ordenados: list[float], p: float) -> float:
+    """Percentil `p` (0-100) con interpolación lineal sobre una lista ya ordenada."""
+    if not ordenados:
+        return 0.0
+    k = (len(ordenados) - 1) * p / 100
+    i = int(k)
+    j = min(i + 1, len(ordenados) - 1)
+    return ordenados[i] + (ordenados[j] - ordenados[i]) * (k - i)
+
+
+@dataclass
+class Medicion:
+    nombre: str
+    latencias: list[float] = field(default_factory=list)
+    status: Counter = field(default_factory=Counter)
+    inicio: float = field(default_factory=time.perf_counter)
+    fin: float = 0.0
+
+    def registrar(self, segundos: float, status: int) -> None:
+        self.latencias.append(segundos)
+        self.status[status] += 1
+
+    def terminar(self) -> "Medicion":
+        self.fin = time.perf_counter()
+        return self
+
+    def resumen(self) -> dict:
+        ms = sorted(x * 1000 for x in self.latencias)
+        duracion = (self.fin or time.perf_counter()) - self.inicio
+        return {
+            "requests": len(ms),
+            "duracion_s": round(duracion, 4),
+            "throughput_rps": round(len(ms) / duracion, 2) if duracion > 0 else None,
+            "p50_ms": round(percentil(ms, 50), 3),
+            "p90_ms": round(percentil(ms, 90), 3),
+            "p99_ms": round(percentil(ms, 99), 3),
+            "max_ms": round(ms[-1], 3) if ms else 0.0,
+            "media_ms": round(sum(ms) / len(ms), 3) if ms else 0.0,
+            "status": {str(k): v for k, v in sorted(self.status.items())},
+        }
+
+
+async def medir(m: Medicion, request):
+    """Ejecuta `request` (una corrutina de httpx) y registra su latencia."""
+    t = time.perf_counter()
+    r = await request
+    m.registrar(time.perf_counter() - t, r.status_code)
+    return r